@@ -0,0 +1,184 @@
+"""
+Бенчмарк нормализации alerts: строковые колонки против справочников.
+
+Создаёт во временной схеме две версии таблицы alerts - старую (collection_name,
+model, photo_url, lot_url строками) и новую (model_id), заполняет их одинаковыми
+данными и сравнивает размер таблиц/индексов и скорость проверки дубликатов
+(lot_already_alerted).
+
+Запуск (нужна доступная БД из .env):
+    python -m benchmarks.dimension_tables --rows 200000 --lookups 2000
+"""
+
+import argparse
+import asyncio
+import hashlib
+import logging
+import random
+import time
+
+import asyncpg
+
+from src.config import get_settings
+
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+logger = logging.getLogger(__name__)
+
+SCHEMA = "bench_dimensions"
+
+CREATE_TABLES = f"""
+DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;
+CREATE SCHEMA {SCHEMA};
+
+CREATE TABLE {SCHEMA}.alerts_legacy (
+    id SERIAL PRIMARY KEY,
+    rule_id INTEGER NOT NULL,
+    user_id BIGINT NOT NULL,
+    lot_id VARCHAR(255) NOT NULL,
+    lot_price DECIMAL(10, 2) NOT NULL,
+    lot_floor_price DECIMAL(10, 2) NOT NULL,
+    collection_name VARCHAR(255) NOT NULL,
+    model VARCHAR(255) NOT NULL,
+    photo_url TEXT,
+    lot_url TEXT,
+    sent_at TIMESTAMP,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE {SCHEMA}.alerts (
+    id SERIAL PRIMARY KEY,
+    rule_id INTEGER NOT NULL,
+    user_id BIGINT NOT NULL,
+    lot_id VARCHAR(255) NOT NULL,
+    lot_price DECIMAL(10, 2) NOT NULL,
+    lot_floor_price DECIMAL(10, 2) NOT NULL,
+    model_id INTEGER NOT NULL,
+    sent_at TIMESTAMP,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+FILL_LEGACY = f"""
+INSERT INTO {SCHEMA}.alerts_legacy (
+    rule_id, user_id, lot_id, lot_price, lot_floor_price,
+    collection_name, model, photo_url, lot_url, sent_at
+)
+SELECT
+    i % $2 + 1,
+    256986671,
+    md5(i::text) || '_k74zqq',
+    10 + i % 90,
+    100,
+    'Collection ' || (i % 50),
+    'Model ' || (i % 40),
+    'https://nft.fragment.com/gift/collection' || (i % 50) || '-model' || (i % 40) || '.large.jpg',
+    'https://t.me/portals/market?startapp=gift_' || md5(i::text) || '_k74zqq',
+    now()
+FROM generate_series(1, $1) AS i
+"""
+
+FILL_NORMALIZED = f"""
+INSERT INTO {SCHEMA}.alerts (
+    rule_id, user_id, lot_id, lot_price, lot_floor_price, model_id, sent_at
+)
+SELECT
+    i % $2 + 1,
+    256986671,
+    md5(i::text) || '_k74zqq',
+    10 + i % 90,
+    100,
+    (i % 50) * 40 + (i % 40) + 1,
+    now()
+FROM generate_series(1, $1) AS i
+"""
+
+SIZE_QUERY = "SELECT pg_table_size($1::regclass), pg_indexes_size($1::regclass)"
+
+
+def _mb(size: int) -> str:
+    return f"{size / 1024 / 1024:.1f} MB"
+
+
+async def _measure_lookups(conn: asyncpg.Connection, table: str, samples: list) -> float:
+    """Возвращает среднее время проверки дубликата (мс)."""
+    stmt = await conn.prepare(
+        f"SELECT EXISTS (SELECT 1 FROM {SCHEMA}.{table} WHERE rule_id = $1 AND lot_id = $2)"
+    )
+    started = time.perf_counter()
+    for rule_id, lot_id in samples:
+        await stmt.fetchval(rule_id, lot_id)
+    return (time.perf_counter() - started) * 1000 / len(samples)
+
+
+async def run(rows: int, lookups: int, rules: int) -> None:
+    settings = get_settings()
+    conn = await asyncpg.connect(
+        host=settings.db_host,
+        port=settings.db_port,
+        user=settings.db_user,
+        password=settings.db_password,
+        database=settings.db_name,
+    )
+
+    try:
+        logger.info(f"Filling {rows} alerts in both layouts...")
+        await conn.execute(CREATE_TABLES)
+        await conn.execute(FILL_LEGACY, rows, rules)
+        await conn.execute(FILL_NORMALIZED, rows, rules)
+        await conn.execute(f"ANALYZE {SCHEMA}.alerts_legacy; ANALYZE {SCHEMA}.alerts")
+
+        # Половина проверок - существующие лоты, половина - новые
+        samples = []
+        for _ in range(lookups):
+            i = random.randint(1, rows)
+            if random.random() < 0.5:
+                lot_id = hashlib.md5(str(i).encode()).hexdigest() + "_k74zqq"
+            else:
+                lot_id = f"{i:x}_missing"
+            samples.append((i % rules + 1, lot_id))
+
+        # До миграции на alerts не было индекса для проверки дубликатов,
+        # полный скан медленный, поэтому замеряем на части выборки
+        legacy_no_index = await _measure_lookups(conn, "alerts_legacy", samples[: max(1, lookups // 20)])
+        legacy_sizes = await conn.fetchrow(SIZE_QUERY, f"{SCHEMA}.alerts_legacy")
+
+        await conn.execute(f"CREATE INDEX ON {SCHEMA}.alerts_legacy (rule_id, lot_id)")
+        await conn.execute(f"CREATE INDEX ON {SCHEMA}.alerts (rule_id, lot_id)")
+        legacy_indexed = await _measure_lookups(conn, "alerts_legacy", samples)
+        normalized = await _measure_lookups(conn, "alerts", samples)
+        legacy_indexed_sizes = await conn.fetchrow(SIZE_QUERY, f"{SCHEMA}.alerts_legacy")
+        normalized_sizes = await conn.fetchrow(SIZE_QUERY, f"{SCHEMA}.alerts")
+
+        logger.info("")
+        logger.info(f"{'layout':<28}{'table':>12}{'indexes':>12}{'dedupe avg':>14}")
+        logger.info(
+            f"{'strings, no dedupe index':<28}{_mb(legacy_sizes[0]):>12}{_mb(legacy_sizes[1]):>12}"
+            f"{legacy_no_index:>11.3f} ms"
+        )
+        logger.info(
+            f"{'strings + (rule_id, lot_id)':<28}{_mb(legacy_indexed_sizes[0]):>12}"
+            f"{_mb(legacy_indexed_sizes[1]):>12}{legacy_indexed:>11.3f} ms"
+        )
+        logger.info(
+            f"{'model_id + (rule_id, lot_id)':<28}{_mb(normalized_sizes[0]):>12}"
+            f"{_mb(normalized_sizes[1]):>12}{normalized:>11.3f} ms"
+        )
+        logger.info(
+            f"\nTable size reduced by {100 * (1 - normalized_sizes[0] / legacy_sizes[0]):.0f}%"
+        )
+    finally:
+        await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000, help="Количество алертов")
+    parser.add_argument("--lookups", type=int, default=2000, help="Количество проверок дубликатов")
+    parser.add_argument("--rules", type=int, default=500, help="Количество правил")
+    args = parser.parse_args()
+    asyncio.run(run(args.rows, args.lookups, args.rules))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Проверка шардирования мониторинга несколькими процессами на одной БД.
+
+Запускает --instances процессов, каждый со своим ShardCoordinator
+(TRACKER_SHARDS=--shards, TRACKER_SHARD_LEASE=--lease), и раз в треть аренды
+печатает, сколько шардов у какого экземпляра. Через --kill-after секунд
+первый процесс убивается SIGKILL (без освобождения шардов) - его шарды
+должны разойтись по остальным после истечения аренды.
+
+Запуск (нужна доступная БД из .env):
+    python -m benchmarks.shard_rebalance --instances 3 --shards 16 --lease 6 --kill-after 15
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import subprocess
+import sys
+import time
+
+from src.database import get_db_connection, init_database
+
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+logger = logging.getLogger(__name__)
+
+OWNERS_QUERY = """
+    SELECT owner, COUNT(*) AS shards FROM tracker_shards
+    WHERE owner IS NOT NULL AND lease_until > CURRENT_TIMESTAMP AND shard_id < $1
+    GROUP BY owner ORDER BY owner
+"""
+
+
+async def run_worker(instance_id: str) -> None:
+    """Процесс-экземпляр: только координатор шардов, без проверки цен."""
+    from src.services.shard_coordinator import ShardCoordinator
+
+    db = get_db_connection()
+    await db.connect()
+    coordinator = ShardCoordinator(instance_id=instance_id)
+    try:
+        await coordinator.start()
+    finally:
+        await coordinator.stop()
+        await db.disconnect()
+
+
+async def run_monitor(args: argparse.Namespace) -> None:
+    db = get_db_connection()
+    await db.connect()
+    await init_database()
+
+    env = dict(os.environ, TRACKER_SHARDS=str(args.shards), TRACKER_SHARD_LEASE=str(args.lease))
+    workers = [
+        subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.shard_rebalance", "--worker", f"bench-{index}"],
+            env=env,
+            stdout=subprocess.DEVNULL,
+        )
+        for index in range(args.instances)
+    ]
+    logger.info(f"Started {args.instances} instances, {args.shards} shards, lease {args.lease}s")
+
+    started = time.monotonic()
+    killed = False
+    try:
+        while time.monotonic() - started < args.duration:
+            await asyncio.sleep(args.lease / 3)
+            elapsed = time.monotonic() - started
+
+            if not killed and elapsed >= args.kill_after:
+                workers[0].kill()
+                killed = True
+                logger.info(f"[{elapsed:5.1f}s] killed bench-0")
+
+            rows = await db.pool.fetch(OWNERS_QUERY, args.shards)
+            owners = ", ".join(f"{row['owner']}={row['shards']}" for row in rows)
+            unowned = args.shards - sum(row["shards"] for row in rows)
+            logger.info(f"[{elapsed:5.1f}s] {owners or '-'} (unowned {unowned})")
+    finally:
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.wait()
+        await db.disconnect()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--instances", type=int, default=3)
+    parser.add_argument("--shards", type=int, default=16)
+    parser.add_argument("--lease", type=float, default=6.0)
+    parser.add_argument("--duration", type=float, default=40.0)
+    parser.add_argument("--kill-after", type=float, default=15.0)
+    parser.add_argument("--worker", metavar="INSTANCE_ID", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    asyncio.run(run_worker(args.worker) if args.worker else run_monitor(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Бенчмарк приёма обновлений через webhook.
+
+Поднимает на localhost то же aiohttp приложение, что и BOT_MODE=webhook
+(create_webhook_app: проверка секрета, ограничение одновременных обновлений),
+с диспетчером из одного хендлера, который имитирует работу задержкой
+--handler-delay. Отправляет синтетические обновления параллельно с --clients
+соединений и измеряет, сколько запросов в секунду принимает сервер и сколько
+обновлений в секунду обрабатывают хендлеры.
+
+С --url обновления отправляются на уже запущенный webhook (измеряется только
+приём). Бот с настоящим токеном ответит на них в несуществующие чаты - для
+этого лучше тестовый бот.
+
+Запуск (БД и токен не нужны):
+    python -m benchmarks.webhook_throughput --updates 5000 --clients 50 --handler-delay 0.02
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+from typing import Optional
+
+import aiohttp
+from aiogram import Bot, Dispatcher
+from aiogram.types import Message
+from aiohttp import web
+
+from src.config import get_settings
+from src.webhook import create_webhook_app
+
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+logger = logging.getLogger(__name__)
+# Лог каждого запроса и обновления искажает замер
+logging.getLogger("aiohttp.access").setLevel(logging.WARNING)
+logging.getLogger("aiogram.event").setLevel(logging.WARNING)
+
+BENCH_TOKEN = "123456:BENCHMARK"
+
+
+def make_update(update_id: int) -> dict:
+    """Синтетическое обновление с текстовым сообщением."""
+    user_id = 1_000_000 + update_id % 100
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Bench"},
+            "text": "/bench",
+        },
+    }
+
+
+async def post_updates(url: str, updates: int, clients: int, secret: Optional[str]) -> float:
+    """Отправляет обновления и возвращает время приёма всех запросов (сек)."""
+    headers = {"X-Telegram-Bot-Api-Secret-Token": secret} if secret else {}
+    counter = iter(range(updates))
+    errors = 0
+
+    async def client(session: aiohttp.ClientSession) -> None:
+        nonlocal errors
+        for update_id in counter:
+            async with session.post(url, json=make_update(update_id), headers=headers) as response:
+                if response.status != 200:
+                    errors += 1
+
+    connector = aiohttp.TCPConnector(limit=clients)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        started = time.perf_counter()
+        await asyncio.gather(*(client(session) for _ in range(clients)))
+        elapsed = time.perf_counter() - started
+
+    if errors:
+        logger.warning(f"{errors} requests were rejected")
+    return elapsed
+
+
+async def run_local(args: argparse.Namespace) -> None:
+    settings = get_settings()
+    if args.max_concurrent:
+        settings.webhook_max_concurrent_updates = args.max_concurrent
+
+    handled = 0
+    done = asyncio.Event()
+
+    dp = Dispatcher()
+
+    @dp.message()
+    async def bench_handler(message: Message) -> None:
+        nonlocal handled
+        if args.handler_delay:
+            await asyncio.sleep(args.handler_delay)
+        handled += 1
+        if handled >= args.updates:
+            done.set()
+
+    bot = Bot(token=BENCH_TOKEN)
+    app = create_webhook_app(bot, dp)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host="127.0.0.1", port=args.port)
+    await site.start()
+
+    url = f"http://127.0.0.1:{args.port}{settings.webhook_path}"
+    logger.info(
+        f"Posting {args.updates} updates to {url} with {args.clients} clients, "
+        f"max concurrent updates {settings.webhook_max_concurrent_updates}, "
+        f"handler delay {args.handler_delay * 1000:.0f}ms"
+    )
+
+    started = time.perf_counter()
+    accepted_in = await post_updates(url, args.updates, args.clients, settings.webhook_secret)
+    await done.wait()
+    processed_in = time.perf_counter() - started
+
+    logger.info(f"accepted:  {args.updates / accepted_in:.0f} req/s ({accepted_in:.2f}s)")
+    logger.info(f"processed: {args.updates / processed_in:.0f} updates/s ({processed_in:.2f}s)")
+
+    await runner.cleanup()
+
+
+async def run_remote(args: argparse.Namespace) -> None:
+    settings = get_settings()
+    logger.info(f"Posting {args.updates} updates to {args.url} with {args.clients} clients")
+    accepted_in = await post_updates(args.url, args.updates, args.clients, settings.webhook_secret)
+    logger.info(f"accepted: {args.updates / accepted_in:.0f} req/s ({accepted_in:.2f}s)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--handler-delay", type=float, default=0.01, help="секунд работы хендлера")
+    parser.add_argument("--max-concurrent", type=int, default=0, help="вместо WEBHOOK_MAX_CONCURRENT_UPDATES")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--url", help="адрес запущенного webhook вместо локального сервера")
+    args = parser.parse_args()
+
+    asyncio.run(run_remote(args) if args.url else run_local(args))
+
+
+if __name__ == "__main__":
+    main()
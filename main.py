@@ -2,11 +2,25 @@
 
 import asyncio
 import logging
+import signal
+import sys
 
 from src.config import get_settings
 from src.database import get_db_connection, init_database
 from src.bot import create_bot, create_dispatcher
-from src.services import PriceTracker, TrackingPriceTracker, PortalsService
+from src.webhook import run_webhook
+from src.services import (
+    AlertDigest,
+    AlertOutbox,
+    MarketWatchEngine,
+    PortalsService,
+    get_alert_status_buffer,
+    get_price_history_recorder,
+    get_photo_cache,
+    get_fsm_storage,
+    get_group_index,
+)
+from src.services.user_cache import get_user_cache
 
 logging.basicConfig(
     level=logging.INFO,
@@ -14,14 +28,22 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# all - всё в одном процессе; bot, tracker, sender - раздельные процессы,
+# которые обмениваются алертами через outbox в PostgreSQL
+ROLES = ("all", "bot", "tracker", "sender")
+
 
-async def main():
+async def main(role: str = "all"):
     """;02=0O DC=:F8O 70?CA:0 ?@8;>65=8O."""
-    logger.info("Starting Portals Price Tracker Bot...")
+    logger.info(f"Starting Portals Price Tracker Bot (role: {role})...")
 
     settings = get_settings()
     logger.info(f"Loaded settings: DB={settings.db_name}@{settings.db_host}:{settings.db_port}")
 
+    runs_bot = role in ("all", "bot")
+    runs_tracker = role in ("all", "tracker")
+    runs_sender = role in ("all", "sender")
+
     db = get_db_connection()
     await db.connect()
     logger.info("Database connected")
@@ -29,44 +51,125 @@ async def main():
     await init_database()
     logger.info("Database initialized")
 
+    # Трекеру и отправителю бот нужен только для отправки сообщений
     bot = create_bot()
-    dp = create_dispatcher()
-
-    # Создаём один общий Portals API сервис (чтобы не было блокировок SQLite сессии)
-    portals_service = PortalsService()
-    bot.portals_service = portals_service  # Сохраняем для доступа из хендлеров
-    logger.info("Portals service created")
-
-    # Инициализируем API один раз перед использованием
-    await portals_service.init_auth()
-    logger.info("Portals service authenticated")
 
-    # Запускаем старый price tracker (legacy для gifts)
-    price_tracker = PriceTracker(bot, portals_service)
-    asyncio.create_task(price_tracker.start())
-    logger.info("Legacy price tracker started")
-
-    # Запускаем новый tracking price tracker (для правил отслеживания)
-    tracking_tracker = TrackingPriceTracker(bot, portals_service)
-    bot.tracking_tracker = tracking_tracker  # Сохраняем для доступа из хендлеров (приоритет интерфейса)
-    asyncio.create_task(tracking_tracker.start())
-    logger.info("Tracking price tracker started")
+    # Известные пользователи: рассылка алертов группе работает сразу после старта
+    user_cache = get_user_cache()
+    await user_cache.load()
+
+    # Группы пользователей (перечитываются по NOTIFY при изменении)
+    group_index = get_group_index()
+    await group_index.load()
+    asyncio.create_task(group_index.start())
+
+    dp = None
+    fsm_storage = None
+    if runs_bot:
+        dp = create_dispatcher()
+
+        # Очистка брошенных диалогов в хранилище FSM
+        fsm_storage = get_fsm_storage()
+        asyncio.create_task(fsm_storage.start())
+
+        # Запись пользователей, которых отмечает middleware доступа
+        asyncio.create_task(user_cache.start())
+
+    if runs_bot or runs_tracker:
+        # Создаём один общий Portals API сервис (чтобы не было блокировок SQLite сессии).
+        # Раздельные процессы используют разные сессии (PORTALS_SESSION_NAME)
+        portals_service = PortalsService()
+        bot.portals_service = portals_service  # Сохраняем для доступа из хендлеров
+        logger.info("Portals service created")
+
+        # Инициализируем API один раз перед использованием
+        await portals_service.init_auth()
+        logger.info("Portals service authenticated")
+
+    if runs_tracker or runs_sender:
+        # file_id уже загруженных картинок алертов
+        await get_photo_cache().load(bot)
+
+    alert_status_buffer = None
+    if runs_sender:
+        # Буфер отметок об отправке алертов (пишет sent_at пачками)
+        alert_status_buffer = get_alert_status_buffer()
+        asyncio.create_task(alert_status_buffer.start())
+        logger.info("Alert status buffer started")
+
+    price_history = None
+    market_watch = None
+    if runs_tracker:
+        # История цен маркета (наблюдения пишутся пачками через COPY)
+        price_history = get_price_history_recorder()
+        asyncio.create_task(price_history.start())
+
+        # Единый мониторинг маркета: legacy подарки (gifts) и правила отслеживания
+        market_watch = MarketWatchEngine(bot, portals_service, deliver_alerts=runs_sender)
+        if runs_bot:
+            bot.tracking_tracker = market_watch.rule_tracker  # Для доступа из хендлеров (приоритет интерфейса)
+        asyncio.create_task(market_watch.start())
+        logger.info("Market watch engine started")
+
+    outbox = None
+    if runs_sender and not runs_tracker:
+        # Отдельный процесс доставки: алерты из outbox, который пополняют трекеры
+        digest = AlertDigest(bot) if settings.alert_digest_enabled else None
+        outbox = AlertOutbox(bot, digest=digest)
+        asyncio.create_task(outbox.start())
 
     try:
-        logger.info("Starting bot polling...")
-        await dp.start_polling(bot)
+        if not runs_bot:
+            logger.info(f"Running as {role}, press Ctrl+C to stop")
+            await wait_for_shutdown_signal()
+        elif settings.bot_mode == "webhook":
+            logger.info("Starting bot in webhook mode...")
+            await run_webhook(bot, dp)
+        else:
+            # Webhook, оставшийся от запуска в режиме webhook, мешает getUpdates
+            await bot.delete_webhook()
+            logger.info("Starting bot polling...")
+            await dp.start_polling(bot)
     except KeyboardInterrupt:
         logger.info("Received shutdown signal")
     finally:
-        price_tracker.stop()
-        tracking_tracker.stop()
+        if market_watch is not None:
+            await market_watch.stop()
+        if outbox is not None:
+            await outbox.close()
+        if alert_status_buffer is not None:
+            await alert_status_buffer.stop()
+        if price_history is not None:
+            await price_history.stop()
+        if fsm_storage is not None:
+            await fsm_storage.close()
+        if runs_bot:
+            await user_cache.stop()
+        await group_index.stop()
         await db.disconnect()
         await bot.session.close()
         logger.info("Application shutdown complete")
 
 
+async def wait_for_shutdown_signal() -> None:
+    """Ждёт SIGINT/SIGTERM (для ролей без polling, где сигналы обрабатывает aiogram)."""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+
+
+def parse_role() -> str:
+    """Роль процесса: первый аргумент командной строки или APP_ROLE."""
+    role = sys.argv[1].lower() if len(sys.argv) > 1 else get_settings().app_role
+    if role not in ROLES:
+        raise SystemExit(f"Unknown role '{role}', expected one of: {', '.join(ROLES)}")
+    return role
+
+
 if __name__ == "__main__":
     try:
-        asyncio.run(main())
+        asyncio.run(main(parse_role()))
     except KeyboardInterrupt:
         logger.info("Application interrupted by user")
\ No newline at end of file
@@ -2,11 +2,11 @@
 
 import logging
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
 
 from src.config import get_settings
 from src.handlers import register_add_gift_handlers, register_menu_handlers, register_add_tracking_handlers
-from src.middleware import AccessControlMiddleware
+from src.middleware import AccessControlMiddleware, CallbackThrottleMiddleware
+from src.services.fsm_storage import get_fsm_storage
 
 logger = logging.getLogger(__name__)
 
@@ -19,14 +19,19 @@ def create_bot() -> Bot:
 
 def create_dispatcher() -> Dispatcher:
     """Создает и настраивает диспетчер."""
-    storage = MemoryStorage()
-    dp = Dispatcher(storage=storage)
+    # Состояния диалогов в PostgreSQL: переживают перезапуск, общие для экземпляров
+    dp = Dispatcher(storage=get_fsm_storage())
 
     # Подключаем middleware для контроля доступа
-    dp.message.middleware(AccessControlMiddleware())
-    dp.callback_query.middleware(AccessControlMiddleware())
+    # Один экземпляр на оба типа событий: общий лог и защита от флуда
+    access_control = AccessControlMiddleware()
+    dp.message.middleware(access_control)
+    dp.callback_query.middleware(access_control)
     logger.info("Access control middleware enabled")
 
+    # Повторные нажатия кнопок не доходят до хэндлеров (после проверки доступа)
+    dp.callback_query.middleware(CallbackThrottleMiddleware())
+
     # Регистрируем handlers (порядок важен!)
     register_menu_handlers(dp)  # Меню и навигация
     register_add_tracking_handlers(dp)  # Мастер добавления правил
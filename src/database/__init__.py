@@ -1,4 +1,5 @@
 from .connection import DatabaseConnection, get_db_connection
 from .models import init_database
+from .pool_metrics import InstrumentedPool, PoolMetrics
 
-__all__ = ["DatabaseConnection", "get_db_connection", "init_database"]
+__all__ = ["DatabaseConnection", "get_db_connection", "init_database", "InstrumentedPool", "PoolMetrics"]
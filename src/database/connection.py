@@ -1,59 +1,276 @@
 """Управление подключением к PostgreSQL базе данных."""
 
+import asyncio
 import asyncpg
-from typing import Optional
+from typing import Any, Callable, Dict, List, Optional
 import logging
 
 from src.config import get_settings
+from src.database.pool_metrics import InstrumentedPool, PoolMetrics
 
 logger = logging.getLogger(__name__)
 
+# Отставание реплики в секундах. Если реплика догнала primary (LSN совпадают),
+# отставание 0, даже если на primary давно не было записей.
+REPLICA_LAG_QUERY = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
 
 class DatabaseConnection:
     """Менеджер подключения к PostgreSQL базе данных."""
 
     def __init__(self):
-        self._pool: Optional[asyncpg.Pool] = None
+        self._pool: Optional[InstrumentedPool] = None
+        self._replica_pool: Optional[InstrumentedPool] = None
+        self._replica_fresh = False
+        self._replica_lag: Optional[float] = None
+        self._stats_task: Optional[asyncio.Task] = None
+        self._replica_task: Optional[asyncio.Task] = None
+        self._connect_kwargs: Dict[str, Any] = {}
+
+        # LISTEN/NOTIFY: отдельное соединение вне пула
+        self._listeners: Dict[str, List[Callable[[str], None]]] = {}
+        self._listen_conn: Optional[asyncpg.Connection] = None
+        self._listen_task: Optional[asyncio.Task] = None
 
     async def connect(self) -> None:
-        """Создает пул подключений к базе данных."""
+        """Создает пул подключений к базе данных (и к реплике, если настроена)."""
         if self._pool is not None:
             logger.warning("Database pool already exists")
             return
 
         settings = get_settings()
 
+        self._connect_kwargs = dict(
+            host=settings.db_host,
+            port=settings.db_port,
+            user=settings.db_user,
+            password=settings.db_password,
+            database=settings.db_name,
+        )
+
         try:
-            self._pool = await asyncpg.create_pool(
-                host=settings.db_host,
-                port=settings.db_port,
-                user=settings.db_user,
-                password=settings.db_password,
-                database=settings.db_name,
-                min_size=1,
-                max_size=10,
+            self._pool = await self._create_pool(**self._connect_kwargs)
+            logger.info(
+                f"Database pool created successfully "
+                f"(size {settings.db_pool_min_size}..{settings.db_pool_max_size}, "
+                f"command_timeout={settings.db_command_timeout}s, "
+                f"statement_timeout={settings.db_statement_timeout_ms}ms)"
             )
-            logger.info("Database pool created successfully")
         except Exception as e:
             logger.error(f"Failed to create database pool: {e}")
             raise
 
+        if settings.db_replica_dsn:
+            try:
+                self._replica_pool = await self._create_pool(dsn=settings.db_replica_dsn)
+                await self._check_replica_lag(settings.db_replica_max_lag)
+                logger.info("Read replica pool created successfully")
+            except Exception as e:
+                # Без реплики бот работает, все чтения идут на primary
+                logger.error(f"Failed to create read replica pool, using primary only: {e}")
+                self._replica_pool = None
+            else:
+                self._replica_task = asyncio.create_task(
+                    self._monitor_replica(settings.db_replica_check_interval, settings.db_replica_max_lag)
+                )
+
+        if settings.db_pool_stats_interval > 0:
+            self._stats_task = asyncio.create_task(
+                self._report_stats(settings.db_pool_stats_interval)
+            )
+
+    async def _create_pool(self, **connect_kwargs) -> InstrumentedPool:
+        """Создает пул с общими настройками размера, таймаутов и метрик."""
+        settings = get_settings()
+        metrics = PoolMetrics(slow_query_ms=settings.db_slow_query_ms)
+
+        async def init_connection(conn: asyncpg.Connection) -> None:
+            # Лог медленных запросов на каждом соединении пула
+            conn.add_query_logger(metrics.on_query)
+
+        pool = await asyncpg.create_pool(
+            **connect_kwargs,
+            min_size=settings.db_pool_min_size,
+            max_size=settings.db_pool_max_size,
+            command_timeout=settings.db_command_timeout or None,
+            max_inactive_connection_lifetime=settings.db_max_inactive_connection_lifetime,
+            statement_cache_size=settings.db_statement_cache_size,
+            server_settings={"statement_timeout": str(settings.db_statement_timeout_ms)},
+            init=init_connection,
+        )
+        return InstrumentedPool(pool, metrics)
+
     async def disconnect(self) -> None:
         """Закрывает пул подключений."""
         if self._pool is None:
             return
 
+        for task in (self._stats_task, self._replica_task, self._listen_task):
+            if task is not None:
+                task.cancel()
+        self._stats_task = None
+        self._replica_task = None
+        self._listen_task = None
+
+        if self._listen_conn is not None:
+            await self._listen_conn.close()
+            self._listen_conn = None
+
+        self.log_stats()
+
+        if self._replica_pool is not None:
+            await self._replica_pool.close()
+            self._replica_pool = None
+            self._replica_fresh = False
+
         await self._pool.close()
         self._pool = None
         logger.info("Database pool closed")
 
     @property
-    def pool(self) -> asyncpg.Pool:
+    def pool(self) -> InstrumentedPool:
         """Возвращает пул подключений."""
         if self._pool is None:
             raise RuntimeError("Database pool is not initialized. Call connect() first.")
         return self._pool
 
+    @property
+    def read_pool(self) -> InstrumentedPool:
+        """
+        Возвращает пул для read-only запросов.
+
+        Реплика используется, только если она настроена и её отставание
+        не превышает db_replica_max_lag, иначе возвращается primary.
+        """
+        if self._replica_pool is not None and self._replica_fresh:
+            return self._replica_pool
+        return self.pool
+
+    async def _check_replica_lag(self, max_lag: float) -> None:
+        """Измеряет отставание реплики и решает, можно ли с неё читать."""
+        try:
+            lag = float(await self._replica_pool.fetchval(REPLICA_LAG_QUERY))
+        except Exception as e:
+            if self._replica_fresh:
+                logger.warning(f"Read replica check failed, routing reads to primary: {e}")
+            self._replica_fresh = False
+            self._replica_lag = None
+            return
+
+        fresh = lag <= max_lag
+        if fresh != self._replica_fresh:
+            if fresh:
+                logger.info(f"Read replica is fresh (lag {lag:.1f}s), routing reads to replica")
+            else:
+                logger.warning(f"Read replica lag {lag:.1f}s > {max_lag}s, routing reads to primary")
+        self._replica_fresh = fresh
+        self._replica_lag = lag
+
+    async def _monitor_replica(self, interval: float, max_lag: float) -> None:
+        """Периодически проверяет отставание реплики."""
+        while True:
+            await asyncio.sleep(interval)
+            await self._check_replica_lag(max_lag)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Возвращает метрики пула (размер, занятые/свободные соединения, ожидание acquire)."""
+        if self._pool is None:
+            return {}
+
+        stats = self._pool.stats()
+        if self._replica_pool is not None:
+            stats["replica"] = self._replica_pool.stats()
+            stats["replica"].update(fresh=self._replica_fresh, lag=self._replica_lag)
+        return stats
+
+    def log_stats(self) -> None:
+        """Пишет метрики пула в лог."""
+        stats = self.get_stats()
+        if not stats:
+            return
+
+        pools = [("DB pool", stats)]
+        if "replica" in stats:
+            pools.append(("DB replica pool", stats["replica"]))
+
+        for name, pool_stats in pools:
+            logger.info(
+                f"{name}: size={pool_stats['size']} in_use={pool_stats['in_use']} idle={pool_stats['idle']} "
+                f"acquires={pool_stats['acquire_count']} errors={pool_stats['acquire_errors']} "
+                f"wait_avg={pool_stats['acquire_wait_avg_ms']}ms wait_max={pool_stats['acquire_wait_max_ms']}ms "
+                f"slow_queries={pool_stats['slow_queries']} histogram={pool_stats['acquire_wait_histogram']}"
+            )
+
+    async def listen(self, channel: str, callback: Callable[[str], None]) -> None:
+        """
+        Подписывает callback на NOTIFY канала.
+
+        Все подписки живут на одном отдельном соединении (не из пула), которое
+        переподключается при обрыве. После переподключения callback вызывается
+        с пустым payload - уведомления за время обрыва могли потеряться.
+
+        Args:
+            channel: Канал LISTEN
+            callback: Вызывается с payload уведомления
+        """
+        callbacks = self._listeners.setdefault(channel, [])
+        callbacks.append(callback)
+
+        if self._listen_conn is not None and len(callbacks) == 1:
+            await self._listen_conn.add_listener(channel, self._on_notify)
+        elif self._listen_task is None:
+            self._listen_task = asyncio.create_task(self._maintain_listener())
+
+    def _on_notify(self, conn: asyncpg.Connection, pid: int, channel: str, payload: str) -> None:
+        for callback in self._listeners.get(channel, []):
+            try:
+                callback(payload)
+            except Exception as e:
+                logger.error(f"Error in NOTIFY handler for channel {channel}: {e}")
+
+    async def _maintain_listener(self, retry_delay: float = 5.0) -> None:
+        """Держит соединение LISTEN и переподключает его при обрыве."""
+        reconnect = False
+        while True:
+            try:
+                conn = await asyncpg.connect(**self._connect_kwargs)
+                closed = asyncio.Event()
+                conn.add_termination_listener(lambda _: closed.set())
+                for channel in list(self._listeners):
+                    await conn.add_listener(channel, self._on_notify)
+                self._listen_conn = conn
+                logger.info(f"Listening for notifications on {', '.join(self._listeners)}")
+
+                if reconnect:
+                    for channel in list(self._listeners):
+                        self._on_notify(conn, 0, channel, "")
+
+                await closed.wait()
+                logger.warning("Notification connection lost, reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Failed to open notification connection: {e}")
+
+            self._listen_conn = None
+            reconnect = True
+            await asyncio.sleep(retry_delay)
+
+    async def _report_stats(self, interval: int) -> None:
+        """Периодически логирует метрики пула."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.log_stats()
+            except Exception as e:
+                logger.error(f"Failed to report database pool stats: {e}")
+
 
 # Singleton instance
 _db_connection: Optional[DatabaseConnection] = None
@@ -64,4 +281,4 @@ def get_db_connection() -> DatabaseConnection:
     global _db_connection
     if _db_connection is None:
         _db_connection = DatabaseConnection()
-    return _db_connection
\ No newline at end of file
+    return _db_connection
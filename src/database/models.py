@@ -5,11 +5,27 @@ from src.database.connection import get_db_connection
 
 logger = logging.getLogger(__name__)
 
+# Ключ pg_advisory_lock для инициализации схемы: процессы разных ролей стартуют
+# одновременно, а DDL (триггеры, функции, миграции) параллельно не выполняется
+INIT_DATABASE_LOCK_ID = 7240318001
+
+CREATE_DIMENSION_TABLES = """
+CREATE TABLE IF NOT EXISTS collections (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(255) NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS models (
+    id SERIAL PRIMARY KEY,
+    collection_id INTEGER NOT NULL REFERENCES collections(id),
+    name VARCHAR(255) NOT NULL,
+    UNIQUE (collection_id, name)
+);
+"""
 
 CREATE_GIFTS_TABLE = """
 CREATE TABLE IF NOT EXISTS gifts (
-    name VARCHAR(255) NOT NULL,
-    model VARCHAR(255) NOT NULL,
+    model_id INTEGER NOT NULL REFERENCES models(id),
     price DECIMAL(10, 2) DEFAULT 0,
     floor_price DECIMAL(10, 2) DEFAULT 0,
     photo_url TEXT,
@@ -18,7 +34,7 @@ CREATE TABLE IF NOT EXISTS gifts (
     user_id BIGINT NOT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    PRIMARY KEY (user_id, name, model)
+    PRIMARY KEY (user_id, model_id)
 );
 """
 
@@ -26,8 +42,8 @@ CREATE_TRACKING_RULES_TABLE = """
 CREATE TABLE IF NOT EXISTS tracking_rules (
     id SERIAL PRIMARY KEY,
     user_id BIGINT NOT NULL,
-    collection_name VARCHAR(255) NOT NULL,
-    model VARCHAR(255),
+    collection_id INTEGER NOT NULL REFERENCES collections(id),
+    model_id INTEGER REFERENCES models(id),
     condition_type VARCHAR(50) NOT NULL,
     target_price DECIMAL(10, 2),
     floor_discount_percent INTEGER,
@@ -48,16 +64,405 @@ CREATE TABLE IF NOT EXISTS alerts (
     lot_id VARCHAR(255) NOT NULL,
     lot_price DECIMAL(10, 2) NOT NULL,
     lot_floor_price DECIMAL(10, 2) NOT NULL,
-    collection_name VARCHAR(255) NOT NULL,
-    model VARCHAR(255) NOT NULL,
+    model_id INTEGER NOT NULL REFERENCES models(id),
     photo_url TEXT,
-    lot_url TEXT,
     sent_at TIMESTAMP,
+    claimed_until TIMESTAMP,
+    attempts SMALLINT NOT NULL DEFAULT 0,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (rule_id) REFERENCES tracking_rules(id) ON DELETE CASCADE
 );
 """
 
+# alerts - outbox доставки: воркер забирает строку на время claimed_until,
+# attempts ограничивает число повторов
+MIGRATE_ALERTS_OUTBOX = """
+ALTER TABLE alerts ADD COLUMN IF NOT EXISTS claimed_until TIMESTAMP;
+ALTER TABLE alerts ADD COLUMN IF NOT EXISTS attempts SMALLINT NOT NULL DEFAULT 0;
+"""
+
+# Картинка принадлежит лоту (фон и символ), а не модели: возвращаем её в alerts
+# для баз, где она переехала в models.photo_url
+MIGRATE_ALERTS_PHOTO = """
+ALTER TABLE alerts ADD COLUMN IF NOT EXISTS photo_url TEXT;
+ALTER TABLE models DROP COLUMN IF EXISTS photo_url;
+"""
+
+# Один алерт на лот для правила: вставка с ON CONFLICT DO NOTHING не даёт двум
+# экземплярам трекера (например, при передаче шарда) создать дубликат
+MIGRATE_ALERTS_UNIQUE_LOT = """
+DO $$
+BEGIN
+    IF NOT COALESCE(
+        (SELECT indisunique FROM pg_index WHERE indexrelid = to_regclass('idx_alerts_rule_lot')),
+        FALSE
+    ) THEN
+        DELETE FROM alerts a
+        USING alerts b
+        WHERE a.rule_id = b.rule_id AND a.lot_id = b.lot_id AND a.id > b.id;
+
+        DROP INDEX IF EXISTS idx_alerts_rule_lot;
+        CREATE UNIQUE INDEX idx_alerts_rule_lot ON alerts (rule_id, lot_id);
+    END IF;
+END $$;
+"""
+
+CREATE_PRICE_OBSERVATIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS price_observations (
+    observed_at TIMESTAMP NOT NULL,
+    model_id INTEGER NOT NULL,
+    lot_id VARCHAR(255) NOT NULL,
+    price DECIMAL(10, 2) NOT NULL,
+    floor_price DECIMAL(10, 2) NOT NULL
+);
+
+-- Данные пишутся строго по времени, BRIN почти ничего не весит
+CREATE INDEX IF NOT EXISTS idx_price_observations_observed_at
+    ON price_observations USING BRIN (observed_at);
+"""
+
+# file_id загруженных в Telegram картинок (file_id действителен только для своего бота)
+CREATE_TELEGRAM_PHOTOS_TABLE = """
+CREATE TABLE IF NOT EXISTS telegram_photos (
+    bot_id BIGINT NOT NULL,
+    photo_url TEXT NOT NULL,
+    file_id TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (bot_id, photo_url)
+);
+"""
+
+# Состояния диалогов (FSM aiogram). UNLOGGED: не пишется в WAL, после
+# аварийного рестарта PostgreSQL таблица очищается - для незаконченных
+# диалогов это приемлемо
+CREATE_FSM_STORAGE_TABLE = """
+CREATE UNLOGGED TABLE IF NOT EXISTS fsm_storage (
+    key TEXT PRIMARY KEY,
+    state TEXT,
+    data JSONB NOT NULL DEFAULT '{}',
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_fsm_storage_updated_at ON fsm_storage (updated_at);
+"""
+
+# Шардирование мониторинга: живые экземпляры трекера и аренда шардов
+CREATE_TRACKER_SHARDS_TABLES = """
+CREATE TABLE IF NOT EXISTS tracker_instances (
+    instance_id TEXT PRIMARY KEY,
+    heartbeat_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS tracker_shards (
+    shard_id INTEGER PRIMARY KEY,
+    owner TEXT,
+    lease_until TIMESTAMP
+);
+"""
+
+# Пользователи, писавшие боту: кэш username <-> user_id переживает перезапуск
+CREATE_USERS_TABLE = """
+CREATE TABLE IF NOT EXISTS users (
+    id BIGINT PRIMARY KEY,
+    username TEXT,
+    last_seen TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+# Группы пользователей: алерты правила получают все участники групп его владельца
+CREATE_USER_GROUPS_TABLES = """
+CREATE TABLE IF NOT EXISTS groups (
+    id SERIAL PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS group_members (
+    group_id INTEGER NOT NULL REFERENCES groups(id) ON DELETE CASCADE,
+    user_id BIGINT NOT NULL,
+    PRIMARY KEY (group_id, user_id)
+);
+"""
+
+# Группа, которая раньше была зашита в Settings.from_env (только при создании таблиц)
+SEED_USER_GROUPS = """
+INSERT INTO groups (name) VALUES ('team1') ON CONFLICT (name) DO NOTHING;
+
+INSERT INTO group_members (group_id, user_id)
+SELECT g.id, m.user_id
+FROM groups g,
+     (SELECT 256986671::bigint AS user_id
+      UNION
+      SELECT id FROM users WHERE username IN ('FCK_HOTLINE', 'maggmogg')) AS m
+WHERE g.name = 'team1'
+ON CONFLICT DO NOTHING;
+"""
+
+CREATE_PRICE_FLOOR_OHLC_TABLE = """
+CREATE TABLE IF NOT EXISTS price_floor_ohlc (
+    grain VARCHAR(10) NOT NULL,
+    bucket TIMESTAMP NOT NULL,
+    model_id INTEGER NOT NULL REFERENCES models(id),
+    open_price DECIMAL(10, 2) NOT NULL,
+    high_price DECIMAL(10, 2) NOT NULL,
+    low_price DECIMAL(10, 2) NOT NULL,
+    close_price DECIMAL(10, 2) NOT NULL,
+    samples INTEGER NOT NULL,
+    PRIMARY KEY (grain, model_id, bucket),
+    CONSTRAINT check_grain CHECK (grain IN ('minute', 'hour'))
+);
+"""
+
+# Перенос существующих данных со строковых collection_name/model на ссылки
+# в collections/models. Каждый шаг выполняется, только если в таблице ещё
+# есть старые колонки, поэтому миграция безопасна при повторном запуске.
+MIGRATE_TO_DIMENSION_TABLES = """
+DO $$
+BEGIN
+    -- tracking_rules: collection_name, model -> collection_id, model_id
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = current_schema()
+          AND table_name = 'tracking_rules' AND column_name = 'collection_name'
+    ) THEN
+        INSERT INTO collections (name)
+        SELECT DISTINCT collection_name FROM tracking_rules
+        ON CONFLICT (name) DO NOTHING;
+
+        INSERT INTO models (collection_id, name)
+        SELECT DISTINCT c.id, r.model
+        FROM tracking_rules r
+        JOIN collections c ON c.name = r.collection_name
+        WHERE r.model IS NOT NULL
+        ON CONFLICT (collection_id, name) DO NOTHING;
+
+        ALTER TABLE tracking_rules
+            ADD COLUMN IF NOT EXISTS collection_id INTEGER REFERENCES collections(id),
+            ADD COLUMN IF NOT EXISTS model_id INTEGER REFERENCES models(id);
+
+        UPDATE tracking_rules r
+        SET collection_id = c.id
+        FROM collections c
+        WHERE c.name = r.collection_name;
+
+        UPDATE tracking_rules r
+        SET model_id = m.id
+        FROM models m
+        WHERE m.collection_id = r.collection_id AND m.name = r.model;
+
+        ALTER TABLE tracking_rules
+            ALTER COLUMN collection_id SET NOT NULL,
+            DROP COLUMN collection_name,
+            DROP COLUMN model;
+    END IF;
+
+    -- alerts: collection_name, model, lot_url -> model_id
+    -- (lot_url строится из lot_id, photo_url свой у каждого лота и остаётся)
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = current_schema()
+          AND table_name = 'alerts' AND column_name = 'collection_name'
+    ) THEN
+        INSERT INTO collections (name)
+        SELECT DISTINCT collection_name FROM alerts
+        ON CONFLICT (name) DO NOTHING;
+
+        INSERT INTO models (collection_id, name)
+        SELECT DISTINCT c.id, a.model
+        FROM alerts a
+        JOIN collections c ON c.name = a.collection_name
+        ON CONFLICT (collection_id, name) DO NOTHING;
+
+        ALTER TABLE alerts ADD COLUMN IF NOT EXISTS model_id INTEGER REFERENCES models(id);
+
+        UPDATE alerts a
+        SET model_id = m.id
+        FROM models m
+        JOIN collections c ON c.id = m.collection_id
+        WHERE c.name = a.collection_name AND m.name = a.model;
+
+        ALTER TABLE alerts
+            ALTER COLUMN model_id SET NOT NULL,
+            DROP COLUMN collection_name,
+            DROP COLUMN model,
+            DROP COLUMN lot_url;
+    END IF;
+
+    -- gifts: name, model -> model_id (новый первичный ключ user_id, model_id)
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = current_schema()
+          AND table_name = 'gifts' AND column_name = 'name'
+    ) THEN
+        INSERT INTO collections (name)
+        SELECT DISTINCT name FROM gifts
+        ON CONFLICT (name) DO NOTHING;
+
+        INSERT INTO models (collection_id, name)
+        SELECT DISTINCT c.id, g.model
+        FROM gifts g
+        JOIN collections c ON c.name = g.name
+        ON CONFLICT (collection_id, name) DO NOTHING;
+
+        ALTER TABLE gifts ADD COLUMN IF NOT EXISTS model_id INTEGER REFERENCES models(id);
+
+        UPDATE gifts g
+        SET model_id = m.id
+        FROM models m
+        JOIN collections c ON c.id = m.collection_id
+        WHERE c.name = g.name AND m.name = g.model;
+
+        ALTER TABLE gifts DROP CONSTRAINT IF EXISTS gifts_pkey;
+        ALTER TABLE gifts
+            ALTER COLUMN model_id SET NOT NULL,
+            DROP COLUMN name,
+            DROP COLUMN model;
+        ALTER TABLE gifts ADD PRIMARY KEY (user_id, model_id);
+    END IF;
+
+    -- price_observations: collection_name, model -> model_id
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = current_schema()
+          AND table_name = 'price_observations' AND column_name = 'collection_name'
+    ) THEN
+        INSERT INTO collections (name)
+        SELECT DISTINCT collection_name FROM price_observations
+        ON CONFLICT (name) DO NOTHING;
+
+        INSERT INTO models (collection_id, name)
+        SELECT DISTINCT c.id, o.model
+        FROM price_observations o
+        JOIN collections c ON c.name = o.collection_name
+        ON CONFLICT (collection_id, name) DO NOTHING;
+
+        ALTER TABLE price_observations ADD COLUMN IF NOT EXISTS model_id INTEGER;
+
+        UPDATE price_observations o
+        SET model_id = m.id
+        FROM models m
+        JOIN collections c ON c.id = m.collection_id
+        WHERE c.name = o.collection_name AND m.name = o.model;
+
+        ALTER TABLE price_observations
+            ALTER COLUMN model_id SET NOT NULL,
+            DROP COLUMN collection_name,
+            DROP COLUMN model;
+    END IF;
+
+    -- price_floor_ohlc: свечи пересчитываются из наблюдений, старые можно удалить
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = current_schema()
+          AND table_name = 'price_floor_ohlc' AND column_name = 'collection_name'
+    ) THEN
+        DROP TABLE price_floor_ohlc;
+    END IF;
+END $$;
+"""
+
+# Денормализованная статистика правил: экраны меню читают её одной строкой,
+# не считая COUNT по alerts. Таблица отдельная, чтобы не трогать updated_at правила.
+CREATE_TRACKING_RULE_STATS_TABLE = """
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM information_schema.tables
+        WHERE table_schema = current_schema() AND table_name = 'tracking_rule_stats'
+    ) THEN
+        CREATE TABLE tracking_rule_stats (
+            rule_id INTEGER PRIMARY KEY REFERENCES tracking_rules(id) ON DELETE CASCADE,
+            alerts_count INTEGER NOT NULL DEFAULT 0,
+            last_alert_at TIMESTAMP,
+            last_lot_price DECIMAL(10, 2)
+        );
+
+        -- Заполняем по уже существующим алертам
+        INSERT INTO tracking_rule_stats (rule_id, alerts_count, last_alert_at, last_lot_price)
+        SELECT DISTINCT ON (rule_id)
+            rule_id,
+            COUNT(*) OVER (PARTITION BY rule_id),
+            created_at,
+            lot_price
+        FROM alerts
+        ORDER BY rule_id, created_at DESC, id DESC;
+    END IF;
+END $$;
+"""
+
+# Статистика обновляется при каждой вставке алерта (очистка старых алертов
+# счётчик не уменьшает - это число срабатываний за всё время)
+CREATE_TRACKING_RULE_STATS_TRIGGER = """
+CREATE OR REPLACE FUNCTION update_tracking_rule_stats()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO tracking_rule_stats (rule_id, alerts_count, last_alert_at, last_lot_price)
+    VALUES (NEW.rule_id, 1, NEW.created_at, NEW.lot_price)
+    ON CONFLICT (rule_id) DO UPDATE SET
+        alerts_count = tracking_rule_stats.alerts_count + 1,
+        last_alert_at = EXCLUDED.last_alert_at,
+        last_lot_price = EXCLUDED.last_lot_price;
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS update_alerts_rule_stats ON alerts;
+
+CREATE TRIGGER update_alerts_rule_stats
+    AFTER INSERT ON alerts
+    FOR EACH ROW
+    EXECUTE FUNCTION update_tracking_rule_stats();
+"""
+
+# Будит воркеры доставки в других процессах (LISTEN alerts_outbox)
+CREATE_ALERTS_NOTIFY_TRIGGER = """
+CREATE OR REPLACE FUNCTION notify_alerts_outbox()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('alerts_outbox', '');
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS notify_alerts_outbox ON alerts;
+
+CREATE TRIGGER notify_alerts_outbox
+    AFTER INSERT ON alerts
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notify_alerts_outbox();
+"""
+
+# Сообщает процессам об изменении групп (LISTEN user_groups), чтобы они перечитали индекс
+CREATE_USER_GROUPS_NOTIFY_TRIGGER = """
+CREATE OR REPLACE FUNCTION notify_user_groups()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('user_groups', '');
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS notify_user_groups ON groups;
+
+CREATE TRIGGER notify_user_groups
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON groups
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notify_user_groups();
+
+DROP TRIGGER IF EXISTS notify_user_groups ON group_members;
+
+CREATE TRIGGER notify_user_groups
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON group_members
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notify_user_groups();
+"""
+
+CREATE_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_alerts_pending ON alerts (id) WHERE sent_at IS NULL;
+DROP INDEX IF EXISTS idx_tracking_rules_user;
+CREATE INDEX IF NOT EXISTS idx_tracking_rules_user_created ON tracking_rules (user_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_tracking_rules_active_collection ON tracking_rules (collection_id, id) WHERE is_active;
+CREATE INDEX IF NOT EXISTS idx_gifts_model_user ON gifts (model_id, user_id);
+"""
+
 CREATE_UPDATED_AT_TRIGGER = """
 CREATE OR REPLACE FUNCTION update_updated_at_column()
 RETURNS TRIGGER AS $$
@@ -83,17 +488,46 @@ CREATE TRIGGER update_tracking_rules_updated_at
 
 
 async def init_database() -> None:
-    """Инициализирует структуру базы данных."""
+    """
+    Инициализирует структуру базы данных.
+
+    Выполняется под advisory lock: при раздельных процессах схему создаёт
+    первый стартовавший, остальные ждут его и проверяют уже готовую схему.
+    """
     db = get_db_connection()
     pool = db.pool
 
     async with pool.acquire() as conn:
+        await conn.execute("SELECT pg_advisory_lock($1)", INIT_DATABASE_LOCK_ID)
         try:
+            await conn.execute(CREATE_DIMENSION_TABLES)
             await conn.execute(CREATE_GIFTS_TABLE)
             await conn.execute(CREATE_TRACKING_RULES_TABLE)
             await conn.execute(CREATE_ALERTS_TABLE)
+            await conn.execute(CREATE_PRICE_OBSERVATIONS_TABLE)
+            async with conn.transaction():
+                await conn.execute(MIGRATE_TO_DIMENSION_TABLES)
+            await conn.execute(MIGRATE_ALERTS_OUTBOX)
+            await conn.execute(MIGRATE_ALERTS_PHOTO)
+            await conn.execute(MIGRATE_ALERTS_UNIQUE_LOT)
+            await conn.execute(CREATE_PRICE_FLOOR_OHLC_TABLE)
+            await conn.execute(CREATE_TELEGRAM_PHOTOS_TABLE)
+            await conn.execute(CREATE_FSM_STORAGE_TABLE)
+            await conn.execute(CREATE_TRACKER_SHARDS_TABLES)
+            await conn.execute(CREATE_USERS_TABLE)
+            groups_exist = await conn.fetchval("SELECT to_regclass('groups') IS NOT NULL")
+            await conn.execute(CREATE_USER_GROUPS_TABLES)
+            if not groups_exist:
+                await conn.execute(SEED_USER_GROUPS)
+            await conn.execute(CREATE_INDEXES)
+            await conn.execute(CREATE_TRACKING_RULE_STATS_TABLE)
             await conn.execute(CREATE_UPDATED_AT_TRIGGER)
+            await conn.execute(CREATE_TRACKING_RULE_STATS_TRIGGER)
+            await conn.execute(CREATE_ALERTS_NOTIFY_TRIGGER)
+            await conn.execute(CREATE_USER_GROUPS_NOTIFY_TRIGGER)
             logger.info("Database tables initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize database: {e}")
-            raise
\ No newline at end of file
+            raise
+        finally:
+            await conn.execute("SELECT pg_advisory_unlock($1)", INIT_DATABASE_LOCK_ID)
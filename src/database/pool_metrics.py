@@ -0,0 +1,170 @@
+"""Метрики пула подключений к PostgreSQL."""
+
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+import asyncpg
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограммы ожидания pool.acquire() (мс)
+ACQUIRE_WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class PoolMetrics:
+    """Счётчики пула: время ожидания acquire и медленные запросы."""
+
+    def __init__(self, slow_query_ms: int = 500, slow_query_log_size: int = 50):
+        self.slow_query_ms = slow_query_ms
+        # Последний бакет - всё, что дольше максимальной границы
+        self._wait_buckets: List[int] = [0] * (len(ACQUIRE_WAIT_BUCKETS_MS) + 1)
+        self._acquire_count = 0
+        self._acquire_wait_total_ms = 0.0
+        self._acquire_wait_max_ms = 0.0
+        self._acquire_errors = 0
+        self._slow_queries: Deque[Dict[str, Any]] = deque(maxlen=slow_query_log_size)
+        self._slow_query_count = 0
+
+    def observe_acquire(self, wait_seconds: float) -> None:
+        """Регистрирует время ожидания свободного соединения."""
+        wait_ms = wait_seconds * 1000
+        self._acquire_count += 1
+        self._acquire_wait_total_ms += wait_ms
+        self._acquire_wait_max_ms = max(self._acquire_wait_max_ms, wait_ms)
+
+        for idx, bound in enumerate(ACQUIRE_WAIT_BUCKETS_MS):
+            if wait_ms <= bound:
+                self._wait_buckets[idx] += 1
+                return
+        self._wait_buckets[-1] += 1
+
+    def observe_acquire_error(self) -> None:
+        """Регистрирует неудачный acquire (таймаут или закрытый пул)."""
+        self._acquire_errors += 1
+
+    def on_query(self, record: "asyncpg.connection.LoggedQuery") -> None:
+        """Query logger asyncpg: сохраняет запросы дольше порога."""
+        elapsed_ms = record.elapsed * 1000
+        if elapsed_ms < self.slow_query_ms:
+            return
+
+        self._slow_query_count += 1
+        query = " ".join(record.query.split())
+        self._slow_queries.append(
+            {
+                "query": query[:300],
+                "elapsed_ms": round(elapsed_ms, 1),
+                "error": repr(record.exception) if record.exception else None,
+                "at": time.time(),
+            }
+        )
+        logger.warning(f"Slow query ({elapsed_ms:.0f} ms): {query[:300]}")
+
+    def get_slow_queries(self) -> List[Dict[str, Any]]:
+        """Возвращает последние медленные запросы (новые в конце)."""
+        return list(self._slow_queries)
+
+    def snapshot(self, pool: Optional[asyncpg.Pool] = None) -> Dict[str, Any]:
+        """Возвращает текущие значения метрик."""
+        histogram = {
+            f"le_{bound}ms": count
+            for bound, count in zip(ACQUIRE_WAIT_BUCKETS_MS, self._wait_buckets)
+        }
+        histogram["inf"] = self._wait_buckets[-1]
+
+        stats: Dict[str, Any] = {
+            "acquire_count": self._acquire_count,
+            "acquire_errors": self._acquire_errors,
+            "acquire_wait_avg_ms": (
+                round(self._acquire_wait_total_ms / self._acquire_count, 2)
+                if self._acquire_count
+                else 0.0
+            ),
+            "acquire_wait_max_ms": round(self._acquire_wait_max_ms, 2),
+            "acquire_wait_histogram": histogram,
+            "slow_queries": self._slow_query_count,
+        }
+
+        if pool is not None:
+            size = pool.get_size()
+            idle = pool.get_idle_size()
+            stats.update(
+                size=size,
+                idle=idle,
+                in_use=size - idle,
+                min_size=pool.get_min_size(),
+                max_size=pool.get_max_size(),
+            )
+
+        return stats
+
+
+class _InstrumentedAcquireContext:
+    """Контекстный менеджер acquire с замером времени ожидания."""
+
+    def __init__(self, pool: asyncpg.Pool, metrics: PoolMetrics, timeout: Optional[float]):
+        self._pool = pool
+        self._metrics = metrics
+        self._timeout = timeout
+        self._conn: Optional[asyncpg.Connection] = None
+
+    async def __aenter__(self) -> asyncpg.Connection:
+        started = time.perf_counter()
+        try:
+            self._conn = await self._pool.acquire(timeout=self._timeout)
+        except Exception:
+            self._metrics.observe_acquire_error()
+            raise
+        self._metrics.observe_acquire(time.perf_counter() - started)
+        return self._conn
+
+    async def __aexit__(self, *exc) -> None:
+        conn, self._conn = self._conn, None
+        await self._pool.release(conn)
+
+
+class InstrumentedPool:
+    """
+    Обёртка над asyncpg.Pool, которая считает ожидание свободного соединения.
+
+    Повторяет интерфейс пула, которым пользуются репозитории
+    (fetch/fetchrow/fetchval/execute/executemany/acquire), остальные
+    атрибуты проксируются в исходный пул.
+    """
+
+    def __init__(self, pool: asyncpg.Pool, metrics: PoolMetrics):
+        self._pool = pool
+        self.metrics = metrics
+
+    def acquire(self, *, timeout: Optional[float] = None) -> _InstrumentedAcquireContext:
+        """Берёт соединение из пула (использовать через async with)."""
+        return _InstrumentedAcquireContext(self._pool, self.metrics, timeout)
+
+    async def fetch(self, query: str, *args, timeout: Optional[float] = None) -> List[asyncpg.Record]:
+        async with self.acquire() as conn:
+            return await conn.fetch(query, *args, timeout=timeout)
+
+    async def fetchrow(self, query: str, *args, timeout: Optional[float] = None) -> Optional[asyncpg.Record]:
+        async with self.acquire() as conn:
+            return await conn.fetchrow(query, *args, timeout=timeout)
+
+    async def fetchval(self, query: str, *args, column: int = 0, timeout: Optional[float] = None) -> Any:
+        async with self.acquire() as conn:
+            return await conn.fetchval(query, *args, column=column, timeout=timeout)
+
+    async def execute(self, query: str, *args, timeout: Optional[float] = None) -> str:
+        async with self.acquire() as conn:
+            return await conn.execute(query, *args, timeout=timeout)
+
+    async def executemany(self, command: str, args, *, timeout: Optional[float] = None) -> None:
+        async with self.acquire() as conn:
+            return await conn.executemany(command, args, timeout=timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        """Метрики пула вместе с текущим размером и числом занятых соединений."""
+        return self.metrics.snapshot(self._pool)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._pool, name)
@@ -7,6 +7,7 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
 from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
 
+from src.models import build_lot_url
 from src.repositories import GiftRepository
 from src.services import PortalsService
 
@@ -73,7 +74,7 @@ async def add_model(message: Message, state: FSMContext):
                     [
                         InlineKeyboardButton(
                             text="Открыть в Portals",
-                            url=f"https://t.me/portals/market?startapp=gift_{gift.gift_id}",
+                            url=build_lot_url(gift.gift_id),
                         )
                     ]
                 ]
@@ -1,9 +1,15 @@
 """Хэндлеры для добавления правил отслеживания."""
 
+import asyncio
 import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
+
 from aiogram import Router, F
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
+from aiogram.fsm.storage.base import StorageKey
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 
 from src.keyboards import (
@@ -14,6 +20,7 @@ from src.keyboards import (
     get_rule_created_keyboard,
     get_main_menu_keyboard,
 )
+from src.config import get_settings
 from src.models import TrackingRule, ConditionType
 from src.repositories import TrackingRuleRepository
 from src.services.portals_service import PortalsService
@@ -22,6 +29,13 @@ logger = logging.getLogger(__name__)
 
 router = Router()
 
+# Сколько начатых загрузок floor держать (брошенные мастера вытесняются первыми)
+FLOORS_PREFETCH_LIMIT = 1000
+
+# Загрузка floor, начатая при выборе коллекции:
+# ключ диалога -> (коллекция, monotonic время начала, задача), от старых к новым
+_floors_prefetch: "OrderedDict[StorageKey, Tuple[str, float, asyncio.Task[Dict[str, Any]]]]" = OrderedDict()
+
 
 class AddTracking(StatesGroup):
     """Состояния FSM для добавления правила отслеживания."""
@@ -32,10 +46,72 @@ class AddTracking(StatesGroup):
     waiting_floor_discount = State()
 
 
+def prefetch_floors(api: PortalsService, state: FSMContext, collection_name: str) -> None:
+    """Начинает загрузку floor моделей коллекции в фоне, пока пользователь выбирает модель."""
+    task = asyncio.create_task(api.filterFloors(gift_name=collection_name))
+    # Ошибка загрузки обработается в get_floors, здесь только не даём ей потеряться
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    now = time.monotonic()
+    _drop_prefetch(state.key)
+    _floors_prefetch[state.key] = (collection_name, now, task)
+
+    # Мастер могли бросить после выбора коллекции - старые загрузки не копим
+    ttl = get_settings().wizard_floors_ttl
+    while _floors_prefetch:
+        key, (_, started_at, _) = next(iter(_floors_prefetch.items()))
+        if now - started_at < ttl and len(_floors_prefetch) <= FLOORS_PREFETCH_LIMIT:
+            break
+        _drop_prefetch(key)
+
+
+def _drop_prefetch(key: StorageKey) -> None:
+    """Забывает начатую загрузку floor диалога (незаконченную отменяет)."""
+    prefetched = _floors_prefetch.pop(key, None)
+    if prefetched is not None and not prefetched[2].done():
+        prefetched[2].cancel()
+
+
+async def clear_wizard(state: FSMContext) -> None:
+    """Сбрасывает диалог мастера вместе с начатой загрузкой floor."""
+    _drop_prefetch(state.key)
+    await state.clear()
+
+
+async def get_floors(api: PortalsService, state: FSMContext, collection_name: str) -> Dict[str, Any]:
+    """
+    Возвращает floor моделей коллекции {model: floor} для шагов мастера.
+
+    Floor хранятся в данных диалога и запрашиваются у API заново только
+    старше wizard_floors_ttl секунд. Если загрузка уже начата при выборе
+    коллекции, ждём её, а не делаем второй запрос. Записывает в state
+    только сам хэндлер, поэтому фоновая загрузка не затирает данные
+    диалога, изменённые параллельно.
+    """
+    data = await state.get_data()
+    cached = data.get("floors")
+    if (
+        cached
+        and cached.get("collection") == collection_name
+        and time.time() - cached.get("fetched_at", 0) < get_settings().wizard_floors_ttl
+    ):
+        return cached["models"]
+
+    prefetched = _floors_prefetch.pop(state.key, None)
+    if prefetched is not None and prefetched[0] == collection_name:
+        floors_data = await prefetched[2]
+    else:
+        floors_data = await api.filterFloors(gift_name=collection_name)
+
+    models = floors_data.get("models", {})
+    await state.update_data(floors={"collection": collection_name, "models": models, "fetched_at": time.time()})
+    return models
+
+
 @router.callback_query(F.data == "menu:add_tracking")
 async def add_tracking_start(callback: CallbackQuery, state: FSMContext):
     """Начало создания правила отслеживания."""
-    await state.clear()
+    await clear_wizard(state)
 
     text = (
         "➕ Новое отслеживание\n\n"
@@ -91,12 +167,14 @@ async def process_collection_query(message: Message, state: FSMContext):
                 f"❌ Коллекции с названием '{query}' не найдены.\n\n"
                 "Попробуй другое название или используй /start чтобы начать заново."
             )
-            await state.clear()
+            await clear_wizard(state)
             return
 
-        # Сохраняем найденные коллекции в state
+        shown = matching[:10]  # Максимум 10
+
+        # В state только названия показанных коллекций, а не ответы API целиком
         await state.update_data(
-            found_collections=matching,
+            found_collection_names=[coll["name"] for coll in shown],
             search_query=query
         )
 
@@ -104,7 +182,7 @@ async def process_collection_query(message: Message, state: FSMContext):
         text = "Найдены коллекции:\n\n"
         buttons = []
 
-        for idx, coll in enumerate(matching[:10], 1):  # Максимум 10
+        for idx, coll in enumerate(shown, 1):
             text += f"{idx}️⃣ {coll['name']}\n"
 
             floor_price = coll.get('floor_price', 'N/A')
@@ -133,7 +211,7 @@ async def process_collection_query(message: Message, state: FSMContext):
             "❌ Ошибка при поиске. Попробуй позже.",
             reply_markup=get_main_menu_keyboard()
         )
-        await state.clear()
+        await clear_wizard(state)
 
 
 @router.callback_query(F.data.startswith("select_coll:"))
@@ -141,18 +219,22 @@ async def select_collection(callback: CallbackQuery, state: FSMContext):
     """Выбор коллекции из списка."""
     idx = int(callback.data.split(":")[1])
     data = await state.get_data()
-    collections = data.get("found_collections", [])
+    collection_names = data.get("found_collection_names", [])
 
-    if idx >= len(collections):
+    if idx >= len(collection_names):
         await callback.answer("Коллекция не найдена", show_alert=True)
         return
 
-    selected_coll = collections[idx]
-    await state.update_data(collection_name=selected_coll["name"])
+    collection_name = collection_names[idx]
+    await state.update_data(collection_name=collection_name)
+
+    # Floor понадобятся на следующих шагах - загружаем, пока пользователь выбирает модель
+    api = getattr(callback.bot, "portals_service", None) or PortalsService()
+    prefetch_floors(api, state, collection_name)
 
     # Переходим к выбору модели
     text = (
-        f"Коллекция: **{selected_coll['name']}**\n\n"
+        f"Коллекция: **{collection_name}**\n\n"
         f"Добавить фильтр по модели?\n\n"
         f"Например: `Wizard`, `Knight`, `Witch`…"
     )
@@ -203,8 +285,7 @@ async def process_model_name(message: Message, state: FSMContext):
     api = getattr(bot, "portals_service", None) or PortalsService()
     floor_info = ""
     try:
-        floors_data = await api.filterFloors(gift_name=collection_name)
-        models = floors_data.get("models", {})
+        models = await get_floors(api, state, collection_name)
 
         if model_name and model_name in models:
             floor_price = models[model_name]
@@ -240,8 +321,7 @@ async def select_model_from_list(callback: CallbackQuery, state: FSMContext):
     api = getattr(bot, "portals_service", None) or PortalsService()
 
     try:
-        floors_data = await api.filterFloors(gift_name=collection_name)
-        models = floors_data.get("models", {})
+        models = await get_floors(api, state, collection_name)
 
         if not models:
             await callback.answer("Модели не найдены для этой коллекции", show_alert=True)
@@ -327,8 +407,7 @@ async def show_condition_type_selection(callback: CallbackQuery, state: FSMConte
     api = getattr(bot, "portals_service", None) or PortalsService()
     floor_info = ""
     try:
-        floors_data = await api.filterFloors(gift_name=collection_name)
-        models = floors_data.get("models", {})
+        models = await get_floors(api, state, collection_name)
 
         if model and model in models:
             floor_price = models[model]
@@ -353,7 +432,7 @@ async def show_condition_type_selection(callback: CallbackQuery, state: FSMConte
 @router.callback_query(F.data == "condition:fixed_price")
 async def condition_fixed_price(callback: CallbackQuery, state: FSMContext):
     """Настройка фиксированной цены."""
-    await state.update_data(condition_type=ConditionType.FIXED_PRICE)
+    await state.update_data(condition_type=ConditionType.FIXED_PRICE.value)
 
     text = (
         "💰 Фиксированная цена\n\n"
@@ -369,7 +448,7 @@ async def condition_fixed_price(callback: CallbackQuery, state: FSMContext):
 @router.callback_query(F.data == "condition:floor_discount")
 async def condition_floor_discount(callback: CallbackQuery, state: FSMContext):
     """Настройка скидки от floor."""
-    await state.update_data(condition_type=ConditionType.FLOOR_DISCOUNT)
+    await state.update_data(condition_type=ConditionType.FLOOR_DISCOUNT.value)
 
     # Получаем данные для показа текущего floor
     data = await state.get_data()
@@ -380,8 +459,7 @@ async def condition_floor_discount(callback: CallbackQuery, state: FSMContext):
     bot = callback.bot
     api = getattr(bot, "portals_service", None) or PortalsService()
     try:
-        floors_data = await api.filterFloors(gift_name=collection_name)
-        models = floors_data.get("models", {})
+        models = await get_floors(api, state, collection_name)
 
         if model and model in models:
             floor_price = models[model]
@@ -493,7 +571,7 @@ async def confirm_create_rule(callback: CallbackQuery, state: FSMContext):
             user_id=user_id,
             collection_name=data.get("collection_name"),
             model=data.get("model"),
-            condition_type=data.get("condition_type"),
+            condition_type=ConditionType(data.get("condition_type")),
             target_price=data.get("target_price"),
             floor_discount_percent=data.get("floor_discount_percent"),
             is_active=True
@@ -511,7 +589,7 @@ async def confirm_create_rule(callback: CallbackQuery, state: FSMContext):
 
         await callback.message.edit_text(text, reply_markup=get_rule_created_keyboard())
         await callback.answer("✅ Правило создано!")
-        await state.clear()
+        await clear_wizard(state)
 
     except Exception as e:
         logger.error(f"Error creating rule: {e}", exc_info=True)
@@ -522,7 +600,7 @@ async def confirm_create_rule(callback: CallbackQuery, state: FSMContext):
 async def edit_rule(callback: CallbackQuery, state: FSMContext):
     """Редактирование правила (возврат к началу)."""
     await callback.answer("Редактирование пока не реализовано. Начни заново /start")
-    await state.clear()
+    await clear_wizard(state)
 
 
 def register_add_tracking_handlers(dp):
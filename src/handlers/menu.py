@@ -1,6 +1,9 @@
 """Хэндлеры для главного меню и навигации."""
 
 import logging
+from datetime import datetime
+from typing import Optional, Tuple
+
 from aiogram import Router, F
 from aiogram.filters import Command
 from aiogram.types import Message, CallbackQuery
@@ -11,8 +14,10 @@ from src.keyboards import (
     get_rule_actions_keyboard,
     get_delete_confirmation_keyboard,
 )
-from src.repositories import TrackingRuleRepository, AlertRepository
 from src.config import get_settings
+from src.models import TrackingRule
+from src.repositories import TrackingRuleRepository
+from src.services.group_index import get_group_index
 
 logger = logging.getLogger(__name__)
 
@@ -75,32 +80,65 @@ async def menu_my_trackings(callback: CallbackQuery):
     await show_my_trackings(callback.from_user.id, callback.from_user.username, callback.message, callback)
 
 
-async def show_my_trackings(user_id: int, username: str, message: Message, callback: CallbackQuery = None):
+@router.callback_query(F.data.startswith("rules:page:"))
+async def my_trackings_page(callback: CallbackQuery):
+    """Переход на соседнюю страницу списка правил."""
+    # rules:page:<newer|older>:<created_at>:<rule_id>
+    prefix, rule_id = callback.data.rsplit(":", 1)
+    _, _, direction, created_at = prefix.split(":", 3)
+    cursor = (datetime.fromisoformat(created_at), int(rule_id))
+
+    await show_my_trackings(
+        callback.from_user.id,
+        callback.from_user.username,
+        callback.message,
+        callback,
+        cursor=cursor,
+        newer=direction == "newer",
+    )
+
+
+def _page_callback(direction: str, rule: TrackingRule) -> str:
+    """callback_data перехода на страницу после/до правила (до 64 байт)."""
+    return f"rules:page:{direction}:{rule.created_at.isoformat()}:{rule.rule_id}"
+
+
+async def show_my_trackings(
+    user_id: int,
+    username: str,
+    message: Message,
+    callback: CallbackQuery = None,
+    cursor: Optional[Tuple[datetime, int]] = None,
+    newer: bool = False,
+):
     """
-    Показывает список правил отслеживания пользователя и его группы.
+    Показывает страницу правил отслеживания пользователя и его группы.
 
     Args:
         user_id: ID пользователя
         username: Username пользователя
         message: Объект сообщения
         callback: Объект callback (если вызов через inline кнопку)
+        cursor: (created_at, id) крайнего правила соседней страницы (None - первая страница)
+        newer: Показать правила новее cursor (страница назад)
     """
     rule_repo = TrackingRuleRepository()
-    settings = get_settings()
+    page_size = get_settings().rules_page_size
 
     try:
-        # Получаем user_id всех членов группы напрямую из settings
-        group_user_ids = settings.get_group_user_ids(username) if username else []
+        # user_id всех членов групп пользователя (включая его самого)
+        group_user_ids = list(get_group_index().members(user_id))
 
-        # Если нет данных в settings - используем только текущего пользователя
-        if not group_user_ids:
-            group_user_ids = [user_id]
-        elif user_id not in group_user_ids:
-            # Добавляем текущего пользователя если его нет
-            group_user_ids.append(user_id)
+        # Одна страница правил группы вместе со статистикой срабатываний
+        rules, has_more = await rule_repo.get_page_by_user_ids(group_user_ids, page_size, cursor, newer)
+        if cursor is not None and (not rules or (newer and not has_more)):
+            # Дошли до начала списка (или правила соседней страницы удалили) - показываем первую
+            cursor, newer = None, False
+            rules, has_more = await rule_repo.get_page_by_user_ids(group_user_ids, page_size)
 
-        # Получаем правила для всех user_id группы
-        rules = await rule_repo.get_by_user_ids(group_user_ids)
+        # Есть ли страницы новее и старее текущей
+        has_newer = has_more if newer else cursor is not None
+        has_older = cursor is not None if newer else has_more
 
         if not rules:
             text = (
@@ -131,7 +169,8 @@ async def show_my_trackings(user_id: int, username: str, message: Message, callb
                 elif rule.condition_type.value == "any_price":
                     text += f"   • любая цена\n"
 
-                text += f"   • статус: {status_emoji} {'активно' if rule.is_active else 'на паузе'}\n\n"
+                text += f"   • статус: {status_emoji} {'активно' if rule.is_active else 'на паузе'}\n"
+                text += f"   • срабатываний: {rule.alerts_count}\n\n"
 
             text += "\nВыбери правило, чтобы посмотреть детали или изменить."
 
@@ -146,6 +185,19 @@ async def show_my_trackings(user_id: int, username: str, message: Message, callb
                     [InlineKeyboardButton(text=button_text, callback_data=f"rule:view:{rule.rule_id}")]
                 )
 
+            # Переход по страницам
+            page_buttons = []
+            if has_newer:
+                page_buttons.append(
+                    InlineKeyboardButton(text="◀️ Новее", callback_data=_page_callback("newer", rules[0]))
+                )
+            if has_older:
+                page_buttons.append(
+                    InlineKeyboardButton(text="Старее ▶️", callback_data=_page_callback("older", rules[-1]))
+                )
+            if page_buttons:
+                buttons.append(page_buttons)
+
             buttons.append(
                 [InlineKeyboardButton(text="➕ Добавить", callback_data="menu:add_tracking")]
             )
@@ -180,20 +232,28 @@ async def rule_view(callback: CallbackQuery):
         bot.tracking_tracker.pause_user_alerts(callback.from_user.id)
 
     rule_id = int(callback.data.split(":")[2])
+    await show_rule(callback, rule_id)
+
+
+async def show_rule(callback: CallbackQuery, rule_id: int, use_replica: bool = True):
+    """
+    Показывает детали правила.
 
+    Args:
+        callback: Объект callback
+        rule_id: ID правила
+        use_replica: Читать правило с реплики (False - сразу после изменения)
+    """
     rule_repo = TrackingRuleRepository()
-    alert_repo = AlertRepository()
 
     try:
-        rule = await rule_repo.get_by_id(rule_id)
+        # Статистика срабатываний приходит вместе с правилом
+        rule = await rule_repo.get_by_id(rule_id, use_replica=use_replica)
 
         if not rule:
             await callback.answer("Правило не найдено", show_alert=True)
             return
 
-        # Получаем последние срабатывания
-        recent_alerts = await alert_repo.get_by_rule(rule_id, limit=5)
-
         model_text = rule.model if rule.model else "любая модель"
         text = f"📌 Правило #{rule.rule_id}\n\n"
         text += f"Коллекция: **{rule.collection_name}**\n"
@@ -210,12 +270,12 @@ async def rule_view(callback: CallbackQuery):
         status_text = "✅ активно" if rule.is_active else "⏸ на паузе"
         text += f"\nСтатус: {status_text}\n"
 
-        # Последние срабатывания
-        if recent_alerts:
-            text += "\n📊 Последние срабатывания:\n"
-            for alert in recent_alerts:
-                date_str = alert.created_at.strftime("%d.%m %H:%M") if alert.created_at else "N/A"
-                text += f"• {date_str} — {alert.lot_price} TON\n"
+        # Статистика срабатываний
+        if rule.alerts_count:
+            date_str = rule.last_alert_at.strftime("%d.%m %H:%M") if rule.last_alert_at else "N/A"
+            text += "\n📊 Срабатывания:\n"
+            text += f"• всего: {rule.alerts_count}\n"
+            text += f"• последнее: {date_str} — {rule.last_lot_price} TON\n"
         else:
             text += "\n📊 Срабатываний пока не было\n"
 
@@ -239,8 +299,8 @@ async def rule_toggle(callback: CallbackQuery):
         new_status = await rule_repo.toggle_active(rule_id)
         status_text = "включено" if new_status else "поставлено на паузу"
 
-        # Обновляем экран с деталями правила
-        await rule_view(callback)
+        # Обновляем экран с деталями правила (с primary, реплика может не успеть)
+        await show_rule(callback, rule_id, use_replica=False)
         await callback.answer(f"✅ Правило {status_text}", show_alert=False)
 
     except Exception as e:
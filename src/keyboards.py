@@ -112,6 +112,22 @@ def get_rule_created_keyboard() -> InlineKeyboardMarkup:
     )
 
 
+def get_digest_keyboard(lots: list) -> InlineKeyboardMarkup:
+    """
+    Клавиатура для дайджеста алертов.
+
+    Args:
+        lots: Список пар (номер, ссылка на лот)
+    """
+    buttons = [
+        [InlineKeyboardButton(text=f"🔗 Лот {number}", url=lot_url)]
+        for number, lot_url in lots
+    ]
+    buttons.append([InlineKeyboardButton(text="🏠 Главное меню", callback_data="menu:main")])
+
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
 def get_alert_keyboard(lot_url: str, rule_id: int) -> InlineKeyboardMarkup:
     """
     Клавиатура для уведомления об алерте.
@@ -1,3 +1,4 @@
 from .access_control import AccessControlMiddleware
+from .callback_throttle import CallbackThrottleMiddleware
 
-__all__ = ["AccessControlMiddleware"]
\ No newline at end of file
+__all__ = ["AccessControlMiddleware", "CallbackThrottleMiddleware"]
\ No newline at end of file
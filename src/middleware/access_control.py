@@ -1,7 +1,8 @@
 """Middleware для контроля доступа к боту."""
 
 import logging
-from typing import Callable, Dict, Any, Awaitable
+import time
+from typing import Callable, Dict, Any, Awaitable, FrozenSet, Iterable, Tuple
 
 from aiogram import BaseMiddleware
 from aiogram.types import Message, CallbackQuery
@@ -11,16 +12,72 @@ from src.services.user_cache import get_user_cache
 
 logger = logging.getLogger(__name__)
 
+# Сколько пользователей помнить для лога и защиты от флуда, прежде чем чистить истёкшие
+TRACKED_USERS_LIMIT = 10000
+
+
+def parse_allowlist(entries: Iterable[str]) -> Tuple[FrozenSet[int], FrozenSet[str]]:
+    """
+    Разбирает ALLOWED_USERS на id и username.
+
+    Числа считаются user_id, остальное - username (без @, без учёта регистра,
+    как и в Telegram).
+
+    Returns:
+        (разрешённые user_id, разрешённые username в нижнем регистре)
+    """
+    user_ids = set()
+    usernames = set()
+    for entry in entries:
+        entry = entry.strip().lstrip("@")
+        if not entry:
+            continue
+        if entry.isdigit():
+            user_ids.add(int(entry))
+        else:
+            usernames.add(entry.lower())
+    return frozenset(user_ids), frozenset(usernames)
+
 
 class AccessControlMiddleware(BaseMiddleware):
-    """Middleware для проверки доступа пользователей к боту."""
+    """
+    Middleware для проверки доступа пользователей к боту.
+
+    Проверка - два поиска по frozenset (user_id, затем username). Доступ
+    логируется не чаще раза в access_log_interval секунд на пользователя.
+    Неразрешённому пользователю отвечаем один раз за access_denied_window
+    секунд, остальные его события в окне молча отбрасываются - флуд не
+    расходует лимиты Telegram и не засоряет лог.
+    """
 
     def __init__(self):
         self.settings = get_settings()
-        self.allowed_users = self.settings.allowed_users
+        self.allowed_user_ids, self.allowed_usernames = parse_allowlist(self.settings.allowed_users or [])
+        self.log_interval = self.settings.access_log_interval
+        self.denied_window = self.settings.access_denied_window
         self.user_cache = get_user_cache()
+
+        # user_id -> monotonic время последней записи в лог о доступе
+        self._granted_logged: Dict[int, float] = {}
+        # user_id -> (monotonic время конца окна, сколько событий отброшено)
+        self._denied: Dict[int, Tuple[float, int]] = {}
+
+        # Статистика
+        self.denied_total = 0
+        self.dropped_total = 0
         super().__init__()
 
+    @property
+    def enabled(self) -> bool:
+        """Настроен ли whitelist (иначе доступ для всех)."""
+        return bool(self.allowed_user_ids or self.allowed_usernames)
+
+    def is_allowed(self, user_id: int, username: str | None) -> bool:
+        """Проверяет, разрешён ли пользователь."""
+        if user_id in self.allowed_user_ids:
+            return True
+        return bool(username) and username.lower() in self.allowed_usernames
+
     async def __call__(
         self,
         handler: Callable[[Message, Dict[str, Any]], Awaitable[Any]],
@@ -29,40 +86,71 @@ class AccessControlMiddleware(BaseMiddleware):
     ) -> Any:
         """Проверяет доступ пользователя перед обработкой события."""
 
+        user = event.from_user
+
         # Если whitelist не настроен - пропускаем всех
-        if not self.allowed_users:
+        if not self.enabled:
+            if user is not None:
+                self.user_cache.touch(user.id, user.username)
             return await handler(event, data)
 
-        # Получаем username пользователя
-        user = event.from_user
-        username = user.username
+        if user is None:
+            return None
 
-        # Проверяем доступ
-        if username and username in self.allowed_users:
+        if self.is_allowed(user.id, user.username):
             # Разрешённый пользователь - кэшируем и пропускаем
-            self.user_cache.add_user(username, user.id)
-            logger.info(f"Access granted for user @{username} (id: {user.id})")
+            self.user_cache.touch(user.id, user.username)
+            self._log_granted(user.id, user.username)
             return await handler(event, data)
-        else:
-            # Неразрешённый пользователь - отправляем "средний палец"
-            logger.warning(
-                f"Access denied for user @{username or 'NO_USERNAME'} "
-                f"(id: {user.id}, name: {user.full_name})"
-            )
-
-            # Формируем сообщение
-            response = (
-                "🖕\n\n"
-                "Доступ запрещён.\n"
-                "Этот бот только для избранных."
-            )
-
-            # Отправляем в зависимости от типа события
+
+        await self._deny(event)
+        # Прерываем обработку
+        return None
+
+    def _log_granted(self, user_id: int, username: str | None) -> None:
+        """Пишет в лог о доступе не чаще раза в log_interval на пользователя."""
+        now = time.monotonic()
+        if now - self._granted_logged.get(user_id, float("-inf")) < self.log_interval:
+            return
+
+        self._granted_logged[user_id] = now
+        if len(self._granted_logged) > TRACKED_USERS_LIMIT:
+            self._granted_logged = {
+                uid: logged for uid, logged in self._granted_logged.items() if now - logged < self.log_interval
+            }
+        logger.info(f"Access granted for user @{username} (id: {user_id})")
+
+    async def _deny(self, event: Message | CallbackQuery) -> None:
+        """Отвечает неразрешённому пользователю один раз за окно, остальное отбрасывает."""
+        user = event.from_user
+        now = time.monotonic()
+
+        window_end, dropped = self._denied.get(user.id, (0.0, 0))
+        if now < window_end:
+            self._denied[user.id] = (window_end, dropped + 1)
+            self.dropped_total += 1
+            return
+
+        if len(self._denied) > TRACKED_USERS_LIMIT:
+            self._denied = {uid: entry for uid, entry in self._denied.items() if now < entry[0]}
+        self._denied[user.id] = (now + self.denied_window, 0)
+        self.denied_total += 1
+
+        suppressed = f", {dropped} events dropped in previous window" if dropped else ""
+        logger.warning(
+            f"Access denied for user @{user.username or 'NO_USERNAME'} "
+            f"(id: {user.id}, name: {user.full_name}{suppressed})"
+        )
+
+        # Один запрос к Telegram на событие
+        try:
             if isinstance(event, Message):
-                await event.answer(response)
+                await event.answer(
+                    "🖕\n\n"
+                    "Доступ запрещён.\n"
+                    "Этот бот только для избранных."
+                )
             elif isinstance(event, CallbackQuery):
                 await event.answer("🖕 Доступ запрещён", show_alert=True)
-                await event.message.answer(response)
-
-            # Прерываем обработку
-            return None
\ No newline at end of file
+        except Exception as e:
+            logger.debug(f"Failed to answer denied user {user.id}: {e}")
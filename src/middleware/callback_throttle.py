@@ -0,0 +1,108 @@
+"""Middleware для защиты от повторных нажатий inline кнопок."""
+
+import asyncio
+import logging
+import time
+from typing import Callable, Dict, Any, Awaitable, Set, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery
+
+from src.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Сколько нажатий помнить, прежде чем чистить истёкшие
+TRACKED_CALLBACKS_LIMIT = 10000
+
+
+class CallbackThrottleMiddleware(BaseMiddleware):
+    """
+    Схлопывает повторные нажатия кнопок и отбрасывает устаревшие.
+
+    Нажатие с теми же callback data, что уже обрабатывается или было
+    обработано меньше callback_throttle_window секунд назад, не доходит
+    до хэндлера. Нажатия одного пользователя обрабатываются по очереди;
+    если, пока нажатие ждёт очереди, по тому же сообщению пришло более
+    новое, ждущее отбрасывается - его результат всё равно был бы
+    перезаписан. Отброшенным нажатиям сразу отвечаем, чтобы у
+    пользователя пропали часики на кнопке. Принятым отвечает хэндлер
+    (с текстом или alert), как и раньше.
+    """
+
+    def __init__(self):
+        self.window = get_settings().callback_throttle_window
+
+        # (user_id, data) -> monotonic время окончания обработки
+        self._recent: Dict[Tuple[int, str], float] = {}
+        # (user_id, data) ждущих очереди или обрабатываемых нажатий
+        self._in_flight: Set[Tuple[int, str]] = set()
+        # (user_id, сообщение) -> id самого нового нажатия по нему
+        self._latest: Dict[Tuple[int, Any], str] = {}
+        # user_id -> (очередь пользователя, сколько нажатий её ждут)
+        self._queues: Dict[int, Tuple[asyncio.Lock, int]] = {}
+
+        # Статистика
+        self.coalesced_total = 0
+        self.superseded_total = 0
+        super().__init__()
+
+    async def __call__(
+        self,
+        handler: Callable[[CallbackQuery, Dict[str, Any]], Awaitable[Any]],
+        event: CallbackQuery,
+        data: Dict[str, Any],
+    ) -> Any:
+        """Пропускает нажатие к хэндлеру, если оно не повтор и не устарело."""
+        user_id = event.from_user.id
+        key = (user_id, event.data or "")
+        now = time.monotonic()
+
+        if key in self._in_flight or now - self._recent.get(key, float("-inf")) < self.window:
+            self.coalesced_total += 1
+            logger.debug(f"Duplicate callback {event.data} from user {user_id} coalesced")
+            await self._answer(event)
+            return None
+
+        message_key = (user_id, event.message.message_id if event.message else event.inline_message_id)
+        self._latest[message_key] = event.id
+        self._in_flight.add(key)
+
+        lock, waiting = self._queues.get(user_id, (asyncio.Lock(), 0))
+        self._queues[user_id] = (lock, waiting + 1)
+        try:
+            async with lock:
+                if self._latest.get(message_key) != event.id:
+                    self.superseded_total += 1
+                    logger.debug(f"Callback {event.data} from user {user_id} superseded")
+                    await self._answer(event)
+                    return None
+
+                return await handler(event, data)
+        finally:
+            self._release(user_id, key, message_key, event.id)
+
+    def _release(self, user_id: int, key: Tuple[int, str], message_key: Tuple[int, Any], callback_id: str) -> None:
+        """Снимает отметки нажатия и удаляет очередь пользователя, если она пуста."""
+        now = time.monotonic()
+        self._in_flight.discard(key)
+        self._recent[key] = now
+        if self._latest.get(message_key) == callback_id:
+            del self._latest[message_key]
+
+        lock, waiting = self._queues[user_id]
+        if waiting > 1:
+            self._queues[user_id] = (lock, waiting - 1)
+        else:
+            del self._queues[user_id]
+
+        if len(self._recent) > TRACKED_CALLBACKS_LIMIT:
+            self._recent = {k: done for k, done in self._recent.items() if now - done < self.window}
+
+    @staticmethod
+    async def _answer(event: CallbackQuery) -> None:
+        """Отвечает на отброшенное нажатие, чтобы у кнопки пропали часики."""
+        try:
+            await event.answer()
+        except Exception as e:
+            logger.debug(f"Failed to answer callback {event.id}: {e}")
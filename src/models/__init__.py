@@ -1,5 +1,7 @@
 from .gift import Gift
 from .tracking_rule import TrackingRule, ConditionType
 from .alert import Alert
+from .price_history import PriceObservation, FloorCandle
+from .links import build_lot_url
 
-__all__ = ["Gift", "TrackingRule", "ConditionType", "Alert"]
\ No newline at end of file
+__all__ = ["Gift", "TrackingRule", "ConditionType", "Alert", "PriceObservation", "FloorCandle", "build_lot_url"]
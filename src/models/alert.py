@@ -4,6 +4,8 @@ from dataclasses import dataclass
 from typing import Optional
 from datetime import datetime
 
+from .links import build_lot_url
+
 
 @dataclass
 class Alert:
@@ -17,8 +19,7 @@ class Alert:
     collection_name: str
     model: str
     alert_id: Optional[int] = None
-    photo_url: Optional[str] = None
-    lot_url: Optional[str] = None
+    photo_url: Optional[str] = None  # картинка лота (фон и символ у каждого лота свои)
     sent_at: Optional[datetime] = None
     created_at: Optional[datetime] = None
 
@@ -35,11 +36,15 @@ class Alert:
             collection_name=row["collection_name"],
             model=row["model"],
             photo_url=row.get("photo_url"),
-            lot_url=row.get("lot_url"),
             sent_at=row.get("sent_at"),
             created_at=row.get("created_at"),
         )
 
+    @property
+    def lot_url(self) -> str:
+        """Ссылка на лот в Portals (строится из lot_id, в БД не хранится)."""
+        return build_lot_url(self.lot_id)
+
     def format_message(self) -> str:
         """Форматирует сообщение алерта для отправки пользователю."""
         message = "🔔 Найден подходящий лот\n\n"
@@ -56,4 +61,11 @@ class Alert:
 
         message += f"\n(удовлетворяет правилу #{self.rule_id})"
 
-        return message
\ No newline at end of file
+        return message
+
+    def format_short(self) -> str:
+        """Короткая строка алерта (для дайджеста)."""
+        return (
+            f"{self.collection_name} ({self.model}) — {self.lot_price} TON, "
+            f"floor {self.lot_floor_price} TON (правило #{self.rule_id})"
+        )
\ No newline at end of file
@@ -17,6 +17,7 @@ class Gift:
     photo_url: Optional[str] = None
     model_rarity: Optional[str] = None
     gift_id: Optional[str] = None
+    collection_id: Optional[int] = None
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
 
@@ -46,6 +47,7 @@ class Gift:
             photo_url=row.get("photo_url"),
             model_rarity=row.get("model_rarity"),
             gift_id=row.get("gift_id"),
+            collection_id=row.get("collection_id"),
             created_at=row.get("created_at"),
             updated_at=row.get("updated_at"),
         )
\ No newline at end of file
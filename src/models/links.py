@@ -0,0 +1,12 @@
+"""Ссылки на лоты в Portals маркете."""
+
+PORTALS_LOT_URL = "https://t.me/portals/market?startapp=gift_{lot_id}"
+
+
+def build_lot_url(lot_id: str) -> str:
+    """
+    Строит ссылку на лот в Portals.
+
+    lot_id включает UUID и суффикс (например: abc-123_k74zqq).
+    """
+    return PORTALS_LOT_URL.format(lot_id=lot_id)
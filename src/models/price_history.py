@@ -0,0 +1,69 @@
+"""Модели истории цен маркета."""
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict
+
+
+@dataclass
+class PriceObservation:
+    """Наблюдение цены лота в момент проверки."""
+
+    observed_at: datetime
+    collection_name: str
+    model: str
+    lot_id: str
+    price: float
+    floor_price: float
+
+    @classmethod
+    def from_lot(cls, lot: Dict[str, Any], floor_price: float, observed_at: datetime) -> "PriceObservation":
+        """Создает наблюдение из лота, полученного от Portals API."""
+        return cls(
+            observed_at=observed_at,
+            collection_name=lot.get("name", ""),
+            model=lot.get("model", ""),
+            lot_id=str(lot["id"]),
+            price=float(lot.get("price", 0) or 0),
+            floor_price=float(floor_price or 0),
+        )
+
+    def as_record(self, model_id: int) -> tuple:
+        """Кортеж в порядке колонок price_observations (для COPY)."""
+        return (
+            self.observed_at,
+            model_id,
+            self.lot_id,
+            self.price,
+            self.floor_price,
+        )
+
+
+@dataclass
+class FloorCandle:
+    """OHLC floor цены модели за интервал (минута или час)."""
+
+    grain: str
+    bucket: datetime
+    collection_name: str
+    model: str
+    open_price: float
+    high_price: float
+    low_price: float
+    close_price: float
+    samples: int
+
+    @classmethod
+    def from_db_row(cls, row: dict) -> "FloorCandle":
+        """Создает объект FloorCandle из строки БД."""
+        return cls(
+            grain=row["grain"],
+            bucket=row["bucket"],
+            collection_name=row["collection_name"],
+            model=row["model"],
+            open_price=float(row["open_price"]),
+            high_price=float(row["high_price"]),
+            low_price=float(row["low_price"]),
+            close_price=float(row["close_price"]),
+            samples=row["samples"],
+        )
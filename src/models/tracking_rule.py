@@ -26,9 +26,15 @@ class TrackingRule:
     target_price: Optional[float] = None  # Для FIXED_PRICE
     floor_discount_percent: Optional[int] = None  # Для FLOOR_DISCOUNT
     rule_id: Optional[int] = None
+    collection_id: Optional[int] = None
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
 
+    # Статистика срабатываний (поддерживается триггером на alerts)
+    alerts_count: int = 0
+    last_alert_at: Optional[datetime] = None
+    last_lot_price: Optional[float] = None
+
     @classmethod
     def from_db_row(cls, row: dict) -> "TrackingRule":
         """Создает объект TrackingRule из строки БД."""
@@ -36,6 +42,7 @@ class TrackingRule:
             rule_id=row["id"],
             user_id=row["user_id"],
             collection_name=row["collection_name"],
+            collection_id=row.get("collection_id"),
             model=row.get("model"),
             condition_type=ConditionType(row["condition_type"]),
             target_price=float(row["target_price"]) if row.get("target_price") else None,
@@ -43,6 +50,9 @@ class TrackingRule:
             is_active=row["is_active"],
             created_at=row.get("created_at"),
             updated_at=row.get("updated_at"),
+            alerts_count=row.get("alerts_count") or 0,
+            last_alert_at=row.get("last_alert_at"),
+            last_lot_price=float(row["last_lot_price"]) if row.get("last_lot_price") is not None else None,
         )
 
     def matches_lot(self, lot_price: float, floor_price: float) -> bool:
@@ -1,5 +1,23 @@
 from .gift_repository import GiftRepository
 from .tracking_rule_repository import TrackingRuleRepository
 from .alert_repository import AlertRepository
+from .price_history_repository import PriceHistoryRepository
+from .dimension_repository import DimensionRepository
+from .photo_cache_repository import PhotoCacheRepository
+from .fsm_storage_repository import FSMStorageRepository
+from .shard_repository import ShardRepository
+from .user_repository import UserRepository
+from .group_repository import GroupRepository
 
-__all__ = ["GiftRepository", "TrackingRuleRepository", "AlertRepository"]
+__all__ = [
+    "GiftRepository",
+    "TrackingRuleRepository",
+    "AlertRepository",
+    "PriceHistoryRepository",
+    "DimensionRepository",
+    "PhotoCacheRepository",
+    "FSMStorageRepository",
+    "ShardRepository",
+    "UserRepository",
+    "GroupRepository",
+]
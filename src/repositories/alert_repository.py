@@ -1,36 +1,51 @@
 """Репозиторий для работы с алертами (уведомлениями)."""
 
 import logging
-from typing import List, Optional
+from typing import Callable, List, Optional, Sequence, Tuple
 from datetime import datetime
 from src.database.connection import get_db_connection
 from src.models import Alert
+from src.repositories.dimension_repository import DimensionRepository
 
 logger = logging.getLogger(__name__)
 
+# Канал NOTIFY, в который триггер пишет при вставке алертов
+ALERTS_CHANNEL = "alerts_outbox"
+
+# Названия коллекции/модели берутся из справочников
+ALERT_SELECT = """
+    SELECT a.*, c.name AS collection_name, m.name AS model
+    FROM alerts a
+    JOIN models m ON m.id = a.model_id
+    JOIN collections c ON c.id = m.collection_id
+"""
+
 
 class AlertRepository:
     """Репозиторий для управления алертами в БД."""
 
     def __init__(self):
         self.db = get_db_connection()
+        self.dimensions = DimensionRepository()
 
-    async def create(self, alert: Alert) -> int:
+    async def create(self, alert: Alert) -> Optional[int]:
         """
         Создает новый алерт.
 
         Returns:
-            ID созданного алерта
+            ID созданного алерта или None, если алерт по этому лоту для
+            правила уже есть (например, создан другим экземпляром трекера)
         """
         query = """
             INSERT INTO alerts (
-                rule_id, user_id, lot_id, lot_price, lot_floor_price,
-                collection_name, model, photo_url, lot_url
+                rule_id, user_id, lot_id, lot_price, lot_floor_price, model_id, photo_url
             )
-            VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
+            VALUES ($1, $2, $3, $4, $5, $6, $7)
+            ON CONFLICT (rule_id, lot_id) DO NOTHING
             RETURNING id
         """
         try:
+            _, model_id = await self.dimensions.resolve(alert.collection_name, alert.model)
             row = await self.db.pool.fetchrow(
                 query,
                 alert.rule_id,
@@ -38,11 +53,12 @@ class AlertRepository:
                 alert.lot_id,
                 alert.lot_price,
                 alert.lot_floor_price,
-                alert.collection_name,
-                alert.model,
+                model_id,
                 alert.photo_url,
-                alert.lot_url,
             )
+            if row is None:
+                logger.debug(f"Alert for rule={alert.rule_id}, lot={alert.lot_id} already exists")
+                return None
             alert_id = row["id"]
             logger.info(f"Alert created: ID={alert_id}, rule={alert.rule_id}, lot={alert.lot_id}")
             return alert_id
@@ -52,7 +68,7 @@ class AlertRepository:
 
     async def get_by_id(self, alert_id: int) -> Optional[Alert]:
         """Получает алерт по ID."""
-        query = "SELECT * FROM alerts WHERE id = $1"
+        query = f"{ALERT_SELECT} WHERE a.id = $1"
         try:
             row = await self.db.pool.fetchrow(query, alert_id)
             if row:
@@ -70,14 +86,14 @@ class AlertRepository:
             rule_id: ID правила
             limit: Максимальное количество результатов
         """
-        query = """
-            SELECT * FROM alerts
-            WHERE rule_id = $1
-            ORDER BY created_at DESC
+        query = f"""
+            {ALERT_SELECT}
+            WHERE a.rule_id = $1
+            ORDER BY a.created_at DESC
             LIMIT $2
         """
         try:
-            rows = await self.db.pool.fetch(query, rule_id, limit)
+            rows = await self.db.read_pool.fetch(query, rule_id, limit)
             return [Alert.from_db_row(dict(row)) for row in rows]
         except Exception as e:
             logger.error(f"Failed to fetch alerts for rule {rule_id}: {e}")
@@ -91,14 +107,14 @@ class AlertRepository:
             user_id: ID пользователя
             limit: Максимальное количество результатов
         """
-        query = """
-            SELECT * FROM alerts
-            WHERE user_id = $1
-            ORDER BY created_at DESC
+        query = f"""
+            {ALERT_SELECT}
+            WHERE a.user_id = $1
+            ORDER BY a.created_at DESC
             LIMIT $2
         """
         try:
-            rows = await self.db.pool.fetch(query, user_id, limit)
+            rows = await self.db.read_pool.fetch(query, user_id, limit)
             return [Alert.from_db_row(dict(row)) for row in rows]
         except Exception as e:
             logger.error(f"Failed to fetch alerts for user {user_id}: {e}")
@@ -114,6 +130,141 @@ class AlertRepository:
             logger.error(f"Failed to mark alert as sent: {e}")
             raise
 
+    async def mark_many_as_sent(self, updates: Sequence[Tuple[int, datetime]]) -> int:
+        """
+        Отмечает пачку алертов как отправленные одним запросом.
+
+        Args:
+            updates: Пары (alert_id, sent_at)
+
+        Returns:
+            Количество обновлённых алертов
+        """
+        if not updates:
+            return 0
+
+        query = """
+            UPDATE alerts AS a
+            SET sent_at = u.sent_at
+            FROM UNNEST($1::int[], $2::timestamp[]) AS u(id, sent_at)
+            WHERE a.id = u.id
+        """
+        alert_ids = [alert_id for alert_id, _ in updates]
+        sent_ats = [sent_at for _, sent_at in updates]
+        try:
+            result = await self.db.pool.execute(query, alert_ids, sent_ats)
+            count = int(result.split()[-1]) if result else 0
+            logger.debug(f"{count} alerts marked as sent")
+            return count
+        except Exception as e:
+            logger.error(f"Failed to mark {len(updates)} alerts as sent: {e}")
+            raise
+
+    async def extend_claims(self, alert_ids: Sequence[int], lease_seconds: float) -> int:
+        """
+        Продлевает закрепление неотправленных алертов за воркером.
+
+        Args:
+            alert_ids: ID алертов
+            lease_seconds: На сколько секунд от текущего момента продлить
+
+        Returns:
+            Количество продлённых алертов
+        """
+        if not alert_ids:
+            return 0
+
+        query = """
+            UPDATE alerts
+            SET claimed_until = NOW() + make_interval(secs => $2)
+            WHERE id = ANY($1::int[]) AND sent_at IS NULL
+        """
+        try:
+            result = await self.db.pool.execute(query, list(alert_ids), lease_seconds)
+            return int(result.split()[-1]) if result else 0
+        except Exception as e:
+            logger.error(f"Failed to extend claim of {len(alert_ids)} alerts: {e}")
+            raise
+
+    async def count_pending(self, max_age_seconds: float, max_attempts: int) -> int:
+        """
+        Считает неотправленные алерты, которые ещё будут доставляться.
+
+        Args:
+            max_age_seconds: Более старые алерты не учитываются
+            max_attempts: Алерты с исчерпанными попытками не учитываются
+        """
+        query = """
+            SELECT COUNT(*) FROM alerts
+            WHERE sent_at IS NULL
+              AND created_at > NOW() - make_interval(secs => $1)
+              AND attempts < $2
+        """
+        try:
+            return await self.db.pool.fetchval(query, max_age_seconds, max_attempts)
+        except Exception as e:
+            logger.error(f"Failed to count pending alerts: {e}")
+            raise
+
+    async def listen_new(self, callback: Callable[[str], None]) -> None:
+        """Вызывает callback при вставке алертов (в том числе другими процессами)."""
+        await self.db.listen(ALERTS_CHANNEL, callback)
+
+    async def claim_pending(
+        self,
+        limit: int,
+        lease_seconds: float,
+        max_age_seconds: float,
+        max_attempts: int,
+    ) -> List[Alert]:
+        """
+        Забирает неотправленные алерты на доставку.
+
+        Строки, уже забранные другим воркером (claimed_until в будущем или
+        заблокированные параллельным claim), пропускаются. Если воркер не
+        отметил алерт отправленным до истечения claimed_until, алерт снова
+        станет доступен.
+
+        Args:
+            limit: Максимальное количество алертов
+            lease_seconds: На сколько секунд алерт закрепляется за воркером
+            max_age_seconds: Более старые алерты не доставляются
+            max_attempts: Максимальное число попыток доставки
+
+        Returns:
+            Забранные алерты
+        """
+        query = """
+            WITH claimed AS (
+                SELECT id FROM alerts
+                WHERE sent_at IS NULL
+                  AND (claimed_until IS NULL OR claimed_until < NOW())
+                  AND created_at > NOW() - make_interval(secs => $3)
+                  AND attempts < $4
+                ORDER BY id
+                LIMIT $1
+                FOR UPDATE SKIP LOCKED
+            ), updated AS (
+                UPDATE alerts a
+                SET claimed_until = NOW() + make_interval(secs => $2),
+                    attempts = a.attempts + 1
+                FROM claimed
+                WHERE a.id = claimed.id
+                RETURNING a.*
+            )
+            SELECT u.*, c.name AS collection_name, m.name AS model
+            FROM updated u
+            JOIN models m ON m.id = u.model_id
+            JOIN collections c ON c.id = m.collection_id
+            ORDER BY u.id
+        """
+        try:
+            rows = await self.db.pool.fetch(query, limit, lease_seconds, max_age_seconds, max_attempts)
+            return [Alert.from_db_row(dict(row)) for row in rows]
+        except Exception as e:
+            logger.error(f"Failed to claim pending alerts: {e}")
+            raise
+
     async def lot_already_alerted(self, rule_id: int, lot_id: str) -> bool:
         """
         Проверяет, был ли уже отправлен алерт по этому лоту для данного правила.
@@ -125,10 +276,9 @@ class AlertRepository:
         Returns:
             True если алерт уже существует
         """
-        query = "SELECT COUNT(*) FROM alerts WHERE rule_id = $1 AND lot_id = $2"
+        query = "SELECT EXISTS (SELECT 1 FROM alerts WHERE rule_id = $1 AND lot_id = $2)"
         try:
-            count = await self.db.pool.fetchval(query, rule_id, lot_id)
-            return count > 0
+            return await self.db.pool.fetchval(query, rule_id, lot_id)
         except Exception as e:
             logger.error(f"Failed to check if lot was alerted: {e}")
             raise
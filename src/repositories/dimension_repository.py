@@ -0,0 +1,103 @@
+"""Репозиторий справочников коллекций и моделей."""
+
+import logging
+from typing import Dict, Iterable, Optional, Tuple
+from src.database.connection import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+# Справочники только растут, поэтому кэш id общий на процесс и не инвалидируется
+_collection_ids: Dict[str, int] = {}
+_model_ids: Dict[Tuple[int, str], int] = {}
+
+
+class DimensionRepository:
+    """Репозиторий для получения суррогатных ключей коллекций и моделей."""
+
+    def __init__(self):
+        self.db = get_db_connection()
+
+    async def get_collection_id(self, name: str) -> int:
+        """Возвращает id коллекции, создавая запись при необходимости."""
+        collection_id = _collection_ids.get(name)
+        if collection_id is not None:
+            return collection_id
+
+        query = """
+            INSERT INTO collections (name)
+            VALUES ($1)
+            ON CONFLICT (name) DO UPDATE SET name = EXCLUDED.name
+            RETURNING id
+        """
+        try:
+            collection_id = await self.db.pool.fetchval(query, name)
+        except Exception as e:
+            logger.error(f"Failed to resolve collection '{name}': {e}")
+            raise
+
+        _collection_ids[name] = collection_id
+        return collection_id
+
+    async def get_model_id(self, collection_id: int, name: str) -> int:
+        """
+        Возвращает id модели, создавая запись при необходимости.
+
+        Args:
+            collection_id: ID коллекции
+            name: Название модели
+        """
+        key = (collection_id, name)
+        model_id = _model_ids.get(key)
+        if model_id is not None:
+            return model_id
+
+        query = """
+            INSERT INTO models (collection_id, name)
+            VALUES ($1, $2)
+            ON CONFLICT (collection_id, name) DO UPDATE SET name = EXCLUDED.name
+            RETURNING id
+        """
+        try:
+            model_id = await self.db.pool.fetchval(query, collection_id, name)
+        except Exception as e:
+            logger.error(f"Failed to resolve model '{name}' (collection {collection_id}): {e}")
+            raise
+
+        _model_ids[key] = model_id
+        return model_id
+
+    async def resolve(
+        self,
+        collection_name: str,
+        model_name: Optional[str] = None,
+        optional_model: bool = False,
+    ) -> Tuple[int, Optional[int]]:
+        """
+        Возвращает (collection_id, model_id) по названиям.
+
+        Лот без модели (пустая строка, как и в старой схеме) получает запись
+        models с пустым названием: model_id в alerts, gifts и
+        price_observations обязателен. None вместо model_id возвращается
+        только при optional_model=True - для правил, где модель не указана.
+        """
+        collection_id = await self.get_collection_id(collection_name)
+        if not model_name and optional_model:
+            return collection_id, None
+
+        model_id = await self.get_model_id(collection_id, model_name or "")
+        return collection_id, model_id
+
+    async def resolve_models(
+        self, pairs: Iterable[Tuple[str, str]]
+    ) -> Dict[Tuple[str, str], int]:
+        """
+        Возвращает model_id для набора пар (collection_name, model_name).
+
+        Returns:
+            Словарь {(collection_name, model_name): model_id}
+        """
+        result = {}
+        for collection_name, model_name in set(pairs):
+            _, model_id = await self.resolve(collection_name, model_name)
+            result[(collection_name, model_name)] = model_id
+        return result
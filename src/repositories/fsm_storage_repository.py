@@ -0,0 +1,83 @@
+"""Репозиторий для состояний диалогов (FSM)."""
+
+import json
+import logging
+from typing import Any, Dict, Optional, Tuple
+from src.database.connection import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+
+class FSMStorageRepository:
+    """Репозиторий для таблицы fsm_storage (состояние и данные диалога по ключу)."""
+
+    def __init__(self):
+        self.db = get_db_connection()
+
+    async def get(self, key: str, ttl_seconds: float) -> Optional[Tuple[Optional[str], Dict[str, Any]]]:
+        """
+        Возвращает состояние и данные диалога.
+
+        Args:
+            key: Ключ диалога (бот, чат, пользователь)
+            ttl_seconds: Записи, не обновлявшиеся дольше, считаются истёкшими
+
+        Returns:
+            (state, data) или None, если записи нет или она истекла
+        """
+        query = """
+            SELECT state, data FROM fsm_storage
+            WHERE key = $1 AND updated_at > CURRENT_TIMESTAMP - make_interval(secs => $2)
+        """
+        try:
+            row = await self.db.pool.fetchrow(query, key, ttl_seconds)
+        except Exception as e:
+            logger.error(f"Failed to fetch FSM state {key}: {e}")
+            raise
+
+        if row is None:
+            return None
+        return row["state"], json.loads(row["data"])
+
+    async def save(self, key: str, state: Optional[str], data: Dict[str, Any]) -> None:
+        """Сохраняет состояние и данные диалога."""
+        query = """
+            INSERT INTO fsm_storage (key, state, data, updated_at)
+            VALUES ($1, $2, $3::jsonb, CURRENT_TIMESTAMP)
+            ON CONFLICT (key) DO UPDATE SET
+                state = EXCLUDED.state,
+                data = EXCLUDED.data,
+                updated_at = EXCLUDED.updated_at
+        """
+        try:
+            await self.db.pool.execute(query, key, state, json.dumps(data, ensure_ascii=False))
+        except Exception as e:
+            logger.error(f"Failed to save FSM state {key}: {e}")
+            raise
+
+    async def delete(self, key: str) -> None:
+        """Удаляет диалог (state.clear())."""
+        query = "DELETE FROM fsm_storage WHERE key = $1"
+        try:
+            await self.db.pool.execute(query, key)
+        except Exception as e:
+            logger.error(f"Failed to delete FSM state {key}: {e}")
+            raise
+
+    async def delete_expired(self, ttl_seconds: float) -> int:
+        """
+        Удаляет диалоги, не обновлявшиеся дольше ttl_seconds.
+
+        Returns:
+            Количество удалённых записей
+        """
+        query = """
+            DELETE FROM fsm_storage
+            WHERE updated_at < CURRENT_TIMESTAMP - make_interval(secs => $1)
+        """
+        try:
+            result = await self.db.pool.execute(query, ttl_seconds)
+            return int(result.split()[-1]) if result else 0
+        except Exception as e:
+            logger.error(f"Failed to delete expired FSM states: {e}")
+            raise
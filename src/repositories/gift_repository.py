@@ -1,25 +1,36 @@
 """Репозиторий для работы с подарками в базе данных."""
 
 import logging
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional, Sequence
+from src.config import get_settings
 from src.database.connection import get_db_connection
 from src.models import Gift
+from src.repositories.dimension_repository import DimensionRepository
 
 logger = logging.getLogger(__name__)
 
+# name/model подарка - это коллекция и модель из справочников
+GIFT_SELECT = """
+    SELECT g.*, c.name AS name, m.name AS model, m.collection_id
+    FROM gifts g
+    JOIN models m ON m.id = g.model_id
+    JOIN collections c ON c.id = m.collection_id
+"""
+
 
 class GiftRepository:
     """Репозиторий для управления подарками в БД."""
 
     def __init__(self):
         self.db = get_db_connection()
+        self.dimensions = DimensionRepository()
 
     async def add_or_update(self, gift: Gift) -> None:
         """Добавляет или обновляет подарок в БД."""
         query = """
-            INSERT INTO gifts (name, model, price, floor_price, photo_url, model_rarity, gift_id, user_id)
-            VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
-            ON CONFLICT (user_id, name, model)
+            INSERT INTO gifts (model_id, price, floor_price, photo_url, model_rarity, gift_id, user_id)
+            VALUES ($1, $2, $3, $4, $5, $6, $7)
+            ON CONFLICT (user_id, model_id)
             DO UPDATE SET
                 price = EXCLUDED.price,
                 floor_price = EXCLUDED.floor_price,
@@ -28,10 +39,10 @@ class GiftRepository:
                 gift_id = EXCLUDED.gift_id
         """
         try:
+            _, model_id = await self.dimensions.resolve(gift.name, gift.model)
             await self.db.pool.execute(
                 query,
-                gift.name,
-                gift.model,
+                model_id,
                 gift.price,
                 gift.floor_price,
                 gift.photo_url,
@@ -44,9 +55,56 @@ class GiftRepository:
             logger.error(f"Failed to save gift: {e}")
             raise
 
+    async def add_or_update_many(self, gifts: List[Gift]) -> int:
+        """
+        Добавляет или обновляет пачку подарков одним запросом.
+
+        Если один и тот же подарок (user_id, name, model) встречается
+        несколько раз, сохраняется последний.
+
+        Returns:
+            Количество сохранённых подарков
+        """
+        unique = {(gift.user_id, gift.name, gift.model): gift for gift in gifts}
+        if not unique:
+            return 0
+
+        query = """
+            INSERT INTO gifts (model_id, price, floor_price, photo_url, model_rarity, gift_id, user_id)
+            SELECT * FROM UNNEST(
+                $1::int[], $2::numeric[], $3::numeric[],
+                $4::text[], $5::text[], $6::text[], $7::bigint[]
+            )
+            ON CONFLICT (user_id, model_id)
+            DO UPDATE SET
+                price = EXCLUDED.price,
+                floor_price = EXCLUDED.floor_price,
+                photo_url = EXCLUDED.photo_url,
+                model_rarity = EXCLUDED.model_rarity,
+                gift_id = EXCLUDED.gift_id
+        """
+        batch = list(unique.values())
+        try:
+            model_ids = await self.dimensions.resolve_models((gift.name, gift.model) for gift in batch)
+            await self.db.pool.execute(
+                query,
+                [model_ids[(gift.name, gift.model)] for gift in batch],
+                [gift.price for gift in batch],
+                [gift.floor_price for gift in batch],
+                [gift.photo_url for gift in batch],
+                [gift.model_rarity for gift in batch],
+                [gift.gift_id for gift in batch],
+                [gift.user_id for gift in batch],
+            )
+            logger.info(f"{len(batch)} gifts saved")
+            return len(batch)
+        except Exception as e:
+            logger.error(f"Failed to save {len(batch)} gifts: {e}")
+            raise
+
     async def get_all(self) -> List[Gift]:
         """Получает все подарки из БД."""
-        query = "SELECT * FROM gifts"
+        query = GIFT_SELECT
         try:
             rows = await self.db.pool.fetch(query)
             return [Gift.from_db_row(dict(row)) for row in rows]
@@ -54,9 +112,47 @@ class GiftRepository:
             logger.error(f"Failed to fetch all gifts: {e}")
             raise
 
+    async def iter_all(
+        self, batch_size: Optional[int] = None, shards: Optional[Sequence[int]] = None
+    ) -> AsyncIterator[List[Gift]]:
+        """
+        Обходит все подарки пачками (keyset пагинация по (model_id, user_id)).
+
+        Подарки упорядочены по модели, поэтому все подписки на одну пару
+        (коллекция, модель) идут подряд. Каждая пачка - отдельный короткий
+        запрос без транзакции: пока потребитель ходит в API и ждёт отправки
+        алертов, соединение не занято и не держит горизонт vacuum.
+
+        Args:
+            batch_size: Размер пачки (по умолчанию db_stream_batch_size)
+            shards: Только коллекции этих шардов (collection_id % tracker_shards),
+                None - все подарки
+        """
+        settings = get_settings()
+        batch_size = batch_size or settings.db_stream_batch_size
+        query = f"{GIFT_SELECT} WHERE (g.model_id, g.user_id) > ($1, $2)"
+        args = [batch_size]
+        if shards is not None:
+            query += " AND m.collection_id % $4 = ANY($5::int[])"
+            args += [settings.tracker_shards, list(shards)]
+        query += " ORDER BY g.model_id, g.user_id LIMIT $3"
+        last_key = (0, 0)
+        try:
+            while True:
+                rows = await self.db.pool.fetch(query, *last_key, *args)
+                if not rows:
+                    break
+                last_key = (rows[-1]["model_id"], rows[-1]["user_id"])
+                yield [Gift.from_db_row(dict(row)) for row in rows]
+                if len(rows) < batch_size:
+                    break
+        except Exception as e:
+            logger.error(f"Failed to stream gifts: {e}")
+            raise
+
     async def get_by_user(self, user_id: int) -> List[Gift]:
         """Получает все подарки конкретного пользователя."""
-        query = "SELECT * FROM gifts WHERE user_id = $1"
+        query = f"{GIFT_SELECT} WHERE g.user_id = $1"
         try:
             rows = await self.db.pool.fetch(query, user_id)
             return [Gift.from_db_row(dict(row)) for row in rows]
@@ -69,9 +165,11 @@ class GiftRepository:
     ) -> None:
         """Обновляет цены для конкретного подарка."""
         query = """
-            UPDATE gifts
+            UPDATE gifts AS g
             SET price = $1, floor_price = $2
-            WHERE user_id = $3 AND name = $4 AND model = $5
+            FROM models m
+            JOIN collections c ON c.id = m.collection_id
+            WHERE g.model_id = m.id AND g.user_id = $3 AND c.name = $4 AND m.name = $5
         """
         try:
             await self.db.pool.execute(query, new_price, new_floor, user_id, name, model)
@@ -80,9 +178,53 @@ class GiftRepository:
             logger.error(f"Failed to update prices: {e}")
             raise
 
+    async def update_prices_many(self, gifts: List[Gift]) -> int:
+        """
+        Обновляет цены для пачки подарков одним запросом.
+
+        Args:
+            gifts: Подарки с новыми price/floor_price (ключ - user_id, name, model)
+
+        Returns:
+            Количество обновлённых подарков
+        """
+        if not gifts:
+            return 0
+
+        query = """
+            UPDATE gifts AS g
+            SET price = u.price, floor_price = u.floor_price
+            FROM UNNEST(
+                $1::bigint[], $2::text[], $3::text[], $4::numeric[], $5::numeric[]
+            ) AS u(user_id, name, model, price, floor_price)
+            JOIN collections c ON c.name = u.name
+            JOIN models m ON m.collection_id = c.id AND m.name = u.model
+            WHERE g.user_id = u.user_id AND g.model_id = m.id
+        """
+        try:
+            result = await self.db.pool.execute(
+                query,
+                [gift.user_id for gift in gifts],
+                [gift.name for gift in gifts],
+                [gift.model for gift in gifts],
+                [gift.price for gift in gifts],
+                [gift.floor_price for gift in gifts],
+            )
+            count = int(result.split()[-1]) if result else 0
+            logger.info(f"Prices updated for {count} gifts")
+            return count
+        except Exception as e:
+            logger.error(f"Failed to update prices for {len(gifts)} gifts: {e}")
+            raise
+
     async def delete(self, user_id: int, name: str, model: str) -> None:
         """Удаляет подарок из БД."""
-        query = "DELETE FROM gifts WHERE user_id = $1 AND name = $2 AND model = $3"
+        query = """
+            DELETE FROM gifts AS g
+            USING models m
+            JOIN collections c ON c.id = m.collection_id
+            WHERE g.model_id = m.id AND g.user_id = $1 AND c.name = $2 AND m.name = $3
+        """
         try:
             await self.db.pool.execute(query, user_id, name, model)
             logger.info(f"Gift '{name}' ({model}) deleted for user {user_id}")
@@ -0,0 +1,40 @@
+"""Репозиторий для групп пользователей."""
+
+import logging
+from typing import Callable, Dict, List
+from src.database.connection import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+# Канал NOTIFY, в который пишет триггер на groups и group_members
+GROUPS_CHANNEL = "user_groups"
+
+
+class GroupRepository:
+    """Репозиторий для таблиц groups и group_members."""
+
+    def __init__(self):
+        self.db = get_db_connection()
+
+    async def get_members(self) -> Dict[int, List[int]]:
+        """
+        Возвращает участников всех групп.
+
+        Returns:
+            Словарь {group_id: [user_id, ...]}
+        """
+        query = "SELECT group_id, user_id FROM group_members ORDER BY group_id, user_id"
+        try:
+            rows = await self.db.pool.fetch(query)
+        except Exception as e:
+            logger.error(f"Failed to fetch group members: {e}")
+            raise
+
+        groups: Dict[int, List[int]] = {}
+        for row in rows:
+            groups.setdefault(row["group_id"], []).append(row["user_id"])
+        return groups
+
+    async def listen_changes(self, callback: Callable[[str], None]) -> None:
+        """Вызывает callback при изменении групп (в том числе другими процессами)."""
+        await self.db.listen(GROUPS_CHANNEL, callback)
@@ -0,0 +1,70 @@
+"""Репозиторий для file_id картинок, загруженных в Telegram."""
+
+import logging
+from typing import Dict, Optional
+from src.database.connection import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+
+class PhotoCacheRepository:
+    """Репозиторий для соответствия photo_url -> file_id Telegram."""
+
+    def __init__(self):
+        self.db = get_db_connection()
+
+    async def get(self, bot_id: int, photo_url: str) -> Optional[str]:
+        """Возвращает сохранённый file_id картинки или None."""
+        query = "SELECT file_id FROM telegram_photos WHERE bot_id = $1 AND photo_url = $2"
+        try:
+            return await self.db.pool.fetchval(query, bot_id, photo_url)
+        except Exception as e:
+            logger.error(f"Failed to fetch file_id for photo {photo_url}: {e}")
+            raise
+
+    async def get_recent(self, bot_id: int, limit: int) -> Dict[str, str]:
+        """
+        Возвращает последние сохранённые картинки бота.
+
+        Returns:
+            Словарь {photo_url: file_id}, от старых к новым
+        """
+        query = """
+            SELECT photo_url, file_id FROM (
+                SELECT photo_url, file_id, created_at
+                FROM telegram_photos
+                WHERE bot_id = $1
+                ORDER BY created_at DESC
+                LIMIT $2
+            ) AS recent
+            ORDER BY created_at
+        """
+        try:
+            rows = await self.db.pool.fetch(query, bot_id, limit)
+            return {row["photo_url"]: row["file_id"] for row in rows}
+        except Exception as e:
+            logger.error(f"Failed to fetch cached photos: {e}")
+            raise
+
+    async def save(self, bot_id: int, photo_url: str, file_id: str) -> None:
+        """Сохраняет (или обновляет) file_id картинки."""
+        query = """
+            INSERT INTO telegram_photos (bot_id, photo_url, file_id)
+            VALUES ($1, $2, $3)
+            ON CONFLICT (bot_id, photo_url)
+            DO UPDATE SET file_id = EXCLUDED.file_id, created_at = CURRENT_TIMESTAMP
+        """
+        try:
+            await self.db.pool.execute(query, bot_id, photo_url, file_id)
+        except Exception as e:
+            logger.error(f"Failed to save file_id for photo {photo_url}: {e}")
+            raise
+
+    async def delete(self, bot_id: int, photo_url: str) -> None:
+        """Удаляет устаревший file_id картинки."""
+        query = "DELETE FROM telegram_photos WHERE bot_id = $1 AND photo_url = $2"
+        try:
+            await self.db.pool.execute(query, bot_id, photo_url)
+        except Exception as e:
+            logger.error(f"Failed to delete file_id for photo {photo_url}: {e}")
+            raise
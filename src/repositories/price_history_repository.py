@@ -0,0 +1,159 @@
+"""Репозиторий для истории цен маркета."""
+
+import logging
+from datetime import datetime
+from typing import List, Optional
+from src.database.connection import get_db_connection
+from src.models import PriceObservation, FloorCandle
+from src.repositories.dimension_repository import DimensionRepository
+
+logger = logging.getLogger(__name__)
+
+OBSERVATION_COLUMNS = ["observed_at", "model_id", "lot_id", "price", "floor_price"]
+
+# Гранулярности свёртки OHLC (значения подходят для date_trunc)
+ROLLUP_GRAINS = ("minute", "hour")
+
+
+class PriceHistoryRepository:
+    """Репозиторий для записи наблюдений цен и свёрток floor OHLC."""
+
+    def __init__(self):
+        self.db = get_db_connection()
+        self.dimensions = DimensionRepository()
+
+    async def copy_observations(self, observations: List[PriceObservation]) -> int:
+        """
+        Записывает наблюдения через COPY.
+
+        Returns:
+            Количество записанных строк
+        """
+        if not observations:
+            return 0
+
+        try:
+            model_ids = await self.dimensions.resolve_models(
+                (observation.collection_name, observation.model) for observation in observations
+            )
+            records = [
+                observation.as_record(model_ids[(observation.collection_name, observation.model)])
+                for observation in observations
+            ]
+            async with self.db.pool.acquire() as conn:
+                await conn.copy_records_to_table(
+                    "price_observations",
+                    records=records,
+                    columns=OBSERVATION_COLUMNS,
+                )
+            logger.debug(f"Copied {len(observations)} price observations")
+            return len(observations)
+        except Exception as e:
+            logger.error(f"Failed to copy price observations: {e}")
+            raise
+
+    async def rollup(self, grain: str, since: datetime) -> int:
+        """
+        Пересчитывает floor OHLC для интервалов, начиная с since.
+
+        Интервалы пересчитываются целиком из сырых наблюдений, поэтому
+        повторный запуск по тому же окну безопасен.
+
+        Args:
+            grain: Гранулярность ('minute' или 'hour')
+            since: Начало окна пересчёта
+
+        Returns:
+            Количество обновлённых свечей
+        """
+        if grain not in ROLLUP_GRAINS:
+            raise ValueError(f"Unsupported rollup grain: {grain}")
+
+        query = """
+            INSERT INTO price_floor_ohlc (
+                grain, bucket, model_id,
+                open_price, high_price, low_price, close_price, samples
+            )
+            SELECT
+                $1::text,
+                date_trunc($1::text, observed_at) AS bucket,
+                model_id,
+                (array_agg(floor_price ORDER BY observed_at))[1],
+                MAX(floor_price),
+                MIN(floor_price),
+                (array_agg(floor_price ORDER BY observed_at DESC))[1],
+                COUNT(*)
+            FROM price_observations
+            WHERE observed_at >= date_trunc($1::text, $2::timestamp)
+            GROUP BY bucket, model_id
+            ON CONFLICT (grain, model_id, bucket)
+            DO UPDATE SET
+                open_price = EXCLUDED.open_price,
+                high_price = EXCLUDED.high_price,
+                low_price = EXCLUDED.low_price,
+                close_price = EXCLUDED.close_price,
+                samples = EXCLUDED.samples
+        """
+        try:
+            result = await self.db.pool.execute(query, grain, since)
+            count = int(result.split()[-1]) if result else 0
+            logger.debug(f"Floor OHLC rollup ({grain}) updated {count} candles")
+            return count
+        except Exception as e:
+            logger.error(f"Failed to roll up floor OHLC ({grain}): {e}")
+            raise
+
+    async def get_floor_ohlc(
+        self,
+        collection_name: str,
+        model: str,
+        grain: str = "hour",
+        since: Optional[datetime] = None,
+        limit: int = 168,
+    ) -> List[FloorCandle]:
+        """
+        Получает свечи floor цены модели.
+
+        Args:
+            collection_name: Название коллекции
+            model: Модель
+            grain: Гранулярность ('minute' или 'hour')
+            since: Начиная с какого времени (по умолчанию - последние limit свечей)
+            limit: Максимальное количество свечей
+        """
+        query = """
+            SELECT * FROM (
+                SELECT o.*, c.name AS collection_name, m.name AS model
+                FROM price_floor_ohlc o
+                JOIN models m ON m.id = o.model_id
+                JOIN collections c ON c.id = m.collection_id
+                WHERE o.grain = $1 AND c.name = $2 AND m.name = $3
+                  AND ($4::timestamp IS NULL OR o.bucket >= $4)
+                ORDER BY o.bucket DESC
+                LIMIT $5
+            ) AS recent
+            ORDER BY bucket
+        """
+        try:
+            rows = await self.db.pool.fetch(query, grain, collection_name, model, since, limit)
+            return [FloorCandle.from_db_row(dict(row)) for row in rows]
+        except Exception as e:
+            logger.error(f"Failed to fetch floor OHLC for '{collection_name}' ({model}): {e}")
+            raise
+
+    async def delete_old_observations(self, days: int = 30) -> int:
+        """
+        Удаляет сырые наблюдения старше days дней (свечи остаются).
+
+        Returns:
+            Количество удаленных строк
+        """
+        query = "DELETE FROM price_observations WHERE observed_at < NOW() - make_interval(days => $1)"
+        try:
+            result = await self.db.pool.execute(query, days)
+            count = int(result.split()[-1]) if result else 0
+            logger.info(f"Deleted {count} old price observations (older than {days} days)")
+            return count
+        except Exception as e:
+            logger.error(f"Failed to delete old price observations: {e}")
+            raise
@@ -0,0 +1,139 @@
+"""Репозиторий для распределения шардов мониторинга между экземплярами."""
+
+import logging
+from typing import List
+from src.database.connection import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+
+class ShardRepository:
+    """
+    Репозиторий для таблиц tracker_instances и tracker_shards.
+
+    Время аренды считается по часам PostgreSQL, поэтому экземпляры на
+    разных машинах не зависят от расхождения своих часов.
+    """
+
+    def __init__(self):
+        self.db = get_db_connection()
+
+    async def ensure_shards(self, shard_count: int) -> None:
+        """Создаёт строки шардов 0..shard_count-1, если их ещё нет."""
+        query = """
+            INSERT INTO tracker_shards (shard_id)
+            SELECT generate_series(0, $1 - 1)
+            ON CONFLICT (shard_id) DO NOTHING
+        """
+        try:
+            await self.db.pool.execute(query, shard_count)
+        except Exception as e:
+            logger.error(f"Failed to create tracker shards: {e}")
+            raise
+
+    async def heartbeat(self, instance_id: str, lease_seconds: float) -> int:
+        """
+        Отмечает экземпляр живым и удаляет экземпляры без отметки дольше аренды.
+
+        Returns:
+            Количество живых экземпляров (включая этот)
+        """
+        query = """
+            WITH beat AS (
+                INSERT INTO tracker_instances (instance_id, heartbeat_at)
+                VALUES ($1, CURRENT_TIMESTAMP)
+                ON CONFLICT (instance_id) DO UPDATE SET heartbeat_at = EXCLUDED.heartbeat_at
+            ),
+            expired AS (
+                DELETE FROM tracker_instances
+                WHERE heartbeat_at < CURRENT_TIMESTAMP - make_interval(secs => $2)
+                  AND instance_id <> $1
+                RETURNING instance_id
+            )
+            SELECT COUNT(*) + 1 FROM tracker_instances
+            WHERE instance_id <> $1
+              AND instance_id NOT IN (SELECT instance_id FROM expired)
+        """
+        try:
+            return await self.db.pool.fetchval(query, instance_id, lease_seconds)
+        except Exception as e:
+            logger.error(f"Failed to record heartbeat of tracker {instance_id}: {e}")
+            raise
+
+    async def renew(self, instance_id: str, shard_count: int, lease_seconds: float) -> List[int]:
+        """
+        Продлевает аренду шардов экземпляра.
+
+        Returns:
+            Шарды, которыми экземпляр владеет
+        """
+        query = """
+            UPDATE tracker_shards
+            SET lease_until = CURRENT_TIMESTAMP + make_interval(secs => $3)
+            WHERE owner = $1 AND shard_id < $2
+            RETURNING shard_id
+        """
+        try:
+            rows = await self.db.pool.fetch(query, instance_id, shard_count, lease_seconds)
+            return sorted(row["shard_id"] for row in rows)
+        except Exception as e:
+            logger.error(f"Failed to renew shards of tracker {instance_id}: {e}")
+            raise
+
+    async def claim(
+        self, instance_id: str, shard_count: int, limit: int, lease_seconds: float
+    ) -> List[int]:
+        """
+        Забирает свободные шарды (без владельца или с истёкшей арендой).
+
+        Returns:
+            Забранные шарды
+        """
+        query = """
+            WITH free AS (
+                SELECT shard_id FROM tracker_shards
+                WHERE shard_id < $2
+                  AND (owner IS NULL OR lease_until < CURRENT_TIMESTAMP)
+                ORDER BY shard_id
+                LIMIT $3
+                FOR UPDATE SKIP LOCKED
+            )
+            UPDATE tracker_shards t
+            SET owner = $1, lease_until = CURRENT_TIMESTAMP + make_interval(secs => $4)
+            FROM free
+            WHERE t.shard_id = free.shard_id
+            RETURNING t.shard_id
+        """
+        try:
+            rows = await self.db.pool.fetch(query, instance_id, shard_count, limit, lease_seconds)
+            return sorted(row["shard_id"] for row in rows)
+        except Exception as e:
+            logger.error(f"Failed to claim shards for tracker {instance_id}: {e}")
+            raise
+
+    async def release(self, instance_id: str, shard_ids: List[int]) -> None:
+        """Отдаёт шарды экземпляра другим."""
+        query = """
+            UPDATE tracker_shards
+            SET owner = NULL, lease_until = NULL
+            WHERE owner = $1 AND shard_id = ANY($2::int[])
+        """
+        try:
+            await self.db.pool.execute(query, instance_id, shard_ids)
+        except Exception as e:
+            logger.error(f"Failed to release shards of tracker {instance_id}: {e}")
+            raise
+
+    async def unregister(self, instance_id: str) -> None:
+        """Отдаёт все шарды экземпляра и удаляет его из живых (при остановке)."""
+        try:
+            async with self.db.pool.acquire() as conn:
+                async with conn.transaction():
+                    await conn.execute(
+                        "UPDATE tracker_shards SET owner = NULL, lease_until = NULL WHERE owner = $1",
+                        instance_id,
+                    )
+                    await conn.execute("DELETE FROM tracker_instances WHERE instance_id = $1", instance_id)
+        except Exception as e:
+            logger.error(f"Failed to unregister tracker {instance_id}: {e}")
+            raise
@@ -1,18 +1,38 @@
 """Репозиторий для работы с правилами отслеживания."""
 
 import logging
-from typing import List, Optional
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Sequence, Tuple
+from src.config import get_settings
 from src.database.connection import get_db_connection
 from src.models import TrackingRule
+from src.repositories.dimension_repository import DimensionRepository
 
 logger = logging.getLogger(__name__)
 
+# Названия коллекции/модели берутся из справочников (модель может быть не указана),
+# статистика срабатываний - из tracking_rule_stats (строки нет, пока алертов не было)
+RULE_SELECT = """
+    SELECT
+        r.*,
+        c.name AS collection_name,
+        m.name AS model,
+        COALESCE(s.alerts_count, 0) AS alerts_count,
+        s.last_alert_at,
+        s.last_lot_price
+    FROM tracking_rules r
+    JOIN collections c ON c.id = r.collection_id
+    LEFT JOIN models m ON m.id = r.model_id
+    LEFT JOIN tracking_rule_stats s ON s.rule_id = r.id
+"""
+
 
 class TrackingRuleRepository:
     """Репозиторий для управления правилами отслеживания в БД."""
 
     def __init__(self):
         self.db = get_db_connection()
+        self.dimensions = DimensionRepository()
 
     async def create(self, rule: TrackingRule) -> int:
         """
@@ -23,18 +43,21 @@ class TrackingRuleRepository:
         """
         query = """
             INSERT INTO tracking_rules (
-                user_id, collection_name, model, condition_type,
+                user_id, collection_id, model_id, condition_type,
                 target_price, floor_discount_percent, is_active
             )
             VALUES ($1, $2, $3, $4, $5, $6, $7)
             RETURNING id
         """
         try:
+            collection_id, model_id = await self.dimensions.resolve(
+                rule.collection_name, rule.model, optional_model=True
+            )
             row = await self.db.pool.fetchrow(
                 query,
                 rule.user_id,
-                rule.collection_name,
-                rule.model,
+                collection_id,
+                model_id,
                 rule.condition_type.value,
                 rule.target_price,
                 rule.floor_discount_percent,
@@ -47,11 +70,18 @@ class TrackingRuleRepository:
             logger.error(f"Failed to create tracking rule: {e}")
             raise
 
-    async def get_by_id(self, rule_id: int) -> Optional[TrackingRule]:
-        """Получает правило по ID."""
-        query = "SELECT * FROM tracking_rules WHERE id = $1"
+    async def get_by_id(self, rule_id: int, use_replica: bool = True) -> Optional[TrackingRule]:
+        """
+        Получает правило по ID.
+
+        Args:
+            rule_id: ID правила
+            use_replica: Читать с реплики (False - сразу после изменения правила)
+        """
+        query = f"{RULE_SELECT} WHERE r.id = $1"
+        pool = self.db.read_pool if use_replica else self.db.pool
         try:
-            row = await self.db.pool.fetchrow(query, rule_id)
+            row = await pool.fetchrow(query, rule_id)
             if row:
                 return TrackingRule.from_db_row(dict(row))
             return None
@@ -68,9 +98,9 @@ class TrackingRuleRepository:
             active_only: Если True, возвращает только активные правила
         """
         if active_only:
-            query = "SELECT * FROM tracking_rules WHERE user_id = $1 AND is_active = TRUE"
+            query = f"{RULE_SELECT} WHERE r.user_id = $1 AND r.is_active = TRUE"
         else:
-            query = "SELECT * FROM tracking_rules WHERE user_id = $1"
+            query = f"{RULE_SELECT} WHERE r.user_id = $1"
 
         try:
             rows = await self.db.pool.fetch(query, user_id)
@@ -79,32 +109,72 @@ class TrackingRuleRepository:
             logger.error(f"Failed to fetch rules for user {user_id}: {e}")
             raise
 
-    async def get_by_user_ids(self, user_ids: List[int], active_only: bool = False) -> List[TrackingRule]:
+    async def get_page_by_user_ids(
+        self,
+        user_ids: List[int],
+        limit: int,
+        cursor: Optional[Tuple[datetime, int]] = None,
+        newer: bool = False,
+    ) -> Tuple[List[TrackingRule], bool]:
         """
-        Получает правила для списка пользователей (для группы).
+        Получает страницу правил группы, от новых к старым.
+
+        Keyset пагинация по (created_at, id): для каждого пользователя
+        читается не больше limit строк из индекса (user_id, created_at, id),
+        а коллекции и статистика срабатываний подтягиваются только для
+        правил страницы. Стоимость страницы не зависит от числа правил.
 
         Args:
             user_ids: Список ID пользователей
-            active_only: Если True, возвращает только активные правила
+            limit: Размер страницы
+            cursor: (created_at, id) крайнего правила соседней страницы (None - первая страница)
+            newer: True - правила новее cursor (страница назад), False - старее (страница вперёд)
+
+        Returns:
+            (правила страницы от новых к старым, есть ли ещё правила в том же направлении)
         """
         if not user_ids:
-            return []
+            return [], False
 
-        if active_only:
-            query = "SELECT * FROM tracking_rules WHERE user_id = ANY($1) AND is_active = TRUE ORDER BY created_at DESC"
+        if cursor is None:
+            condition = ""
+            args = [user_ids, limit + 1]
         else:
-            query = "SELECT * FROM tracking_rules WHERE user_id = ANY($1) ORDER BY created_at DESC"
+            condition = "AND (created_at, id) > ($3, $4)" if newer else "AND (created_at, id) < ($3, $4)"
+            args = [user_ids, limit + 1, cursor[0], cursor[1]]
+        order = "ASC" if newer else "DESC"
 
+        query = f"""
+            WITH page AS (
+                SELECT p.id, p.created_at
+                FROM UNNEST($1::bigint[]) AS u(user_id)
+                CROSS JOIN LATERAL (
+                    SELECT id, created_at FROM tracking_rules
+                    WHERE user_id = u.user_id {condition}
+                    ORDER BY created_at {order}, id {order}
+                    LIMIT $2
+                ) p
+                ORDER BY p.created_at {order}, p.id {order}
+                LIMIT $2
+            )
+            {RULE_SELECT}
+            JOIN page ON page.id = r.id
+            ORDER BY r.created_at {order}, r.id {order}
+        """
         try:
-            rows = await self.db.pool.fetch(query, user_ids)
-            return [TrackingRule.from_db_row(dict(row)) for row in rows]
+            rows = await self.db.read_pool.fetch(query, *args)
         except Exception as e:
-            logger.error(f"Failed to fetch rules for user group: {e}")
+            logger.error(f"Failed to fetch rules page for user group: {e}")
             raise
 
+        rules = [TrackingRule.from_db_row(dict(row)) for row in rows[:limit]]
+        if newer:
+            rules.reverse()
+        return rules, len(rows) > limit
+
     async def get_all_active(self) -> List[TrackingRule]:
         """Получает все активные правила (для Price Tracker)."""
-        query = "SELECT * FROM tracking_rules WHERE is_active = TRUE"
+        query = f"{RULE_SELECT} WHERE r.is_active = TRUE"
         try:
             rows = await self.db.pool.fetch(query)
             return [TrackingRule.from_db_row(dict(row)) for row in rows]
@@ -112,12 +182,49 @@ class TrackingRuleRepository:
             logger.error(f"Failed to fetch active rules: {e}")
             raise
 
+    async def iter_active(
+        self, batch_size: Optional[int] = None, shards: Optional[Sequence[int]] = None
+    ) -> AsyncIterator[List[TrackingRule]]:
+        """
+        Обходит активные правила пачками (keyset пагинация по (collection_id, id)).
+
+        Правила упорядочены по коллекции, поэтому правила одной коллекции
+        идут подряд. Каждая пачка - отдельный короткий запрос без
+        транзакции: между пачками соединение возвращается в пул.
+
+        Args:
+            batch_size: Размер пачки (по умолчанию db_stream_batch_size)
+            shards: Только коллекции этих шардов (collection_id % tracker_shards),
+                None - все правила
+        """
+        settings = get_settings()
+        batch_size = batch_size or settings.db_stream_batch_size
+        query = f"{RULE_SELECT} WHERE r.is_active = TRUE AND (r.collection_id, r.id) > ($1, $2)"
+        args = [batch_size]
+        if shards is not None:
+            query += " AND r.collection_id % $4 = ANY($5::int[])"
+            args += [settings.tracker_shards, list(shards)]
+        query += " ORDER BY r.collection_id, r.id LIMIT $3"
+        last_key = (0, 0)
+        try:
+            while True:
+                rows = await self.db.pool.fetch(query, *last_key, *args)
+                if not rows:
+                    break
+                last_key = (rows[-1]["collection_id"], rows[-1]["id"])
+                yield [TrackingRule.from_db_row(dict(row)) for row in rows]
+                if len(rows) < batch_size:
+                    break
+        except Exception as e:
+            logger.error(f"Failed to stream active rules: {e}")
+            raise
+
     async def update(self, rule: TrackingRule) -> None:
         """Обновляет существующее правило."""
         query = """
             UPDATE tracking_rules
-            SET collection_name = $1,
-                model = $2,
+            SET collection_id = $1,
+                model_id = $2,
                 condition_type = $3,
                 target_price = $4,
                 floor_discount_percent = $5,
@@ -125,10 +232,13 @@ class TrackingRuleRepository:
             WHERE id = $7
         """
         try:
+            collection_id, model_id = await self.dimensions.resolve(
+                rule.collection_name, rule.model, optional_model=True
+            )
             await self.db.pool.execute(
                 query,
-                rule.collection_name,
-                rule.model,
+                collection_id,
+                model_id,
                 rule.condition_type.value,
                 rule.target_price,
                 rule.floor_discount_percent,
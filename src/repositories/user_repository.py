@@ -0,0 +1,62 @@
+"""Репозиторий для известных боту пользователей Telegram."""
+
+import logging
+from datetime import datetime
+from typing import Dict, Optional, Sequence, Tuple
+from src.database.connection import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+
+class UserRepository:
+    """Репозиторий для таблицы users (user_id, username, last_seen)."""
+
+    def __init__(self):
+        self.db = get_db_connection()
+
+    async def get_all(self) -> Dict[int, Optional[str]]:
+        """
+        Возвращает всех известных пользователей.
+
+        Returns:
+            Словарь {user_id: username}
+        """
+        query = "SELECT id, username FROM users"
+        try:
+            rows = await self.db.pool.fetch(query)
+            return {row["id"]: row["username"] for row in rows}
+        except Exception as e:
+            logger.error(f"Failed to fetch users: {e}")
+            raise
+
+    async def upsert_many(self, users: Sequence[Tuple[int, Optional[str], datetime]]) -> int:
+        """
+        Сохраняет пачку пользователей одним запросом.
+
+        Args:
+            users: Тройки (user_id, username, last_seen)
+
+        Returns:
+            Количество сохранённых пользователей
+        """
+        if not users:
+            return 0
+
+        query = """
+            INSERT INTO users (id, username, last_seen)
+            SELECT * FROM UNNEST($1::bigint[], $2::text[], $3::timestamp[])
+            ON CONFLICT (id) DO UPDATE
+            SET username = EXCLUDED.username,
+                last_seen = GREATEST(users.last_seen, EXCLUDED.last_seen)
+        """
+        user_ids = [user_id for user_id, _, _ in users]
+        usernames = [username for _, username, _ in users]
+        last_seen = [seen for _, _, seen in users]
+        try:
+            result = await self.db.pool.execute(query, user_ids, usernames, last_seen)
+            count = int(result.split()[-1]) if result else 0
+            logger.debug(f"{count} users saved")
+            return count
+        except Exception as e:
+            logger.error(f"Failed to save {len(users)} users: {e}")
+            raise
@@ -1,5 +1,39 @@
 from .portals_service import PortalsService
 from .price_tracker import PriceTracker
 from .tracking_price_tracker import TrackingPriceTracker
+from .alert_status_buffer import AlertStatusBuffer, get_alert_status_buffer
+from .price_history import PriceHistoryRecorder, get_price_history_recorder
+from .photo_cache import PhotoCache, get_photo_cache
+from .alert_sender import AlertSender, DeliveryResult, FanOutReport, get_alert_sender
+from .alert_digest import AlertDigest
+from .alert_outbox import AlertOutbox
+from .fsm_storage import PostgresStorage, get_fsm_storage
+from .shard_coordinator import ShardCoordinator
+from .group_index import GroupIndex, get_group_index
+from .market_watch import MarketWatchEngine, MarketFetcher, MarketBudgetExceeded
 
-__all__ = ["PortalsService", "PriceTracker", "TrackingPriceTracker"]
\ No newline at end of file
+__all__ = [
+    "PortalsService",
+    "PriceTracker",
+    "TrackingPriceTracker",
+    "AlertStatusBuffer",
+    "get_alert_status_buffer",
+    "PriceHistoryRecorder",
+    "get_price_history_recorder",
+    "PhotoCache",
+    "get_photo_cache",
+    "AlertSender",
+    "DeliveryResult",
+    "FanOutReport",
+    "get_alert_sender",
+    "AlertDigest",
+    "AlertOutbox",
+    "PostgresStorage",
+    "get_fsm_storage",
+    "ShardCoordinator",
+    "GroupIndex",
+    "get_group_index",
+    "MarketWatchEngine",
+    "MarketFetcher",
+    "MarketBudgetExceeded",
+]
\ No newline at end of file
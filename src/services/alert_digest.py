@@ -0,0 +1,169 @@
+"""Режим дайджеста: алерты пользователя за окно одним сообщением."""
+
+import asyncio
+import logging
+from typing import Callable, Dict, List, Optional
+
+from aiogram import Bot
+
+from src.config import get_settings
+from src.keyboards import get_digest_keyboard
+from src.models import Alert
+from src.repositories import AlertRepository
+from src.services.alert_sender import AlertSender, get_alert_sender
+from src.services.alert_status_buffer import get_alert_status_buffer
+from src.services.photo_cache import get_photo_cache
+
+logger = logging.getLogger(__name__)
+
+# Ограничения Telegram: альбом - до 10 картинок, сообщение - до 4096 символов
+MEDIA_GROUP_LIMIT = 10
+SUMMARY_LINES_LIMIT = 30
+
+
+class AlertDigest:
+    """
+    Копит алерты каждого получателя и отправляет их одним дайджестом.
+
+    Первый алерт получателя запускает окно alert_digest_window секунд; по его
+    окончании отправляется альбом из первых 10 лотов с картинками и сообщение
+    со списком всех лотов. Один лот, найденный несколькими правилами группы,
+    попадает в дайджест один раз. Если получатель на паузе (приоритет
+    интерфейса), дайджест откладывается.
+
+    Алерты в дайджесте закреплены за этим воркером outbox на lease секунд.
+    При откладывании и перед отправкой закрепление продлевается, иначе
+    другой claim забрал бы те же алерты и они пришли бы второй раз.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        is_paused: Optional[Callable[[int], bool]] = None,
+        sender: Optional[AlertSender] = None,
+        alert_repo: Optional[AlertRepository] = None,
+    ):
+        settings = get_settings()
+        self.bot = bot
+        self.window = settings.alert_digest_window
+        # Закрепление алертов в outbox: окно ожидания и запас на отправку
+        self.lease = self.window * 2
+        self.is_paused = is_paused or (lambda chat_id: False)
+        self.sender = sender or get_alert_sender()
+        self.alert_repo = alert_repo or AlertRepository()
+        self.photo_cache = get_photo_cache()
+        self.status_buffer = get_alert_status_buffer()
+
+        # chat_id -> алерты в порядке поступления
+        self._pending: Dict[int, List[Alert]] = {}
+        self._timers: Dict[int, asyncio.Task] = {}
+
+        # Статистика
+        self.digests_sent = 0
+        self.alerts_sent = 0
+
+    def add(self, chat_id: int, alert: Alert) -> None:
+        """Добавляет алерт в дайджест получателя."""
+        self._pending.setdefault(chat_id, []).append(alert)
+
+        if chat_id not in self._timers:
+            self._timers[chat_id] = asyncio.create_task(self._flush_later(chat_id, self.window))
+
+    async def _flush_later(self, chat_id: int, delay: float) -> None:
+        """Отправляет дайджест получателя по окончании окна."""
+        await asyncio.sleep(delay)
+        self._timers.pop(chat_id, None)
+
+        if self.is_paused(chat_id):
+            logger.debug(f"User {chat_id} is paused, postponing digest")
+            await self._extend_claims(self._pending.get(chat_id, []))
+            self._timers[chat_id] = asyncio.create_task(self._flush_later(chat_id, self.window))
+            return
+
+        await self.flush(chat_id)
+
+    async def flush(self, chat_id: int) -> None:
+        """Отправляет накопленный дайджест получателю."""
+        pending = self._pending.pop(chat_id, None)
+        if not pending:
+            return
+
+        # Отправка может ждать RetryAfter - не даём закреплению истечь посреди неё
+        await self._extend_claims(pending)
+
+        # Лот, найденный несколькими правилами, показываем один раз
+        unique: Dict[str, Alert] = {}
+        for alert in pending:
+            unique.setdefault(alert.lot_id, alert)
+        alerts = list(unique.values())
+
+        # Альбом и список - отдельные отправки: повтор после 429 на списке не
+        # шлёт альбом второй раз
+        with_photo = [alert for alert in alerts if alert.photo_url][:MEDIA_GROUP_LIMIT]
+        latency = 0.0
+        if with_photo:
+            result = await self.sender.send(chat_id, lambda target: self._send_album(target, with_photo))
+            if not result.ok:
+                logger.error(f"Error sending digest of {len(alerts)} alerts to user {chat_id}: {result.error}")
+                return
+            latency += result.latency
+
+        result = await self.sender.send(chat_id, lambda target: self._send_summary(target, alerts))
+        if not result.ok:
+            if not with_photo:
+                logger.error(f"Error sending digest of {len(alerts)} alerts to user {chat_id}: {result.error}")
+                return
+            # Альбом с подписями уже доставлен - не отдаём алерты outbox на повтор,
+            # иначе альбом придёт ещё раз
+            logger.error(f"Digest album sent to user {chat_id}, but summary failed: {result.error}")
+        latency += result.latency
+
+        for alert in pending:
+            self.status_buffer.mark_as_sent(alert.alert_id)
+        self.digests_sent += 1
+        self.alerts_sent += len(alerts)
+        logger.info(f"Digest sent to user {chat_id}: {len(alerts)} alerts in {latency * 1000:.0f}ms")
+
+    async def _extend_claims(self, alerts: List[Alert]) -> None:
+        """Продлевает закрепление алертов дайджеста в outbox на lease секунд."""
+        alert_ids = [alert.alert_id for alert in alerts if alert.alert_id is not None]
+        try:
+            await self.alert_repo.extend_claims(alert_ids, self.lease)
+        except Exception as e:
+            # Не критично: в худшем случае алерт после истечения claimed_until придёт ещё раз
+            logger.warning(f"Failed to extend claim of {len(alert_ids)} digest alerts: {e}")
+
+    async def _send_album(self, chat_id: int, with_photo: List[Alert]) -> None:
+        """Отправляет альбом с картинками лотов (или одну картинку)."""
+        if len(with_photo) > 1:
+            await self.photo_cache.send_media_group(
+                self.bot,
+                chat_id,
+                [(alert.photo_url, alert.format_short()) for alert in with_photo],
+            )
+        else:
+            await self.photo_cache.send_photo(
+                self.bot, chat_id, with_photo[0].photo_url, caption=with_photo[0].format_short()
+            )
+
+    async def _send_summary(self, chat_id: int, alerts: List[Alert]) -> None:
+        """Отправляет сообщение со списком лотов и кнопками."""
+        text = f"📬 Дайджест: найдено лотов - {len(alerts)}\n\n"
+        for number, alert in enumerate(alerts[:SUMMARY_LINES_LIMIT], start=1):
+            text += f"{number}. {alert.format_short()}\n"
+        if len(alerts) > SUMMARY_LINES_LIMIT:
+            text += f"\n...и ещё {len(alerts) - SUMMARY_LINES_LIMIT}"
+
+        keyboard = get_digest_keyboard(
+            [(number, alert.lot_url) for number, alert in enumerate(alerts[:MEDIA_GROUP_LIMIT], start=1)]
+        )
+        await self.bot.send_message(chat_id=chat_id, text=text, reply_markup=keyboard)
+
+    async def flush_all(self) -> None:
+        """Отправляет все накопленные дайджесты (при остановке)."""
+        for task in self._timers.values():
+            task.cancel()
+        self._timers.clear()
+
+        for chat_id in list(self._pending):
+            await self.flush(chat_id)
@@ -0,0 +1,259 @@
+"""Доставка алертов из outbox (таблица alerts)."""
+
+import asyncio
+import logging
+import time
+from typing import Callable, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+
+from src.config import get_settings
+from src.keyboards import get_alert_keyboard
+from src.models import Alert
+from src.repositories import AlertRepository
+from src.services.alert_digest import AlertDigest
+from src.services.alert_sender import AlertSender, get_alert_sender
+from src.services.alert_status_buffer import get_alert_status_buffer
+from src.services.photo_cache import get_photo_cache
+from src.services.user_cache import get_user_cache
+
+logger = logging.getLogger(__name__)
+
+
+class AlertOutbox:
+    """
+    Доставляет алерты, сохранённые трекером в таблицу alerts.
+
+    Трекер только создаёт строку алерта и будит outbox. Воркер забирает
+    неотправленные алерты пачками (FOR UPDATE SKIP LOCKED + claimed_until),
+    рассылает их группе и отмечает отправленными через AlertStatusBuffer.
+    Если процесс упал до отметки, после истечения claimed_until алерт снова
+    заберёт любой воркер - в том числе этот же после перезапуска. Доставка
+    "хотя бы один раз"; несколько процессов делят очередь без дублей в
+    рамках одного claim.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        is_paused: Optional[Callable[[int], bool]] = None,
+        digest: Optional[AlertDigest] = None,
+        sender: Optional[AlertSender] = None,
+        alert_repo: Optional[AlertRepository] = None,
+    ):
+        settings = get_settings()
+        self.bot = bot
+        self.is_paused = is_paused or (lambda chat_id: False)
+        self.digest = digest
+        self.sender = sender or get_alert_sender()
+        self.alert_repo = alert_repo or AlertRepository()
+        self.photo_cache = get_photo_cache()
+        self.status_buffer = get_alert_status_buffer()
+
+        self.batch_size = settings.alert_outbox_batch_size
+        self.poll_interval = settings.alert_outbox_poll_interval
+        self.max_age = settings.alert_outbox_max_age
+        self.max_attempts = settings.alert_outbox_max_attempts
+        self.max_backlog = settings.alert_outbox_max_backlog
+        # В режиме дайджеста алерт ждёт окно, закрепление должно его пережить
+        # (дальше дайджест продлевает его сам)
+        self.lease = settings.alert_outbox_lease
+        if digest is not None:
+            self.lease = max(self.lease, digest.lease)
+
+        self._running = False
+        self._wakeup = asyncio.Event()
+        self._stopped = asyncio.Event()
+        # Последнее число неотправленных алертов и monotonic время подсчёта
+        self._backlog = 0
+        self._backlog_checked_at = float("-inf")
+
+        # Статистика
+        self.claimed_total = 0
+        self.failed_total = 0
+
+    def notify(self) -> None:
+        """Сообщает воркеру о новых алертах (не ждать poll_interval)."""
+        self._wakeup.set()
+
+    async def wait_for_backlog(self) -> None:
+        """
+        Ждёт, пока неотправленных алертов в outbox не больше max_backlog.
+
+        Backpressure для трекера без доставки: его AlertSender ничего не
+        отправляет и лимитов Telegram не видит, поэтому притормаживаем по
+        очереди в БД. Число алертов пересчитывается не чаще раза в
+        poll_interval.
+        """
+        if self.max_backlog <= 0:
+            return
+
+        while True:
+            now = time.monotonic()
+            if now - self._backlog_checked_at >= self.poll_interval:
+                try:
+                    self._backlog = await self.alert_repo.count_pending(self.max_age, self.max_attempts)
+                except Exception as e:
+                    # Без счётчика не останавливаем мониторинг
+                    logger.warning(f"Failed to check outbox backlog: {e}")
+                    return
+                self._backlog_checked_at = now
+
+            if self._backlog < self.max_backlog:
+                return
+
+            logger.debug(f"Outbox backlog {self._backlog} >= {self.max_backlog}, waiting")
+            await asyncio.sleep(self.poll_interval)
+
+    async def process_batch(self) -> int:
+        """
+        Забирает и доставляет одну пачку алертов.
+
+        Returns:
+            Количество забранных алертов
+        """
+        # Backpressure: не забираем новые алерты, пока Telegram ограничивает отправку
+        await self.sender.wait_for_capacity()
+
+        alerts = await self.alert_repo.claim_pending(
+            self.batch_size, self.lease, self.max_age, self.max_attempts
+        )
+        if not alerts:
+            return 0
+
+        self.claimed_total += len(alerts)
+        await asyncio.gather(*(self._dispatch(alert) for alert in alerts))
+        return len(alerts)
+
+    async def _dispatch(self, alert: Alert) -> None:
+        """Доставляет алерт группе владельца правила (или кладёт в дайджест)."""
+        try:
+            group_user_ids = get_user_cache().get_group_user_ids_by_user_id(alert.user_id)
+
+            if self.digest is not None:
+                for target_user_id in group_user_ids:
+                    self.digest.add(target_user_id, alert)
+                return
+
+            await self._deliver(alert, group_user_ids)
+        except Exception as e:
+            self.failed_total += 1
+            logger.error(f"Error delivering alert {alert.alert_id}: {e}", exc_info=True)
+
+    async def _deliver(self, alert: Alert, group_user_ids: list) -> None:
+        """Рассылает алерт членам группы."""
+        message_text = alert.format_message()
+        keyboard = get_alert_keyboard(alert.lot_url, alert.rule_id)
+
+        # Пропускаем пользователей на паузе
+        recipients = []
+        for target_user_id in group_user_ids:
+            if self.is_paused(target_user_id):
+                logger.debug(f"User {target_user_id} is paused, skipping alert")
+                continue
+            recipients.append(target_user_id)
+
+        logger.info(f"Sending alert {alert.alert_id} to {len(recipients)} of {len(group_user_ids)} users in group")
+
+        async def deliver(target_user_id: int) -> None:
+            if alert.photo_url:
+                try:
+                    await self.photo_cache.send_photo(
+                        self.bot,
+                        target_user_id,
+                        alert.photo_url,
+                        caption=message_text,
+                        reply_markup=keyboard,
+                        parse_mode="Markdown",
+                    )
+                    return
+                except TelegramRetryAfter:
+                    # Лимит Telegram: AlertSender повторит отправку после паузы
+                    raise
+                except Exception as e:
+                    logger.error(f"Error sending photo to user {target_user_id}: {e}")
+
+            await self.bot.send_message(
+                chat_id=target_user_id,
+                text=message_text,
+                reply_markup=keyboard,
+                parse_mode="Markdown",
+            )
+
+        # Всем членам группы одновременно, в каждый чат - по порядку
+        report = await self.sender.fan_out(recipients, deliver)
+        for result in report.failed:
+            logger.error(f"Error sending alert to user {result.chat_id}: {result.error}")
+
+        if report.results and not report.delivered:
+            # Никому не доставлен - повторим после истечения claimed_until
+            self.failed_total += 1
+            logger.warning(
+                f"Alert {alert.alert_id} was not delivered to anyone, will retry in {self.lease:.0f}s"
+            )
+            return
+
+        # Отмечаем как отправленный (запись в БД пачкой, в фоне)
+        self.status_buffer.mark_as_sent(alert.alert_id)
+        logger.info(f"Alert sent: rule #{alert.rule_id}, lot {alert.lot_id}, {report.summary()}")
+
+    async def start(self) -> None:
+        """
+        Запускает воркер доставки.
+
+        Первая итерация сразу забирает алерты, оставшиеся неотправленными
+        после перезапуска (с истёкшим закреплением).
+        """
+        if self._running:
+            logger.warning("Alert outbox is already running")
+            return
+
+        self._running = True
+        self._stopped.clear()
+        logger.info("Alert outbox started")
+
+        # Алерты может вставлять трекер в другом процессе - будимся по NOTIFY
+        try:
+            await self.alert_repo.listen_new(lambda payload: self.notify())
+        except Exception as e:
+            logger.warning(f"Alert notifications unavailable, polling every {self.poll_interval}s: {e}")
+
+        try:
+            while self._running:
+                try:
+                    claimed = await self.process_batch()
+                except Exception as e:
+                    logger.error(f"Error in alert outbox loop: {e}", exc_info=True)
+                    claimed = 0
+
+                # Полная пачка - в очереди, вероятно, есть ещё
+                if claimed >= self.batch_size:
+                    continue
+
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+        finally:
+            self._stopped.set()
+
+    def stop(self) -> None:
+        """Останавливает воркер доставки."""
+        self._running = False
+        self._wakeup.set()
+        logger.info(f"Alert outbox stopped (claimed {self.claimed_total}, failed {self.failed_total})")
+
+    async def close(self, timeout: float = 10.0) -> None:
+        """Останавливает воркер, даёт текущей пачке доставиться и отправляет накопленные дайджесты."""
+        was_running = self._running
+        self.stop()
+        if was_running:
+            try:
+                await asyncio.wait_for(self._stopped.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Alert outbox did not finish the current batch in {timeout:.0f}s")
+
+        if self.digest is not None:
+            await self.digest.flush_all()
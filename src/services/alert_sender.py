@@ -0,0 +1,265 @@
+"""Параллельная доставка сообщений с сохранением порядка внутри чата."""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from aiogram.exceptions import TelegramRetryAfter
+
+from src.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+SendFactory = Callable[[int], Awaitable[Any]]
+
+
+@dataclass
+class DeliveryResult:
+    """Результат доставки одному получателю."""
+
+    chat_id: int
+    ok: bool
+    latency: float  # секунды от постановки в очередь до ответа Telegram
+    error: Optional[str] = None
+
+
+@dataclass
+class FanOutReport:
+    """Итог рассылки одного сообщения нескольким получателям."""
+
+    results: List[DeliveryResult] = field(default_factory=list)
+
+    @property
+    def delivered(self) -> List[DeliveryResult]:
+        return [result for result in self.results if result.ok]
+
+    @property
+    def failed(self) -> List[DeliveryResult]:
+        return [result for result in self.results if not result.ok]
+
+    @property
+    def max_latency(self) -> float:
+        return max((result.latency for result in self.results), default=0.0)
+
+    def summary(self) -> str:
+        """Короткая строка для лога."""
+        text = (
+            f"{len(self.delivered)}/{len(self.results)} delivered, "
+            f"max latency {self.max_latency * 1000:.0f}ms"
+        )
+        if self.failed:
+            failed = ", ".join(f"{result.chat_id} ({result.error})" for result in self.failed)
+            text += f", failed: {failed}"
+        return text
+
+
+class AlertSender:
+    """
+    Отправляет сообщения параллельно под общим ограничением.
+
+    Одновременно выполняется не больше alert_send_concurrency отправок,
+    а сообщения в один чат уходят строго в порядке вызова send(): каждая
+    отправка ждёт завершения предыдущей в тот же чат.
+
+    На 429 (TelegramRetryAfter) чат ставится на паузу на retry_after секунд,
+    а если за время паузы лимит упёрся и в другом чате - на паузу ставятся
+    все отправки. Отправка повторяется после паузы (до alert_send_max_retries
+    раз). Источники алертов вызывают wait_for_capacity() и притормаживают,
+    пока действует общая пауза или очередь отправок переполнена.
+    """
+
+    def __init__(self, concurrency: Optional[int] = None):
+        settings = get_settings()
+        self.concurrency = max(1, concurrency or settings.alert_send_concurrency)
+        self.max_retries = settings.alert_send_max_retries
+        self.max_backlog = settings.alert_send_max_backlog
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        # chat_id -> future завершения последней поставленной отправки
+        self._chat_tails: Dict[int, asyncio.Future] = {}
+        self._in_flight = 0
+
+        # Паузы по 429 (time.monotonic() окончания)
+        self._global_pause_until = 0.0
+        self._chat_pause_until: Dict[int, float] = {}
+
+        # Статистика
+        self.sent_total = 0
+        self.failed_total = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.retry_after_total = 0
+        self.retries_total = 0
+        self.global_throttled_seconds = 0.0
+        self.chat_throttled_seconds = 0.0
+        self.waiting_throttled_seconds = 0.0
+
+    async def send(self, chat_id: int, send: SendFactory) -> DeliveryResult:
+        """
+        Выполняет отправку в чат после всех ранее поставленных отправок в него.
+
+        Args:
+            chat_id: ID чата
+            send: Функция, выполняющая отправку для chat_id
+
+        Returns:
+            Результат доставки (ошибки отправки не пробрасываются)
+        """
+        started = time.perf_counter()
+        previous = self._chat_tails.get(chat_id)
+        done = asyncio.get_running_loop().create_future()
+        self._chat_tails[chat_id] = done
+        self._in_flight += 1
+
+        try:
+            if previous is not None:
+                await asyncio.shield(previous)
+            result = await self._send_with_retry(chat_id, send, started)
+        finally:
+            self._in_flight -= 1
+            if not done.done():
+                done.set_result(None)
+            if self._chat_tails.get(chat_id) is done:
+                del self._chat_tails[chat_id]
+
+        self._observe(result)
+        return result
+
+    async def _send_with_retry(self, chat_id: int, send: SendFactory, started: float) -> DeliveryResult:
+        """Выполняет отправку, выдерживая паузы по 429 и повторяя её после них."""
+        retries = 0
+        while True:
+            await self._wait_unthrottled(chat_id)
+
+            async with self._semaphore:
+                # Пауза могла начаться, пока ждали семафор
+                if self._pause_remaining(chat_id) > 0:
+                    continue
+                try:
+                    await send(chat_id)
+                except TelegramRetryAfter as e:
+                    self._on_retry_after(chat_id, e.retry_after)
+                    if retries >= self.max_retries:
+                        return DeliveryResult(chat_id, False, time.perf_counter() - started, str(e))
+                    retries += 1
+                    self.retries_total += 1
+                    continue
+                except Exception as e:
+                    return DeliveryResult(chat_id, False, time.perf_counter() - started, str(e))
+
+            return DeliveryResult(chat_id, True, time.perf_counter() - started)
+
+    def _pause_remaining(self, chat_id: Optional[int] = None) -> float:
+        """Сколько секунд ещё действует пауза (общая или чата)."""
+        until = self._global_pause_until
+        if chat_id is not None:
+            until = max(until, self._chat_pause_until.get(chat_id, 0.0))
+        return until - time.monotonic()
+
+    async def _wait_unthrottled(self, chat_id: int) -> None:
+        """Ждёт окончания паузы чата и общей паузы."""
+        while True:
+            remaining = self._pause_remaining(chat_id)
+            if remaining <= 0:
+                self._chat_pause_until.pop(chat_id, None)
+                return
+            self.waiting_throttled_seconds += remaining
+            await asyncio.sleep(remaining)
+
+    def _on_retry_after(self, chat_id: int, retry_after: float) -> None:
+        """Ставит на паузу чат, а при 429 в нескольких чатах - все отправки."""
+        now = time.monotonic()
+        until = now + retry_after
+        self.retry_after_total += 1
+
+        # 429 в другом чате, пока действует пауза - упёрлись в общий лимит бота
+        other_paused = any(
+            paused_until > now
+            for paused_chat_id, paused_until in self._chat_pause_until.items()
+            if paused_chat_id != chat_id
+        )
+
+        current = self._chat_pause_until.get(chat_id, 0.0)
+        if until > current:
+            self.chat_throttled_seconds += until - max(now, current)
+            self._chat_pause_until[chat_id] = until
+
+        if other_paused and until > self._global_pause_until:
+            self.global_throttled_seconds += until - max(now, self._global_pause_until)
+            self._global_pause_until = until
+            logger.warning(f"Telegram flood limit hit in several chats, pausing all sends for {retry_after}s")
+        else:
+            logger.warning(f"Telegram flood limit hit for chat {chat_id}, pausing it for {retry_after}s")
+
+    def is_throttled(self) -> bool:
+        """Действует ли общая пауза отправок."""
+        return self._pause_remaining() > 0
+
+    async def wait_for_capacity(self) -> None:
+        """
+        Ждёт, пока отправки не на общей паузе и очередь не переполнена.
+
+        Вызывается источниками алертов перед тем, как добавить новые, чтобы
+        при упоре в лимиты Telegram они притормаживали, а не копили очередь.
+        """
+        while True:
+            remaining = self._pause_remaining()
+            if remaining > 0:
+                await asyncio.sleep(remaining)
+            elif self._in_flight >= self.max_backlog:
+                await asyncio.sleep(0.1)
+            else:
+                return
+
+    async def fan_out(self, chat_ids: Iterable[int], send: SendFactory) -> FanOutReport:
+        """
+        Отправляет сообщение всем получателям одновременно.
+
+        Args:
+            chat_ids: Получатели
+            send: Функция, выполняющая отправку для одного chat_id
+
+        Returns:
+            Отчёт с задержкой и ошибкой по каждому получателю
+        """
+        results = await asyncio.gather(*(self.send(chat_id, send) for chat_id in chat_ids))
+        return FanOutReport(list(results))
+
+    def _observe(self, result: DeliveryResult) -> None:
+        """Обновляет статистику доставки."""
+        if result.ok:
+            self.sent_total += 1
+        else:
+            self.failed_total += 1
+        self.latency_total += result.latency
+        self.latency_max = max(self.latency_max, result.latency)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Возвращает статистику доставки."""
+        total = self.sent_total + self.failed_total
+        return {
+            "sent": self.sent_total,
+            "failed": self.failed_total,
+            "latency_avg_ms": round(self.latency_total * 1000 / total, 1) if total else 0.0,
+            "latency_max_ms": round(self.latency_max * 1000, 1),
+            "in_flight": self._in_flight,
+            "chats_in_flight": len(self._chat_tails),
+            "retry_after": self.retry_after_total,
+            "retries": self.retries_total,
+            "global_throttled_s": round(self.global_throttled_seconds, 1),
+            "chat_throttled_s": round(self.chat_throttled_seconds, 1),
+            "send_wait_throttled_s": round(self.waiting_throttled_seconds, 1),
+        }
+
+
+# Глобальный singleton
+_alert_sender: Optional[AlertSender] = None
+
+
+def get_alert_sender() -> AlertSender:
+    """Возвращает singleton отправителя алертов."""
+    global _alert_sender
+    if _alert_sender is None:
+        _alert_sender = AlertSender()
+    return _alert_sender
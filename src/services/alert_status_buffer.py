@@ -0,0 +1,127 @@
+"""Write-behind буфер для отметок об отправке алертов."""
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from src.config import get_settings
+from src.repositories import AlertRepository
+
+logger = logging.getLogger(__name__)
+
+
+class AlertStatusBuffer:
+    """
+    Копит отметки sent_at и пишет их в БД пачками.
+
+    Отправка алерта не ждёт UPDATE: отметка ставится в очередь и сбрасывается
+    одним запросом, когда набралось alert_flush_batch_size записей или прошло
+    alert_flush_interval секунд с последнего сброса.
+    """
+
+    def __init__(self, alert_repo: Optional[AlertRepository] = None):
+        settings = get_settings()
+        self.alert_repo = alert_repo or AlertRepository()
+        self.batch_size = settings.alert_flush_batch_size
+        self.flush_interval = settings.alert_flush_interval
+        self._running = False
+
+        # (alert_id, sent_at, monotonic время постановки в очередь)
+        self._pending: List[Tuple[int, datetime, float]] = []
+        self._flush_requested = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+
+        # Статистика
+        self.flushed_total = 0
+        self.last_flush_lag: float = 0.0  # seconds, от первой отметки в пачке до записи
+        self.max_flush_lag: float = 0.0
+
+    @property
+    def pending_count(self) -> int:
+        """Количество отметок, ещё не записанных в БД."""
+        return len(self._pending)
+
+    def mark_as_sent(self, alert_id: int, sent_at: Optional[datetime] = None) -> None:
+        """Ставит отметку об отправке в очередь (не блокирует отправку алерта)."""
+        self._pending.append((alert_id, sent_at or datetime.utcnow(), time.monotonic()))
+
+        if len(self._pending) >= self.batch_size:
+            self._flush_requested.set()
+
+    async def flush(self) -> int:
+        """
+        Записывает накопленные отметки в БД.
+
+        Returns:
+            Количество записанных отметок
+        """
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+
+            batch, self._pending = self._pending, []
+            oldest_enqueued = min(enqueued for _, _, enqueued in batch)
+
+            try:
+                await self.alert_repo.mark_many_as_sent(
+                    [(alert_id, sent_at) for alert_id, sent_at, _ in batch]
+                )
+            except Exception as e:
+                # Возвращаем пачку в очередь, попробуем при следующем сбросе
+                self._pending = batch + self._pending
+                logger.error(f"Failed to flush {len(batch)} alert statuses: {e}")
+                return 0
+
+            lag = time.monotonic() - oldest_enqueued
+            self.last_flush_lag = lag
+            self.max_flush_lag = max(self.max_flush_lag, lag)
+            self.flushed_total += len(batch)
+            logger.info(f"Flushed {len(batch)} alert statuses (lag {lag * 1000:.0f} ms)")
+            return len(batch)
+
+    async def start(self) -> None:
+        """Запускает фоновый сброс буфера."""
+        if self._running:
+            logger.warning("Alert status buffer is already running")
+            return
+
+        self._running = True
+        logger.info(
+            f"Alert status buffer started (batch={self.batch_size}, interval={self.flush_interval}s)"
+        )
+
+        while self._running:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error in alert status buffer loop: {e}", exc_info=True)
+
+    async def stop(self) -> None:
+        """Останавливает фоновый сброс и записывает остаток буфера."""
+        self._running = False
+        self._flush_requested.set()
+        await self.flush()
+        logger.info(
+            f"Alert status buffer stopped (flushed {self.flushed_total}, "
+            f"pending {self.pending_count}, max lag {self.max_flush_lag * 1000:.0f} ms)"
+        )
+
+
+# Глобальный singleton буфера
+_alert_status_buffer: Optional[AlertStatusBuffer] = None
+
+
+def get_alert_status_buffer() -> AlertStatusBuffer:
+    """Возвращает singleton буфера отметок об отправке."""
+    global _alert_status_buffer
+    if _alert_status_buffer is None:
+        _alert_status_buffer = AlertStatusBuffer()
+    return _alert_status_buffer
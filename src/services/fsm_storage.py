@@ -0,0 +1,158 @@
+"""Хранилище состояний диалогов (FSM aiogram) в PostgreSQL."""
+
+import asyncio
+import copy
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+
+from src.config import get_settings
+from src.repositories import FSMStorageRepository
+
+logger = logging.getLogger(__name__)
+
+
+class PostgresStorage(BaseStorage):
+    """
+    FSM storage в таблице fsm_storage вместо MemoryStorage.
+
+    Незаконченные диалоги (мастер добавления правила и т.п.) переживают
+    перезапуск бота, а несколько экземпляров бота видят одно состояние.
+    Запись идёт сразу в БД, чтение - через небольшой кэш в памяти
+    (fsm_cache_ttl секунд), так как состояние читается на каждом шаге
+    диалога. Диалоги, не обновлявшиеся fsm_state_ttl секунд, считаются
+    брошенными и периодически удаляются.
+    """
+
+    def __init__(
+        self,
+        repo: Optional[FSMStorageRepository] = None,
+        key_builder: Optional[KeyBuilder] = None,
+    ):
+        settings = get_settings()
+        self.repo = repo or FSMStorageRepository()
+        self.key_builder = key_builder or DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        self.state_ttl = settings.fsm_state_ttl
+        self.cache_ttl = settings.fsm_cache_ttl
+        self.cache_size = settings.fsm_cache_size
+        self.sweep_interval = settings.fsm_sweep_interval
+
+        # key -> (monotonic время истечения, state, data)
+        self._cache: "OrderedDict[str, Tuple[float, Optional[str], Dict[str, Any]]]" = OrderedDict()
+        self._running = False
+        self._stop_requested = asyncio.Event()
+
+        # Статистика
+        self.cache_hits = 0
+        self.db_reads = 0
+        self.db_writes = 0
+        self.swept_total = 0
+
+    async def _load(self, key: str) -> Tuple[Optional[str], Dict[str, Any]]:
+        """Возвращает (state, data) из кэша или из БД."""
+        cached = self._cache.get(key)
+        if cached is not None:
+            expires_at, state, data = cached
+            if expires_at > time.monotonic():
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+                return state, data
+            del self._cache[key]
+
+        self.db_reads += 1
+        row = await self.repo.get(key, self.state_ttl)
+        state, data = row if row is not None else (None, {})
+        self._remember(key, state, data)
+        return state, data
+
+    def _remember(self, key: str, state: Optional[str], data: Dict[str, Any]) -> None:
+        """Кладёт состояние в кэш, вытесняя самые старые записи."""
+        if self.cache_ttl <= 0:
+            return
+        self._cache[key] = (time.monotonic() + self.cache_ttl, state, data)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def _save(self, key: str, state: Optional[str], data: Dict[str, Any]) -> None:
+        """Записывает состояние в БД (пустое - удаляет) и обновляет кэш."""
+        self.db_writes += 1
+        if state is None and not data:
+            await self.repo.delete(key)
+        else:
+            await self.repo.save(key, state, data)
+        self._remember(key, state, data)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        storage_key = self.key_builder.build(key)
+        _, data = await self._load(storage_key)
+        await self._save(storage_key, state.state if isinstance(state, State) else state, data)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        state, _ = await self._load(self.key_builder.build(key))
+        return state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        storage_key = self.key_builder.build(key)
+        state, _ = await self._load(storage_key)
+        await self._save(storage_key, state, copy.deepcopy(data))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, data = await self._load(self.key_builder.build(key))
+        return copy.deepcopy(data)
+
+    async def sweep(self) -> int:
+        """Удаляет брошенные диалоги."""
+        count = await self.repo.delete_expired(self.state_ttl)
+        self.swept_total += count
+        if count:
+            logger.info(f"Removed {count} expired FSM states")
+        return count
+
+    async def start(self) -> None:
+        """Запускает периодическую очистку брошенных диалогов."""
+        if self._running:
+            logger.warning("FSM storage sweeper is already running")
+            return
+
+        self._running = True
+        self._stop_requested.clear()
+        logger.info(f"FSM storage sweeper started (ttl={self.state_ttl:.0f}s, interval={self.sweep_interval:.0f}s)")
+
+        while self._running:
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Error in FSM storage sweeper: {e}", exc_info=True)
+
+            try:
+                await asyncio.wait_for(self._stop_requested.wait(), timeout=self.sweep_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def close(self) -> None:
+        """Останавливает очистку (соединения с БД принадлежат общему пулу)."""
+        if not self._running:
+            return
+        self._running = False
+        self._stop_requested.set()
+        logger.info(
+            f"FSM storage stopped (cache hits {self.cache_hits}, db reads {self.db_reads}, "
+            f"db writes {self.db_writes}, swept {self.swept_total})"
+        )
+
+
+# Глобальный singleton
+_fsm_storage: Optional[PostgresStorage] = None
+
+
+def get_fsm_storage() -> PostgresStorage:
+    """Возвращает singleton хранилища состояний диалогов."""
+    global _fsm_storage
+    if _fsm_storage is None:
+        _fsm_storage = PostgresStorage()
+    return _fsm_storage
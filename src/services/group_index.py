@@ -0,0 +1,101 @@
+"""Индекс групп пользователей для рассылки алертов."""
+
+import asyncio
+import logging
+from typing import Dict, FrozenSet, Optional
+
+from src.config import get_settings
+from src.repositories import GroupRepository
+
+logger = logging.getLogger(__name__)
+
+
+class GroupIndex:
+    """
+    Заранее посчитанное соответствие user_id -> участники его групп.
+
+    Группы хранятся в таблицах groups и group_members. Индекс целиком
+    перестраивается при загрузке, поэтому получатели алерта находятся
+    одним поиском в словаре. Изменения групп (в том числе вручную через
+    SQL) приходят по NOTIFY user_groups, и индекс перечитывается без
+    перезапуска; на случай потери уведомлений индекс перечитывается и
+    раз в group_reload_interval секунд.
+    """
+
+    def __init__(self, group_repo: Optional[GroupRepository] = None):
+        settings = get_settings()
+        self.group_repo = group_repo or GroupRepository()
+        self.reload_interval = settings.group_reload_interval
+        self._members: Dict[int, FrozenSet[int]] = {}
+        self._running = False
+        self._changed = asyncio.Event()
+
+        # Статистика
+        self.reloads = 0
+
+    def members(self, user_id: int) -> FrozenSet[int]:
+        """Возвращает user_id всех участников групп пользователя (включая его самого)."""
+        members = self._members.get(user_id)
+        if members is None:
+            return frozenset((user_id,))
+        return members
+
+    async def load(self) -> None:
+        """Перечитывает группы из БД и перестраивает индекс."""
+        groups = await self.group_repo.get_members()
+
+        index: Dict[int, set] = {}
+        for user_ids in groups.values():
+            for user_id in user_ids:
+                index.setdefault(user_id, set()).update(user_ids)
+
+        self._members = {user_id: frozenset(members) for user_id, members in index.items()}
+        self.reloads += 1
+        logger.info(f"Group index loaded: {len(groups)} groups, {len(self._members)} members")
+
+    def invalidate(self) -> None:
+        """Сообщает об изменении групп (индекс перечитается в фоне)."""
+        self._changed.set()
+
+    async def start(self) -> None:
+        """Перечитывает индекс при изменении групп (первая загрузка - load при старте)."""
+        if self._running:
+            logger.warning("Group index is already running")
+            return
+
+        self._running = True
+        try:
+            await self.group_repo.listen_changes(lambda payload: self.invalidate())
+        except Exception as e:
+            logger.warning(f"Group notifications unavailable, reloading every {self.reload_interval}s: {e}")
+
+        while self._running:
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=self.reload_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._changed.clear()
+            if not self._running:
+                break
+
+            try:
+                await self.load()
+            except Exception as e:
+                logger.error(f"Error reloading group index: {e}", exc_info=True)
+
+    async def stop(self) -> None:
+        """Останавливает перечитывание индекса."""
+        self._running = False
+        self._changed.set()
+
+
+# Глобальный singleton индекса
+_group_index: Optional[GroupIndex] = None
+
+
+def get_group_index() -> GroupIndex:
+    """Возвращает singleton индекса групп."""
+    global _group_index
+    if _group_index is None:
+        _group_index = GroupIndex()
+    return _group_index
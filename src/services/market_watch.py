@@ -0,0 +1,228 @@
+"""Единый движок мониторинга маркета для legacy подарков и правил отслеживания."""
+
+import asyncio
+import logging
+import time
+from dataclasses import replace
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from aiogram import Bot
+
+from src.config import get_settings
+from src.models import Gift
+from src.services.portals_service import PortalsService
+from src.services.price_tracker import PriceTracker
+from src.services.shard_coordinator import ShardCoordinator
+from src.services.tracking_price_tracker import TrackingPriceTracker
+
+logger = logging.getLogger(__name__)
+
+
+class MarketBudgetExceeded(Exception):
+    """Исчерпан лимит запросов к API на текущий цикл."""
+
+
+class MarketFetcher:
+    """
+    Общий для всех оценщиков доступ к Portals API в рамках одного цикла.
+
+    Повторяет методы PortalsService, которыми пользуются трекеры
+    (get_gift_data, filterFloors, search), но одинаковые запросы за цикл
+    выполняются один раз (в том числе одновременные), все запросы идут
+    через общий лимит параллельности и общий бюджет на цикл.
+
+    Поиск по модели с сортировкой price_asc без нижней границы цены
+    заодно даёт самый дешёвый лот модели, поэтому legacy проверка той же
+    пары (коллекция, модель) использует его без отдельного запроса.
+    """
+
+    def __init__(self, portals_service: PortalsService, concurrency: int, budget: int = 0):
+        self.portals_service = portals_service
+        self.budget = budget
+        self._semaphore = asyncio.Semaphore(max(1, concurrency))
+        self._results: Dict[Hashable, asyncio.Future] = {}
+        self._cheapest: Dict[tuple, Dict[str, Any]] = {}
+
+        # Статистика цикла
+        self.upstream_calls = 0
+        self.cache_hits = 0
+        self.shared_hits = 0
+        self.budget_skips = 0
+
+    def reset(self) -> None:
+        """Сбрасывает кэш и счётчики перед новым циклом."""
+        self._results.clear()
+        self._cheapest.clear()
+        self.upstream_calls = 0
+        self.cache_hits = 0
+        self.shared_hits = 0
+        self.budget_skips = 0
+
+    async def _cached(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Выполняет запрос один раз за цикл, остальные вызовы ждут его результат."""
+        future = self._results.get(key)
+        if future is not None:
+            self.cache_hits += 1
+        else:
+            future = asyncio.ensure_future(self._call(factory))
+            self._results[key] = future
+        # shield: отмена одного ожидающего не отменяет общий запрос
+        return await asyncio.shield(future)
+
+    async def _call(self, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Выполняет запрос к API с учётом лимита параллельности и бюджета."""
+        async with self._semaphore:
+            if self.budget and self.upstream_calls >= self.budget:
+                self.budget_skips += 1
+                raise MarketBudgetExceeded(f"API budget of {self.budget} requests per cycle exhausted")
+            self.upstream_calls += 1
+            return await factory()
+
+    async def filterFloors(self, gift_name: str = "") -> Dict[str, Any]:
+        """Floor данные коллекции (один запрос на коллекцию за цикл)."""
+        return await self._cached(
+            ("floors", gift_name),
+            lambda: self.portals_service.filterFloors(gift_name=gift_name),
+        )
+
+    async def search(
+        self,
+        sort: str = "price_asc",
+        offset: int = 0,
+        limit: int = 20,
+        gift_name: str = "",
+        model: str = "",
+        min_price: int = 0,
+        max_price: int = 100000,
+    ) -> list:
+        """Поиск лотов (одинаковые параметры - один запрос за цикл)."""
+        key = ("search", sort, offset, limit, gift_name, model, min_price, max_price)
+        lots = await self._cached(
+            key,
+            lambda: self.portals_service.search(
+                sort=sort,
+                offset=offset,
+                limit=limit,
+                gift_name=gift_name,
+                model=model,
+                min_price=min_price,
+                max_price=max_price,
+            ),
+        )
+
+        if lots and model and sort == "price_asc" and offset == 0 and min_price == 0:
+            self._cheapest.setdefault((gift_name, model), lots[0])
+        return lots
+
+    async def get_gift_data(self, gift_name: str, model: str, user_id: int) -> Optional[Gift]:
+        """Самый дешёвый лот модели в виде Gift (один запрос на модель за цикл)."""
+        cheapest = self._cheapest.get((gift_name, model))
+        if cheapest is not None:
+            self.shared_hits += 1
+            return Gift.from_api_response(cheapest, user_id, model)
+
+        gift = await self._cached(
+            ("gift", gift_name, model),
+            lambda: self.portals_service.get_gift_data(gift_name, model, user_id),
+        )
+        return replace(gift, user_id=user_id) if gift else None
+
+
+class MarketWatchEngine:
+    """
+    Один планировщик для legacy подарков (gifts) и правил (tracking_rules).
+
+    Каждый цикл сначала проверяет правила, затем legacy подарки. Оба оценщика
+    работают через общий MarketFetcher, поэтому пересекающиеся коллекции и
+    модели запрашиваются у API один раз, а лимит параллельности и бюджет
+    запросов общие. Логика сравнения цен и отправки алертов остаётся в
+    PriceTracker (снижение цены) и TrackingPriceTracker (совпадение с правилом).
+
+    Если задан tracker_shards, несколько экземпляров делят коллекции через
+    ShardCoordinator, и каждый цикл проверяет только свои шарды.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        portals_service: Optional[PortalsService] = None,
+        deliver_alerts: bool = True,
+    ):
+        self.settings = get_settings()
+        # False - алерты только сохраняются в outbox, доставляет отдельный процесс
+        self.deliver_alerts = deliver_alerts
+        self.fetcher = MarketFetcher(
+            portals_service or PortalsService(),
+            concurrency=self.settings.price_fetch_concurrency,
+            budget=self.settings.market_api_budget,
+        )
+        self.price_tracker = PriceTracker(bot, self.fetcher)
+        self.rule_tracker = TrackingPriceTracker(bot, self.fetcher, deliver_alerts=deliver_alerts)
+        self.shards = ShardCoordinator() if self.settings.tracker_shards > 0 else None
+        self._running = False
+        self._outbox_task: Optional[asyncio.Task] = None
+        self._shards_task: Optional[asyncio.Task] = None
+
+    async def run_cycle(self) -> None:
+        """Выполняет один цикл проверки правил и legacy подарков."""
+        shards = None
+        if self.shards is not None:
+            shards = await self.shards.rebalance()
+            if not shards:
+                logger.info(f"Tracker {self.shards.instance_id} owns no shards, skipping cycle")
+                return
+
+        self.fetcher.reset()
+        started = time.monotonic()
+
+        # Правила первыми: их поиск по модели заодно даёт цены для legacy подарков.
+        # Фоновое перераспределение может отдать шард посреди цикла, поэтому
+        # владение коллекцией сверяется ещё и перед проверкой каждой группы
+        owns = self.shards.owns if self.shards is not None else None
+        await self.rule_tracker.check_all_rules(shards=shards, owns=owns)
+        await self.price_tracker.check_prices(shards=shards, owns=owns)
+
+        fetcher = self.fetcher
+        delivery = self.rule_tracker.sender.get_stats()
+        logger.info(
+            f"Market watch cycle done in {time.monotonic() - started:.1f}s: "
+            f"upstream={fetcher.upstream_calls} cached={fetcher.cache_hits} "
+            f"shared={fetcher.shared_hits} over_budget={fetcher.budget_skips}; "
+            f"delivery sent={delivery['sent']} failed={delivery['failed']} "
+            f"latency_avg={delivery['latency_avg_ms']}ms latency_max={delivery['latency_max_ms']}ms "
+            f"retry_after={delivery['retry_after']} throttled_global={delivery['global_throttled_s']}s "
+            f"throttled_chats={delivery['chat_throttled_s']}s"
+        )
+
+    async def start(self) -> None:
+        """Запускает мониторинг маркета."""
+        if self._running:
+            logger.warning("Market watch engine is already running")
+            return
+
+        self._running = True
+        # Воркер доставки алертов; сразу подхватывает неотправленные после перезапуска
+        if self.deliver_alerts:
+            self._outbox_task = asyncio.create_task(self.rule_tracker.outbox.start())
+        if self.shards is not None:
+            self._shards_task = asyncio.create_task(self.shards.start())
+        logger.info("Market watch engine started")
+
+        while self._running:
+            try:
+                await self.run_cycle()
+            except Exception as e:
+                logger.error(f"Error in market watch loop: {e}", exc_info=True)
+
+            await asyncio.sleep(self.settings.price_check_interval)
+
+    async def stop(self) -> None:
+        """Останавливает мониторинг и доставку, отправляет накопленные дайджесты."""
+        self._running = False
+        if self.shards is not None:
+            await self.shards.stop()
+            self._shards_task = None
+        if self._outbox_task is not None:
+            await self.rule_tracker.outbox.close()
+            self._outbox_task = None
+        logger.info("Market watch engine stopped")
@@ -0,0 +1,215 @@
+"""Кэш file_id картинок Telegram для отправки алертов."""
+
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import InputMediaPhoto, Message
+
+from src.config import get_settings
+from src.repositories import PhotoCacheRepository
+
+logger = logging.getLogger(__name__)
+
+# Ошибки Telegram, означающие, что сам file_id больше не годится
+STALE_FILE_ID_ERRORS = (
+    "wrong file identifier",
+    "wrong remote file identifier",
+    "file reference expired",
+    "file_reference_expired",
+    "wrong padding in the string",
+)
+
+
+def is_stale_file_id(error: TelegramBadRequest) -> bool:
+    """Отличает устаревший file_id от прочих BadRequest (нет чата, разметка, подпись)."""
+    message = str(error.message or error).lower()
+    return any(marker in message for marker in STALE_FILE_ID_ERRORS)
+
+
+class PhotoCache:
+    """
+    Запоминает file_id картинок, уже загруженных в Telegram.
+
+    Картинки моделей повторяются во многих алертах: первая отправка идёт
+    по URL (Telegram сам скачивает картинку), дальше используется file_id
+    из ответа. Соответствие photo_url -> file_id хранится в LRU в памяти и
+    в таблице telegram_photos, поэтому переживает перезапуск.
+    """
+
+    def __init__(self, photo_repo: Optional[PhotoCacheRepository] = None):
+        settings = get_settings()
+        self.photo_repo = photo_repo or PhotoCacheRepository()
+        self.max_size = settings.photo_cache_size
+        self._file_ids: "OrderedDict[str, str]" = OrderedDict()
+        self._upload_locks: Dict[str, asyncio.Lock] = {}
+
+        # Статистика
+        self.hits = 0
+        self.uploads = 0
+        self.stale = 0
+
+    async def load(self, bot: Bot) -> None:
+        """Загружает последние сохранённые file_id в память (при старте)."""
+        try:
+            cached = await self.photo_repo.get_recent(bot.id, self.max_size)
+        except Exception as e:
+            logger.warning(f"Photo cache warm-up failed: {e}")
+            return
+
+        for photo_url, file_id in cached.items():
+            self._put(photo_url, file_id)
+        logger.info(f"Photo cache loaded {len(cached)} file_ids")
+
+    def _put(self, photo_url: str, file_id: str) -> None:
+        """Кладёт file_id в LRU, вытесняя самые старые записи."""
+        self._file_ids[photo_url] = file_id
+        self._file_ids.move_to_end(photo_url)
+        while len(self._file_ids) > self.max_size:
+            self._file_ids.popitem(last=False)
+
+    async def get_file_id(self, bot: Bot, photo_url: str) -> Optional[str]:
+        """Возвращает file_id картинки из памяти или из БД."""
+        file_id = self._file_ids.get(photo_url)
+        if file_id is not None:
+            self._file_ids.move_to_end(photo_url)
+            return file_id
+
+        try:
+            file_id = await self.photo_repo.get(bot.id, photo_url)
+        except Exception:
+            return None
+
+        if file_id is not None:
+            self._put(photo_url, file_id)
+        return file_id
+
+    async def remember(self, bot: Bot, photo_url: str, file_id: str) -> None:
+        """Сохраняет file_id загруженной картинки."""
+        self._put(photo_url, file_id)
+        try:
+            await self.photo_repo.save(bot.id, photo_url, file_id)
+        except Exception:
+            # Кэш в памяти работает и без БД
+            pass
+
+    async def forget(self, bot: Bot, photo_url: str) -> None:
+        """Удаляет недействительный file_id."""
+        self._file_ids.pop(photo_url, None)
+        try:
+            await self.photo_repo.delete(bot.id, photo_url)
+        except Exception:
+            pass
+
+    async def send_photo(self, bot: Bot, chat_id: int, photo_url: str, **kwargs: Any) -> Message:
+        """
+        Отправляет картинку по file_id из кэша, а при его отсутствии - по URL.
+
+        Args:
+            bot: Экземпляр бота
+            chat_id: ID чата
+            photo_url: URL картинки
+            **kwargs: Остальные параметры send_photo (caption, reply_markup, ...)
+
+        Returns:
+            Отправленное сообщение
+        """
+        file_id = await self.get_file_id(bot, photo_url)
+        if file_id is not None:
+            sent = await self._send_cached(bot, chat_id, photo_url, file_id, **kwargs)
+            if sent is not None:
+                return sent
+
+        # Одну и ту же картинку загружаем по URL один раз, остальные ждут file_id
+        lock = self._upload_locks.setdefault(photo_url, asyncio.Lock())
+        try:
+            async with lock:
+                file_id = self._file_ids.get(photo_url)
+                if file_id is not None:
+                    sent = await self._send_cached(bot, chat_id, photo_url, file_id, **kwargs)
+                    if sent is not None:
+                        return sent
+
+                message = await bot.send_photo(chat_id=chat_id, photo=photo_url, **kwargs)
+                self.uploads += 1
+                if message.photo:
+                    await self.remember(bot, photo_url, message.photo[-1].file_id)
+                return message
+        finally:
+            if not lock.locked():
+                self._upload_locks.pop(photo_url, None)
+
+    async def send_media_group(
+        self, bot: Bot, chat_id: int, photos: List[Tuple[str, Optional[str]]]
+    ) -> List[Message]:
+        """
+        Отправляет альбом картинок, используя file_id из кэша где возможно.
+
+        Args:
+            bot: Экземпляр бота
+            chat_id: ID чата
+            photos: Пары (photo_url, подпись), от 2 до 10 штук
+
+        Returns:
+            Отправленные сообщения
+        """
+        file_ids = [await self.get_file_id(bot, photo_url) for photo_url, _ in photos]
+        media = [
+            InputMediaPhoto(media=file_id or photo_url, caption=caption)
+            for (photo_url, caption), file_id in zip(photos, file_ids)
+        ]
+
+        try:
+            messages = await bot.send_media_group(chat_id=chat_id, media=media)
+        except TelegramBadRequest as e:
+            if not any(file_ids) or not is_stale_file_id(e):
+                raise
+            # Какой-то из file_id устарел - забываем все и отправляем по URL
+            logger.warning(f"Cached file_ids rejected in media group, re-uploading: {e}")
+            self.stale += 1
+            for (photo_url, _), file_id in zip(photos, file_ids):
+                if file_id:
+                    await self.forget(bot, photo_url)
+            file_ids = [None] * len(photos)
+            media = [InputMediaPhoto(media=photo_url, caption=caption) for photo_url, caption in photos]
+            messages = await bot.send_media_group(chat_id=chat_id, media=media)
+
+        for (photo_url, _), file_id, message in zip(photos, file_ids, messages):
+            if file_id:
+                self.hits += 1
+            elif message.photo:
+                self.uploads += 1
+                await self.remember(bot, photo_url, message.photo[-1].file_id)
+        return messages
+
+    async def _send_cached(
+        self, bot: Bot, chat_id: int, photo_url: str, file_id: str, **kwargs: Any
+    ) -> Optional[Message]:
+        """Отправляет картинку по file_id. Возвращает None, если file_id устарел."""
+        try:
+            message = await bot.send_photo(chat_id=chat_id, photo=file_id, **kwargs)
+        except TelegramBadRequest as e:
+            if not is_stale_file_id(e):
+                raise
+            logger.warning(f"Cached file_id for {photo_url} rejected, re-uploading: {e}")
+            self.stale += 1
+            await self.forget(bot, photo_url)
+            return None
+
+        self.hits += 1
+        return message
+
+
+# Глобальный singleton
+_photo_cache: Optional[PhotoCache] = None
+
+
+def get_photo_cache() -> PhotoCache:
+    """Возвращает singleton кэша картинок."""
+    global _photo_cache
+    if _photo_cache is None:
+        _photo_cache = PhotoCache()
+    return _photo_cache
@@ -19,7 +19,11 @@ class PortalsService:
     async def init_auth(self) -> None:
         """Инициализирует аутентификацию с Portals API."""
         try:
-            self._auth_token = await update_auth(self.settings.api_id, self.settings.api_hash)
+            self._auth_token = await update_auth(
+                self.settings.api_id,
+                self.settings.api_hash,
+                session_name=self.settings.portals_session_name,
+            )
             logger.info("Portals API authentication successful")
         except Exception as e:
             logger.error(f"Failed to authenticate with Portals API: {e}")
@@ -215,6 +219,7 @@ class PortalsService:
                         'price': getattr(item, 'price', 0),
                         'floor_price': getattr(item, 'floor_price', 0),
                         'photo_url': getattr(item, 'photo_url', ''),
+                        'model_rarity': getattr(item, 'model_rarity', None),
                     }
                     converted_items.append(item_dict)
                 elif isinstance(item, dict):
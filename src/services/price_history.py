@@ -0,0 +1,208 @@
+"""Запись истории цен маркета и свёртка floor OHLC."""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from src.config import get_settings
+from src.models import Gift, PriceObservation
+from src.repositories import PriceHistoryRepository
+from src.repositories.price_history_repository import ROLLUP_GRAINS
+
+logger = logging.getLogger(__name__)
+
+# Окно пересчёта свечей: текущий и предыдущий интервал
+_ROLLUP_LOOKBACK = {
+    "minute": timedelta(minutes=2),
+    "hour": timedelta(hours=2),
+}
+
+# Период удаления устаревших наблюдений (секунды)
+_CLEANUP_INTERVAL = 3600
+
+
+class PriceHistoryRecorder:
+    """
+    Копит наблюдения цен из результатов поиска и пишет их пачками через COPY.
+
+    Лот записывается, только если его цена или floor изменились с прошлого
+    наблюдения, поэтому неизменные лоты не раздувают таблицу. Свечи floor
+    OHLC пересчитываются периодически по свежему окну наблюдений, а сырые
+    наблюдения старше retention_days раз в час удаляются.
+    """
+
+    def __init__(self, history_repo: Optional[PriceHistoryRepository] = None):
+        settings = get_settings()
+        self.history_repo = history_repo or PriceHistoryRepository()
+        self.enabled = settings.price_history_enabled
+        self.flush_interval = settings.price_history_flush_interval
+        self.rollup_interval = settings.price_history_rollup_interval
+        self.max_pending = settings.price_history_max_pending
+        self.retention_days = settings.price_history_retention_days
+        self._running = False
+
+        self._pending: List[PriceObservation] = []
+        # lot_id -> (price, floor_price) последнего записанного наблюдения (LRU)
+        self._last_seen: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._last_seen_limit = settings.price_history_dedupe_size
+        self._last_rollup = 0.0
+        self._last_cleanup = 0.0
+
+        # Статистика
+        self.observed_total = 0
+        self.written_total = 0
+
+    def record_lots(
+        self,
+        lots: Iterable[Dict[str, Any]],
+        models_floors: Optional[Dict[str, float]] = None,
+        observed_at: Optional[datetime] = None,
+    ) -> int:
+        """
+        Добавляет лоты из результата поиска в буфер наблюдений.
+
+        Args:
+            lots: Лоты из PortalsService.search
+            models_floors: Floor цены моделей (если есть)
+            observed_at: Время наблюдения (по умолчанию - сейчас)
+
+        Returns:
+            Количество новых (изменившихся) наблюдений
+        """
+        if not self.enabled:
+            return 0
+
+        observed_at = observed_at or datetime.utcnow()
+        models_floors = models_floors or {}
+        added = 0
+
+        for lot in lots:
+            if not lot.get("id"):
+                continue
+            self.observed_total += 1
+
+            floor_price = models_floors.get(lot.get("model"), lot.get("floor_price", 0)) or 0
+            observation = PriceObservation.from_lot(lot, floor_price, observed_at)
+            if self._is_unchanged(observation):
+                continue
+
+            self._pending.append(observation)
+            added += 1
+
+        if len(self._pending) > self.max_pending:
+            dropped = len(self._pending) - self.max_pending
+            self._pending = self._pending[dropped:]
+            logger.warning(f"Price history buffer overflow, dropped {dropped} oldest observations")
+
+        return added
+
+    def record_gift(self, gift: Gift, observed_at: Optional[datetime] = None) -> int:
+        """Добавляет в буфер наблюдение из legacy трекера."""
+        if not gift.gift_id:
+            return 0
+        lot = {
+            "id": gift.gift_id,
+            "name": gift.name,
+            "model": gift.model,
+            "price": gift.price,
+            "floor_price": gift.floor_price,
+        }
+        return self.record_lots([lot], observed_at=observed_at)
+
+    def _is_unchanged(self, observation: PriceObservation) -> bool:
+        """Проверяет, совпадает ли наблюдение с последним записанным для лота."""
+        key = observation.lot_id
+        value = (observation.price, observation.floor_price)
+
+        if self._last_seen.get(key) == value:
+            self._last_seen.move_to_end(key)
+            return True
+
+        self._last_seen[key] = value
+        self._last_seen.move_to_end(key)
+        if len(self._last_seen) > self._last_seen_limit:
+            self._last_seen.popitem(last=False)
+        return False
+
+    async def flush(self) -> int:
+        """Записывает накопленные наблюдения через COPY."""
+        if not self._pending:
+            return 0
+
+        batch, self._pending = self._pending, []
+        try:
+            written = await self.history_repo.copy_observations(batch)
+        except Exception as e:
+            # Забываем записанное состояние, чтобы лоты попали в следующую пачку
+            for observation in batch:
+                self._last_seen.pop(observation.lot_id, None)
+            logger.error(f"Failed to write {len(batch)} price observations: {e}")
+            return 0
+
+        self.written_total += written
+        logger.info(
+            f"Price history: wrote {written} observations "
+            f"(seen {self.observed_total}, written {self.written_total})"
+        )
+        return written
+
+    async def rollup(self) -> None:
+        """Пересчитывает свежие свечи floor OHLC по всем гранулярностям."""
+        now = datetime.utcnow()
+        for grain in ROLLUP_GRAINS:
+            await self.history_repo.rollup(grain, now - _ROLLUP_LOOKBACK[grain])
+        self._last_rollup = time.monotonic()
+
+    async def cleanup(self) -> int:
+        """Удаляет сырые наблюдения старше retention_days."""
+        self._last_cleanup = time.monotonic()
+        return await self.history_repo.delete_old_observations(self.retention_days)
+
+    async def start(self) -> None:
+        """Запускает фоновую запись наблюдений и свёртку."""
+        if not self.enabled:
+            logger.info("Price history recorder is disabled")
+            return
+
+        if self._running:
+            logger.warning("Price history recorder is already running")
+            return
+
+        self._running = True
+        logger.info("Price history recorder started")
+
+        while self._running:
+            await asyncio.sleep(self.flush_interval)
+
+            try:
+                await self.flush()
+                if time.monotonic() - self._last_rollup >= self.rollup_interval:
+                    await self.rollup()
+                if self.retention_days > 0 and time.monotonic() - self._last_cleanup >= _CLEANUP_INTERVAL:
+                    await self.cleanup()
+            except Exception as e:
+                logger.error(f"Error in price history loop: {e}", exc_info=True)
+
+    async def stop(self) -> None:
+        """Останавливает запись и сбрасывает остаток буфера."""
+        self._running = False
+        if not self.enabled:
+            return
+
+        await self.flush()
+        logger.info("Price history recorder stopped")
+
+
+# Глобальный singleton
+_price_history_recorder: Optional[PriceHistoryRecorder] = None
+
+
+def get_price_history_recorder() -> PriceHistoryRecorder:
+    """Возвращает singleton записи истории цен."""
+    global _price_history_recorder
+    if _price_history_recorder is None:
+        _price_history_recorder = PriceHistoryRecorder()
+    return _price_history_recorder
@@ -2,71 +2,182 @@
 
 import asyncio
 import logging
-from typing import Optional
+from dataclasses import replace
+from typing import Callable, List, Optional, Sequence, Tuple
 from aiogram import Bot
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
 from src.config import get_settings
 from src.repositories import GiftRepository
 from src.services.portals_service import PortalsService
-from src.models import Gift
+from src.services.price_history import get_price_history_recorder
+from src.services.photo_cache import get_photo_cache
+from src.services.alert_sender import get_alert_sender
+from src.services.streaming import iter_groups
+from src.models import Gift, build_lot_url
 
 logger = logging.getLogger(__name__)
 
 
 class PriceTracker:
-    """Сервис для мониторинга цен на подарки."""
+    """
+    Сервис для мониторинга цен на подарки (legacy).
+
+    Цикл проверки запускает MarketWatchEngine, данные API приходят через
+    его общий MarketFetcher (или напрямую из PortalsService).
+    """
 
     def __init__(self, bot: Bot, portals_service: PortalsService = None):
         self.bot = bot
         self.settings = get_settings()
         self.gift_repo = GiftRepository()
         self.portals_service = portals_service or PortalsService()
-        self._running = False
-
-    async def check_prices(self) -> None:
-        """Проверяет цены на все отслеживаемые подарки."""
+        self.price_history = get_price_history_recorder()
+        self.photo_cache = get_photo_cache()
+        self.sender = get_alert_sender()
+
+    async def check_prices(
+        self,
+        shards: Optional[Sequence[int]] = None,
+        owns: Optional[Callable[[Optional[int]], bool]] = None,
+    ) -> None:
+        """
+        Проверяет цены на все отслеживаемые подарки.
+
+        Подарки читаются из БД пачками, упорядоченными по модели. Один подарок
+        могут отслеживать несколько пользователей, поэтому подписки собираются
+        в группы по паре (коллекция, модель), и каждая группа запрашивается у
+        API один раз. Группы обрабатывают price_fetch_concurrency воркеров,
+        пока читаются следующие пачки.
+
+        Args:
+            shards: Проверять только коллекции этих шардов (None - все)
+            owns: Принадлежит ли коллекция экземпляру сейчас (по collection_id);
+                группы отданных посреди цикла шардов пропускаются
+        """
+        concurrency = max(1, self.settings.price_fetch_concurrency)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+        # Изменившиеся цены копим и пишем пачками одним запросом
+        price_updates: List[Gift] = []
+        gifts_count = 0
+        groups_count = 0
+
+        workers = [
+            asyncio.create_task(self._price_worker(queue, price_updates, owns))
+            for _ in range(concurrency)
+        ]
         try:
-            gifts = await self.gift_repo.get_all()
-            logger.info(f"Checking prices for {len(gifts)} gifts")
+            groups = iter_groups(self.gift_repo.iter_all(shards=shards), key=lambda gift: (gift.name, gift.model))
+            async for key, gifts in groups:
+                gifts_count += len(gifts)
+                if not key[1]:
+                    for gift in gifts:
+                        logger.warning(f"Skipping gift '{gift.name}' for user {gift.user_id} (no model)")
+                    continue
+
+                await queue.put((key, gifts))
+                groups_count += 1
+
+                if len(price_updates) >= self.settings.db_stream_batch_size:
+                    await self._save_price_updates(price_updates)
 
-            for gift in gifts:
-                await self._check_gift_price(gift)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+
+            logger.info(f"Checked prices for {gifts_count} gifts ({groups_count} distinct)")
 
         except Exception as e:
             logger.error(f"Error in check_prices: {e}", exc_info=True)
-
-    async def _check_gift_price(self, gift: Gift) -> None:
-        """Проверяет цену конкретного подарка."""
-        if not gift.model:
-            logger.warning(f"Skipping gift '{gift.name}' for user {gift.user_id} (no model)")
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await self._save_price_updates(price_updates)
+
+    async def _price_worker(
+        self,
+        queue: asyncio.Queue,
+        price_updates: List[Gift],
+        owns: Optional[Callable[[Optional[int]], bool]] = None,
+    ) -> None:
+        """Обрабатывает группы подарков из очереди до получения None."""
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            key, gifts = item
+            # Шард мог уйти другому экземпляру, пока группа ждала в очереди
+            if owns is not None and not owns(gifts[0].collection_id):
+                logger.info(f"Shard of '{key[0]}' released, skipping '{key[0]}' ({key[1]})")
+                continue
+            price_updates.extend(await self._check_gift_group(key, gifts))
+
+    async def _save_price_updates(self, price_updates: List[Gift]) -> None:
+        """Записывает накопленные новые цены одним запросом и очищает список."""
+        if not price_updates:
             return
 
+        batch = list(price_updates)
+        price_updates.clear()
         try:
-            updated_gift = await self.portals_service.get_gift_data(
-                gift.name, gift.model, gift.user_id
-            )
+            await self.gift_repo.update_prices_many(batch)
+        except Exception as e:
+            logger.error(f"Failed to save {len(batch)} price updates: {e}")
 
-            if not updated_gift:
-                logger.warning(f"Could not fetch data for '{gift.name}' ({gift.model})")
-                return
+    async def _check_gift_group(self, key: Tuple[str, str], gifts: List[Gift]) -> List[Gift]:
+        """
+        Запрашивает данные подарка и сравнивает их с ценами каждого пользователя.
+
+        Args:
+            key: Пара (название, модель)
+            gifts: Подарки всех пользователей, отслеживающих эту пару
+
+        Returns:
+            Подарки с новыми ценами, которые нужно сохранить
+        """
+        name, model = key
+        # Backpressure: при упоре в лимиты Telegram не копим новые алерты
+        await self.sender.wait_for_capacity()
+
+        try:
+            fetched = await self.portals_service.get_gift_data(name, model, gifts[0].user_id)
+        except Exception as e:
+            logger.error(f"Error fetching price for '{name}' ({model}): {e}", exc_info=True)
+            return []
+
+        if not fetched:
+            logger.warning(f"Could not fetch data for '{name}' ({model})")
+            return []
 
+        self.price_history.record_gift(fetched)
+
+        updates = []
+        for gift in gifts:
+            updated = await self._check_gift_price(gift, replace(fetched, user_id=gift.user_id))
+            if updated:
+                updates.append(updated)
+        return updates
+
+    async def _check_gift_price(self, gift: Gift, updated_gift: Gift) -> Optional[Gift]:
+        """
+        Сравнивает сохранённые цены подарка пользователя с актуальными.
+
+        Returns:
+            Подарок с новыми ценами, если цена снизилась и их нужно сохранить
+        """
+        try:
             if updated_gift.price < gift.price or updated_gift.floor_price < gift.floor_price:
                 await self._send_price_alert(gift, updated_gift)
-                await self.gift_repo.update_prices(
-                    gift.user_id,
-                    gift.name,
-                    gift.model,
-                    updated_gift.price,
-                    updated_gift.floor_price,
-                )
+                return replace(gift, price=updated_gift.price, floor_price=updated_gift.floor_price)
 
         except Exception as e:
             logger.error(
-                f"Error checking price for '{gift.name}' ({gift.model}): {e}",
+                f"Error checking price for '{gift.name}' ({gift.model}) for user {gift.user_id}: {e}",
                 exc_info=True,
             )
 
+        return None
+
     async def _send_price_alert(self, old_gift: Gift, new_gift: Gift) -> None:
         """Отправляет уведомление о снижении цены."""
         caption = (
@@ -83,46 +194,28 @@ class PriceTracker:
                     [
                         InlineKeyboardButton(
                             text="Открыть в Portals",
-                            url=f"https://t.me/portals/market?startapp=gift_{new_gift.gift_id}",
+                            url=build_lot_url(new_gift.gift_id),
                         )
                     ]
                 ]
             )
 
-        try:
+        async def deliver(chat_id: int) -> None:
             if new_gift.photo_url:
-                await self.bot.send_photo(
-                    chat_id=new_gift.user_id,
-                    photo=new_gift.photo_url,
+                await self.photo_cache.send_photo(
+                    self.bot,
+                    chat_id,
+                    new_gift.photo_url,
                     caption=caption,
                     reply_markup=keyboard,
                 )
             else:
-                await self.bot.send_message(
-                    chat_id=new_gift.user_id, text=caption, reply_markup=keyboard
-                )
-            logger.info(f"Price alert sent to user {new_gift.user_id}")
-        except Exception as e:
-            logger.error(f"Failed to send price alert to user {new_gift.user_id}: {e}")
-
-    async def start(self) -> None:
-        """Запускает мониторинг цен."""
-        if self._running:
-            logger.warning("Price tracker is already running")
-            return
-
-        self._running = True
-        logger.info("Price tracker started")
+                await self.bot.send_message(chat_id=chat_id, text=caption, reply_markup=keyboard)
 
-        while self._running:
-            try:
-                await self.check_prices()
-            except Exception as e:
-                logger.error(f"Error in price tracker loop: {e}", exc_info=True)
-
-            await asyncio.sleep(self.settings.price_check_interval)
-
-    def stop(self) -> None:
-        """Останавливает мониторинг цен."""
-        self._running = False
-        logger.info("Price tracker stopped")
\ No newline at end of file
+        result = await self.sender.send(new_gift.user_id, deliver)
+        if result.ok:
+            logger.info(
+                f"Price alert sent to user {new_gift.user_id} in {result.latency * 1000:.0f}ms"
+            )
+        else:
+            logger.error(f"Failed to send price alert to user {new_gift.user_id}: {result.error}")
@@ -0,0 +1,130 @@
+"""Распределение шардов мониторинга маркета между экземплярами трекера."""
+
+import asyncio
+import logging
+import math
+import os
+import socket
+from typing import List, Optional
+
+from src.config import get_settings
+from src.repositories import ShardRepository
+
+logger = logging.getLogger(__name__)
+
+
+class ShardCoordinator:
+    """
+    Делит коллекции между экземплярами трекера через таблицу аренды.
+
+    Коллекция относится к шарду collection_id % tracker_shards. Экземпляр
+    периодически отмечается живым, продлевает аренду своих шардов и
+    добирает свободные до своей доли ceil(шардов / живых экземпляров).
+    Лишние шарды сверх доли (например, после запуска нового экземпляра)
+    отдаются, и их забирают другие. Если экземпляр умер, его аренда
+    истекает через tracker_shard_lease секунд, а живой экземпляр исчезает
+    из счёта - остальные делят его шарды.
+    """
+
+    def __init__(
+        self,
+        instance_id: Optional[str] = None,
+        shard_count: Optional[int] = None,
+        shard_repo: Optional[ShardRepository] = None,
+    ):
+        settings = get_settings()
+        self.instance_id = (
+            instance_id or settings.tracker_instance_id or f"{socket.gethostname()}:{os.getpid()}"
+        )
+        self.shard_count = shard_count or settings.tracker_shards
+        self.lease = settings.tracker_shard_lease
+        self.shard_repo = shard_repo or ShardRepository()
+        self.owned: List[int] = []
+        self._initialized = False
+        self._running = False
+        self._stop_requested = asyncio.Event()
+        self._lock = asyncio.Lock()
+
+    async def rebalance(self) -> List[int]:
+        """
+        Продлевает аренду, отдаёт лишние и забирает свободные шарды.
+
+        Returns:
+            Шарды, которыми экземпляр владеет после перераспределения
+        """
+        async with self._lock:
+            if not self._initialized:
+                await self.shard_repo.ensure_shards(self.shard_count)
+                self._initialized = True
+
+            instances = await self.shard_repo.heartbeat(self.instance_id, self.lease)
+            fair_share = math.ceil(self.shard_count / max(1, instances))
+
+            owned = await self.shard_repo.renew(self.instance_id, self.shard_count, self.lease)
+            if len(owned) > fair_share:
+                extra = owned[fair_share:]
+                await self.shard_repo.release(self.instance_id, extra)
+                owned = owned[:fair_share]
+            elif len(owned) < fair_share:
+                owned += await self.shard_repo.claim(
+                    self.instance_id, self.shard_count, fair_share - len(owned), self.lease
+                )
+                owned.sort()
+
+            if owned != self.owned:
+                logger.info(
+                    f"Tracker {self.instance_id} owns shards {owned} of {self.shard_count} "
+                    f"({instances} instances alive)"
+                )
+            self.owned = owned
+            return owned
+
+    def owns(self, collection_id: Optional[int]) -> bool:
+        """
+        Проверяет, принадлежит ли коллекция шардам экземпляра сейчас.
+
+        Цикл мониторинга читает список шардов один раз, а фоновое
+        перераспределение может отдать шард посреди цикла - перед проверкой
+        каждой коллекции владение сверяется заново.
+        """
+        if collection_id is None:
+            return True
+        return collection_id % self.shard_count in self.owned
+
+    async def start(self) -> None:
+        """Продлевает аренду в фоне, чтобы долгий цикл не терял шарды."""
+        if self._running:
+            logger.warning("Shard coordinator is already running")
+            return
+
+        self._running = True
+        self._stop_requested.clear()
+        interval = self.lease / 3
+        logger.info(
+            f"Shard coordinator started (instance={self.instance_id}, shards={self.shard_count}, "
+            f"lease={self.lease:.0f}s)"
+        )
+
+        while self._running:
+            try:
+                await self.rebalance()
+            except Exception as e:
+                logger.error(f"Error in shard coordinator loop: {e}", exc_info=True)
+
+            try:
+                await asyncio.wait_for(self._stop_requested.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def stop(self) -> None:
+        """Отдаёт шарды сразу, не дожидаясь истечения аренды."""
+        self._running = False
+        self._stop_requested.set()
+        async with self._lock:
+            try:
+                await self.shard_repo.unregister(self.instance_id)
+            except Exception:
+                # Аренда истечёт сама
+                pass
+            self.owned = []
+        logger.info(f"Shard coordinator stopped (instance={self.instance_id})")
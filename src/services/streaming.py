@@ -0,0 +1,39 @@
+"""Вспомогательные функции для потоковой обработки выборок из БД."""
+
+from typing import AsyncIterator, Callable, Hashable, List, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+async def iter_groups(
+    batches: AsyncIterator[List[T]],
+    key: Callable[[T], Hashable],
+) -> AsyncIterator[Tuple[Hashable, List[T]]]:
+    """
+    Собирает подряд идущие элементы с одинаковым ключом в группы.
+
+    Выборка должна быть отсортирована по ключу - тогда каждая группа
+    отдаётся ровно один раз, как только закончилась, и в памяти держится
+    только текущая группа и текущая пачка.
+
+    Args:
+        batches: Пачки элементов (например, из обхода таблицы репозиторием)
+        key: Функция ключа группировки
+
+    Yields:
+        Пары (ключ, элементы группы)
+    """
+    current_key = None
+    current: List[T] = []
+
+    async for batch in batches:
+        for item in batch:
+            item_key = key(item)
+            if current and item_key != current_key:
+                yield current_key, current
+                current = []
+            current_key = item_key
+            current.append(item)
+
+    if current:
+        yield current_key, current
@@ -1,8 +1,7 @@
 """Новый сервис для отслеживания правил и отправки алертов."""
 
-import asyncio
 import logging
-from typing import List, Dict, Any
+from typing import Callable, List, Dict, Any, Optional, Sequence
 from collections import defaultdict
 from datetime import datetime, timedelta
 from aiogram import Bot
@@ -11,22 +10,45 @@ from src.config import get_settings
 from src.repositories import TrackingRuleRepository, AlertRepository
 from src.models import TrackingRule, Alert, ConditionType
 from src.services.portals_service import PortalsService
-from src.services.user_cache import get_user_cache
-from src.keyboards import get_alert_keyboard
+from src.services.price_history import get_price_history_recorder
+from src.services.alert_sender import get_alert_sender
+from src.services.alert_digest import AlertDigest
+from src.services.alert_outbox import AlertOutbox
+from src.services.streaming import iter_groups
 
 logger = logging.getLogger(__name__)
 
 
 class TrackingPriceTracker:
-    """Сервис для мониторинга правил отслеживания и отправки алертов."""
+    """
+    Сервис для мониторинга правил отслеживания и отправки алертов.
 
-    def __init__(self, bot: Bot, portals_service: PortalsService = None):
+    Цикл проверки запускает MarketWatchEngine, данные API приходят через
+    его общий MarketFetcher (или напрямую из PortalsService).
+    """
+
+    def __init__(self, bot: Bot, portals_service: PortalsService = None, deliver_alerts: bool = True):
         self.bot = bot
         self.settings = get_settings()
+        # False - алерты доставляет отдельный процесс, backpressure по outbox в БД
+        self.deliver_alerts = deliver_alerts
         self.rule_repo = TrackingRuleRepository()
         self.alert_repo = AlertRepository()
+        self.price_history = get_price_history_recorder()
+        self.sender = get_alert_sender()
+
+        # Режим дайджеста (опционально): алерты за окно одним сообщением
+        self.digest = (
+            AlertDigest(bot, is_paused=self._is_user_paused, sender=self.sender)
+            if self.settings.alert_digest_enabled
+            else None
+        )
         self.api = portals_service or PortalsService()
-        self._running = False
+
+        # Доставка алертов из таблицы alerts (запускает MarketWatchEngine)
+        self.outbox = AlertOutbox(
+            bot, is_paused=self._is_user_paused, digest=self.digest, sender=self.sender
+        )
 
         # Rate limiting: не более 3 алертов в минуту для одного пользователя
         self._user_alert_timestamps: Dict[int, List[datetime]] = defaultdict(list)
@@ -40,41 +62,40 @@ class TrackingPriceTracker:
         self._user_pauses: Dict[int, datetime] = {}
         self._user_pause_seconds = 15
 
-    async def check_all_rules(self) -> None:
-        """Проверяет все активные правила отслеживания."""
-        try:
-            rules = await self.rule_repo.get_all_active()
-            logger.info(f"Checking {len(rules)} active tracking rules")
-
-            if not rules:
-                return
+    async def check_all_rules(
+        self,
+        shards: Optional[Sequence[int]] = None,
+        owns: Optional[Callable[[Optional[int]], bool]] = None,
+    ) -> None:
+        """
+        Проверяет все активные правила отслеживания.
 
-            # Группируем правила по коллекциям для оптимизации запросов
-            rules_by_collection = self._group_rules_by_collection(rules)
+        Правила читаются из БД пачками, упорядоченными по коллекции, и
+        проверяются по коллекциям по мере чтения - floor данные запрашиваются
+        один раз на коллекцию, а в памяти держится только текущая группа.
 
-            for collection_name, collection_rules in rules_by_collection.items():
+        Args:
+            shards: Проверять только коллекции этих шардов (None - все)
+            owns: Принадлежит ли коллекция экземпляру сейчас (по collection_id);
+                коллекции отданных посреди цикла шардов пропускаются
+        """
+        try:
+            rules_count = 0
+            groups = iter_groups(
+                self.rule_repo.iter_active(shards=shards), key=lambda rule: rule.collection_name
+            )
+            async for collection_name, collection_rules in groups:
+                if owns is not None and not owns(collection_rules[0].collection_id):
+                    logger.info(f"Shard of collection '{collection_name}' released, skipping its rules")
+                    continue
+                rules_count += len(collection_rules)
                 await self._check_collection_rules(collection_name, collection_rules)
 
+            logger.info(f"Checked {rules_count} active tracking rules")
+
         except Exception as e:
             logger.error(f"Error in check_all_rules: {e}", exc_info=True)
 
-    def _group_rules_by_collection(
-        self, rules: List[TrackingRule]
-    ) -> Dict[str, List[TrackingRule]]:
-        """
-        Группирует правила по коллекциям.
-
-        Args:
-            rules: Список правил
-
-        Returns:
-            Словарь {collection_name: [rules]}
-        """
-        grouped = defaultdict(list)
-        for rule in rules:
-            grouped[rule.collection_name].append(rule)
-        return dict(grouped)
-
     async def _check_collection_rules(
         self, collection_name: str, rules: List[TrackingRule]
     ) -> None:
@@ -165,6 +186,12 @@ class TrackingPriceTracker:
             models_floors: Словарь floor цен по моделям
         """
         try:
+            # Backpressure: при упоре в лимиты Telegram не копим новые алерты
+            if self.deliver_alerts:
+                await self.sender.wait_for_capacity()
+            else:
+                await self.outbox.wait_for_backlog()
+
             # ПРИОРИТЕТ ИНТЕРФЕЙСА: проверяем, не на паузе ли пользователь
             if self._is_user_paused(rule.user_id):
                 logger.debug(f"User {rule.user_id} is paused (UI priority), skipping rule #{rule.rule_id}")
@@ -190,6 +217,9 @@ class TrackingPriceTracker:
                 logger.debug(f"No lots found for rule #{rule.rule_id}")
                 return
 
+            # Сохраняем увиденные цены в историю (запись пачкой, в фоне)
+            self.price_history.record_lots(lots, models_floors)
+
             # Фильтруем лоты по условиям правила
             matching_lots = []
             for lot in lots:
@@ -204,6 +234,15 @@ class TrackingPriceTracker:
                     if not already_sent:
                         matching_lots.append(lot)
 
+            # Режим дайджеста: все найденные лоты копятся и уходят одним сообщением
+            if self.digest is not None:
+                for lot in matching_lots:
+                    await self._enqueue_alert(rule, lot, models_floors)
+                if matching_lots:
+                    self._set_rule_cooldown(rule.rule_id)
+                    logger.info(f"Queued {len(matching_lots)} alerts for rule #{rule.rule_id} to digest")
+                return
+
             # Отправляем алерты для найденных лотов
             alerts_sent = 0
             for lot in matching_lots[:5]:  # Максимум 5 алертов за раз
@@ -212,21 +251,19 @@ class TrackingPriceTracker:
                     logger.warning(f"Rate limit reached for user {rule.user_id}, stopping alerts")
                     break
 
-                # Отправляем алерт асинхронно (не блокируем event loop)
-                asyncio.create_task(self._send_alert(rule, lot, models_floors))
+                # Сохраняем алерт в outbox, доставка - воркером AlertOutbox
+                if not await self._enqueue_alert(rule, lot, models_floors):
+                    continue
 
                 # Регистрируем отправленный алерт
                 self._register_alert_sent(rule.user_id)
                 alerts_sent += 1
 
-                # Небольшая задержка между алертами, чтобы event loop успевал обрабатывать команды
-                await asyncio.sleep(0.5)
-
             # Если отправили хотя бы один алерт, устанавливаем cooldown для правила
             if alerts_sent > 0:
                 self._set_rule_cooldown(rule.rule_id)
                 logger.info(
-                    f"Sent {alerts_sent} alerts for rule #{rule.rule_id}, cooldown set for {self._rule_cooldown_seconds}s"
+                    f"Queued {alerts_sent} alerts for rule #{rule.rule_id}, cooldown set for {self._rule_cooldown_seconds}s"
                 )
 
         except Exception as e:
@@ -266,115 +303,34 @@ class TrackingPriceTracker:
         # ANY_PRICE - возвращаем большое число
         return 100000
 
-    async def _send_alert(
+    async def _enqueue_alert(
         self, rule: TrackingRule, lot: Dict[str, Any], models_floors: Dict[str, float]
-    ) -> None:
+    ) -> bool:
         """
-        Создаёт и отправляет алерт пользователю и всем членам его группы.
+        Сохраняет алерт по найденному лоту в outbox и будит воркер доставки.
 
-        Args:
-            rule: Правило отслеживания
-            lot: Данные о лоте
-            models_floors: Floor цены моделей
+        Returns:
+            True, если алерт сохранён (False - ошибка или алерт по лоту уже есть)
         """
-        try:
-            # Создаём объект Alert
-            lot_floor_price = float(models_floors.get(lot["model"], lot.get("floor_price", 0)) or 0)
-            # Формат: https://t.me/portals/market?startapp=gift_{id}
-            # где id включает UUID и суффикс (например: abc-123_k74zqq)
-            lot_url = f"https://t.me/portals/market?startapp=gift_{lot['id']}"
-
-            alert = Alert(
-                rule_id=rule.rule_id,
-                user_id=rule.user_id,
-                lot_id=lot["id"],
-                lot_price=lot["price"],
-                lot_floor_price=lot_floor_price,
-                collection_name=lot["name"],
-                model=lot["model"],
-                photo_url=lot.get("photo_url"),
-                lot_url=lot_url,
-            )
-
-            # Сохраняем в БД
-            alert_id = await self.alert_repo.create(alert)
-            alert.alert_id = alert_id
-
-            # Формируем сообщение
-            message_text = alert.format_message()
-            keyboard = get_alert_keyboard(lot_url, rule.rule_id)
-
-            # Получаем всех членов группы пользователя
-            user_cache = get_user_cache()
-            group_user_ids = user_cache.get_group_user_ids_by_user_id(rule.user_id)
-
-            logger.info(f"Sending alert to {len(group_user_ids)} users in group")
-
-            # Отправляем алерт каждому члену группы
-            for target_user_id in group_user_ids:
-                # Проверяем, не на паузе ли пользователь
-                if self._is_user_paused(target_user_id):
-                    logger.debug(f"User {target_user_id} is paused, skipping alert")
-                    continue
-
-                try:
-                    # Отправляем пользователю
-                    if lot.get("photo_url"):
-                        try:
-                            await self.bot.send_photo(
-                                chat_id=target_user_id,
-                                photo=lot["photo_url"],
-                                caption=message_text,
-                                reply_markup=keyboard,
-                                parse_mode="Markdown",
-                            )
-                        except Exception as e:
-                            logger.error(f"Error sending photo to user {target_user_id}: {e}")
-                            await self.bot.send_message(
-                                chat_id=target_user_id,
-                                text=message_text,
-                                reply_markup=keyboard,
-                                parse_mode="Markdown",
-                            )
-                    else:
-                        await self.bot.send_message(
-                            chat_id=target_user_id,
-                            text=message_text,
-                            reply_markup=keyboard,
-                            parse_mode="Markdown",
-                        )
-
-                    logger.info(f"Alert sent to user {target_user_id}")
-
-                except Exception as e:
-                    logger.error(f"Error sending alert to user {target_user_id}: {e}")
-
-            # Отмечаем как отправленный
-            await self.alert_repo.mark_as_sent(alert_id)
-
-            logger.info(f"Alert sent: rule #{rule.rule_id}, lot {lot['id']}, group size {len(group_user_ids)}")
+        lot_floor_price = float(models_floors.get(lot["model"], lot.get("floor_price", 0)) or 0)
+
+        alert = Alert(
+            rule_id=rule.rule_id,
+            user_id=rule.user_id,
+            lot_id=lot["id"],
+            lot_price=lot["price"],
+            lot_floor_price=lot_floor_price,
+            collection_name=lot["name"],
+            model=lot["model"],
+            photo_url=lot.get("photo_url"),
+        )
 
+        try:
+            if await self.alert_repo.create(alert) is None:
+                return False
         except Exception as e:
-            logger.error(f"Error sending alert: {e}", exc_info=True)
-
-    async def start(self) -> None:
-        """Запускает мониторинг правил."""
-        if self._running:
-            logger.warning("Tracking price tracker is already running")
-            return
-
-        self._running = True
-        logger.info("Tracking price tracker started")
-
-        while self._running:
-            try:
-                await self.check_all_rules()
-            except Exception as e:
-                logger.error(f"Error in tracker loop: {e}", exc_info=True)
-
-            await asyncio.sleep(self.settings.price_check_interval)
+            logger.error(f"Error saving alert for rule #{rule.rule_id}: {e}", exc_info=True)
+            return False
 
-    def stop(self) -> None:
-        """Останавливает мониторинг."""
-        self._running = False
-        logger.info("Tracking price tracker stopped")
+        self.outbox.notify()
+        return True
@@ -1,19 +1,120 @@
 """Кэш для маппинга username -> user_id."""
 
+import asyncio
 import logging
-from typing import Optional, List
+from datetime import datetime
+from typing import Optional, List, Tuple
 from src.config import get_settings
+from src.repositories import UserRepository
+from src.services.group_index import get_group_index
 
 logger = logging.getLogger(__name__)
 
 
 class UserCache:
-    """Кэш для хранения маппинга username <-> user_id."""
-
-    def __init__(self):
+    """
+    Кэш для хранения маппинга username <-> user_id.
+
+    Содержимое хранится в таблице users: при старте она целиком грузится
+    в память (load), поэтому рассылка алертов группе работает с первого
+    цикла, не дожидаясь, пока все участники снова напишут боту. Middleware
+    отмечает пользователей через touch, а запись в БД идёт пачками, как
+    в AlertStatusBuffer: повторные события одного пользователя между
+    сбросами схлопываются в одну строку.
+    """
+
+    def __init__(self, user_repo: Optional[UserRepository] = None):
+        settings = get_settings()
+        self.user_repo = user_repo or UserRepository()
+        self.batch_size = settings.user_flush_batch_size
+        self.flush_interval = settings.user_flush_interval
         self._cache: dict[str, int] = {}  # username -> user_id
         self._reverse_cache: dict[int, str] = {}  # user_id -> username
 
+        # user_id -> (username, last_seen), ещё не записанные в БД
+        self._pending: dict[int, Tuple[Optional[str], datetime]] = {}
+        self._running = False
+        self._flush_requested = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+
+        # Статистика
+        self.flushed_total = 0
+
+    async def load(self) -> None:
+        """Загружает всех известных пользователей в память (при старте)."""
+        try:
+            users = await self.user_repo.get_all()
+        except Exception as e:
+            logger.warning(f"User cache warm-up failed: {e}")
+            return
+
+        for user_id, username in users.items():
+            self.add_user(username, user_id)
+        logger.info(f"User cache loaded {len(users)} users")
+
+    def touch(self, user_id: int, username: Optional[str]) -> None:
+        """Отмечает, что пользователь писал боту (запись в БД - в фоне)."""
+        if username and self._reverse_cache.get(user_id) != username:
+            self.add_user(username, user_id)
+
+        self._pending[user_id] = (username, datetime.utcnow())
+        if len(self._pending) >= self.batch_size:
+            self._flush_requested.set()
+
+    async def flush(self) -> int:
+        """
+        Записывает отмеченных пользователей в БД.
+
+        Returns:
+            Количество записанных пользователей
+        """
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+
+            batch, self._pending = self._pending, {}
+            try:
+                await self.user_repo.upsert_many(
+                    [(user_id, username, seen) for user_id, (username, seen) in batch.items()]
+                )
+            except Exception as e:
+                # Возвращаем пачку, более свежие отметки важнее
+                self._pending = {**batch, **self._pending}
+                logger.error(f"Failed to flush {len(batch)} users: {e}")
+                return 0
+
+            self.flushed_total += len(batch)
+            logger.debug(f"Flushed {len(batch)} users")
+            return len(batch)
+
+    async def start(self) -> None:
+        """Запускает фоновую запись пользователей."""
+        if self._running:
+            logger.warning("User cache flusher is already running")
+            return
+
+        self._running = True
+        logger.info(f"User cache flusher started (batch={self.batch_size}, interval={self.flush_interval}s)")
+
+        while self._running:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error in user cache flush loop: {e}", exc_info=True)
+
+    async def stop(self) -> None:
+        """Останавливает фоновую запись и записывает остаток."""
+        self._running = False
+        self._flush_requested.set()
+        await self.flush()
+        logger.info(f"User cache flusher stopped (flushed {self.flushed_total}, pending {len(self._pending)})")
+
     def add_user(self, username: str, user_id: int) -> None:
         """Добавляет пользователя в кэш."""
         if username:
@@ -37,26 +138,13 @@ class UserCache:
             username: Username пользователя
 
         Returns:
-            Список user_id всех пользователей группы
+            Список user_id всех пользователей группы (пустой, если пользователь неизвестен)
         """
-        settings = get_settings()
-        group_members = settings.get_group_members(username)
-
-        user_ids = []
-        for member in group_members:
-            user_id = self.get_user_id(member)
-            if user_id:
-                user_ids.append(user_id)
-            else:
-                logger.warning(f"User {member} from group not found in cache")
-
-        # Если не нашли всех членов группы, вернём хотя бы текущего пользователя
-        if not user_ids:
-            current_user_id = self.get_user_id(username)
-            if current_user_id:
-                user_ids = [current_user_id]
-
-        return user_ids
+        user_id = self.get_user_id(username)
+        if user_id is None:
+            logger.warning(f"User {username} not found in cache")
+            return []
+        return self.get_group_user_ids_by_user_id(user_id)
 
     def get_group_user_ids_by_user_id(self, user_id: int) -> List[int]:
         """
@@ -66,18 +154,9 @@ class UserCache:
             user_id: ID пользователя
 
         Returns:
-            Список user_id всех пользователей группы
+            Список user_id всех пользователей группы (только он сам, если групп нет)
         """
-        # Получаем username по user_id
-        username = self.get_username(user_id)
-
-        if not username:
-            # Если username не найден в кэше, возвращаем только текущего пользователя
-            logger.warning(f"Username not found for user_id {user_id}, returning only this user")
-            return [user_id]
-
-        # Используем существующий метод
-        return self.get_group_user_ids(username)
+        return list(get_group_index().members(user_id))
 
 
 # Глобальный singleton кэша
@@ -0,0 +1,109 @@
+"""Приём обновлений Telegram через webhook (встроенный aiohttp сервер)."""
+
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from src.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+class LimitedRequestHandler(SimpleRequestHandler):
+    """
+    Обработчик webhook с ограничением одновременно обрабатываемых обновлений.
+
+    Telegram получает ответ 200 сразу, обновление обрабатывается в фоне.
+    Не больше max_concurrent обновлений выполняются одновременно, остальные
+    ждут своей очереди - всплеск нажатий не создаёт сотни параллельных
+    запросов к БД.
+    """
+
+    def __init__(
+        self,
+        dispatcher: Dispatcher,
+        bot: Bot,
+        max_concurrent: int,
+        secret_token: Optional[str] = None,
+        **data: Any,
+    ):
+        super().__init__(dispatcher, bot, handle_in_background=True, secret_token=secret_token, **data)
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrent))
+
+        # Статистика
+        self.received = 0
+        self.processed = 0
+
+    async def _background_feed_update(self, bot: Bot, update: Dict[str, Any]) -> None:
+        self.received += 1
+        async with self._semaphore:
+            try:
+                await super()._background_feed_update(bot, update)
+            finally:
+                self.processed += 1
+
+    @property
+    def pending(self) -> int:
+        """Обновлений принято, но ещё не обработано."""
+        return self.received - self.processed
+
+
+def create_webhook_app(bot: Bot, dp: Dispatcher) -> web.Application:
+    """
+    Создаёт aiohttp приложение с обработчиком webhook по пути WEBHOOK_PATH.
+
+    Если задан WEBHOOK_SECRET, запросы без совпадающего заголовка
+    X-Telegram-Bot-Api-Secret-Token отклоняются (401).
+    """
+    settings = get_settings()
+    app = web.Application()
+    handler = LimitedRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        max_concurrent=settings.webhook_max_concurrent_updates,
+        secret_token=settings.webhook_secret,
+    )
+    handler.register(app, path=settings.webhook_path)
+    app["webhook_handler"] = handler
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+async def run_webhook(bot: Bot, dp: Dispatcher) -> None:
+    """
+    Регистрирует webhook в Telegram и обслуживает его до отмены.
+
+    Raises:
+        ValueError: Если не задан WEBHOOK_URL
+    """
+    settings = get_settings()
+    if not settings.webhook_url:
+        raise ValueError("WEBHOOK_URL is required when BOT_MODE=webhook")
+
+    app = create_webhook_app(bot, dp)
+    # Каждое обновление и так логирует aiogram, access log не нужен
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host=settings.webhook_host, port=settings.webhook_port)
+    await site.start()
+    logger.info(f"Webhook server listening on {settings.webhook_host}:{settings.webhook_port}{settings.webhook_path}")
+
+    url = settings.webhook_url.rstrip("/") + settings.webhook_path
+    await bot.set_webhook(
+        url=url,
+        secret_token=settings.webhook_secret,
+        allowed_updates=dp.resolve_used_update_types(),
+        max_connections=settings.webhook_max_connections,
+    )
+    logger.info(f"Webhook set to {url}")
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        handler: LimitedRequestHandler = app["webhook_handler"]
+        logger.info(f"Webhook server stopping (received {handler.received}, pending {handler.pending})")
+        await runner.cleanup()
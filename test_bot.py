@@ -2,6 +2,7 @@
 
 import asyncio
 import logging
+import os
 from unittest.mock import AsyncMock, MagicMock, patch
 from datetime import datetime
 
@@ -11,6 +12,11 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Проверки SQL (outbox, шарды, страницы правил) идут на настоящем PostgreSQL, в
+# отдельной базе: TEST_DB_NAME=portals_bot_test python test_bot.py. Хост и учётные
+# данные - из DB_HOST / DB_PORT / DB_USER / DB_PASSWORD (запоминаем до test_config)
+TEST_DB_ENV = {key: os.environ[key] for key in ("DB_HOST", "DB_PORT", "DB_USER", "DB_PASSWORD") if key in os.environ}
+
 
 # Mock для Portals API
 class MockPortalsAPI:
@@ -333,6 +339,222 @@ async def test_gift_model():
     logger.info(f"\n✅ Тест пройден! Модель работает корректно")
 
 
+async def connect_test_db():
+    """Подключается к тестовой базе и создаёт схему; None, если база не задана."""
+    db_name = os.getenv("TEST_DB_NAME")
+    if not db_name:
+        logger.info("⏭  Пропущено: задайте TEST_DB_NAME (отдельная база PostgreSQL)")
+        return None
+
+    from src.config import get_settings
+    from src.database import get_db_connection, init_database
+
+    settings = get_settings()
+    settings.db_host = TEST_DB_ENV.get("DB_HOST", "localhost")
+    settings.db_port = int(TEST_DB_ENV.get("DB_PORT", "5432"))
+    settings.db_user = TEST_DB_ENV.get("DB_USER", "postgres")
+    settings.db_password = TEST_DB_ENV.get("DB_PASSWORD", "")
+    settings.db_name = db_name
+    settings.db_replica_dsn = None
+    settings.db_pool_stats_interval = 0
+
+    db = get_db_connection()
+    await db.connect()
+    await init_database()
+    # Справочники коллекций и моделей не чистим: их id закэшированы в процессе
+    await db.pool.execute("TRUNCATE tracking_rules, alerts, tracker_instances, tracker_shards CASCADE")
+    return db
+
+
+async def test_outbox_lease_reclaim():
+    """Тестирование закрепления алертов outbox (SKIP LOCKED и claimed_until)."""
+    logger.info("\n" + "="*60)
+    logger.info("🧪 ТЕСТ 5: Outbox - закрепление и повторный claim")
+    logger.info("="*60)
+
+    db = await connect_test_db()
+    if db is None:
+        return
+
+    from src.models import Alert, TrackingRule, ConditionType
+    from src.repositories import AlertRepository, TrackingRuleRepository
+
+    try:
+        rule_id = await TrackingRuleRepository().create(
+            TrackingRule(user_id=111, collection_name="Test Collection", condition_type=ConditionType.ANY_PRICE)
+        )
+        alert_repo = AlertRepository()
+
+        def make_alert(lot_id):
+            return Alert(
+                rule_id=rule_id, user_id=111, lot_id=lot_id, lot_price=10.0, lot_floor_price=12.0,
+                collection_name="Test Collection", model="Model", photo_url=f"https://example.com/{lot_id}.jpg",
+            )
+
+        first_id = await alert_repo.create(make_alert("lot_1"))
+        second_id = await alert_repo.create(make_alert("lot_2"))
+        assert await alert_repo.create(make_alert("lot_1")) is None, "второй алерт по тому же лоту"
+
+        claimed = await alert_repo.claim_pending(10, 60, 3600, 5)
+        assert sorted(alert.alert_id for alert in claimed) == sorted([first_id, second_id])
+        assert claimed[0].photo_url.endswith(f"{claimed[0].lot_id}.jpg"), "картинка своего лота"
+        assert await alert_repo.claim_pending(10, 60, 3600, 5) == [], "закреплённые не отдаются повторно"
+
+        # Закрепление первого истекло (воркер упал), второй отправлен
+        await db.pool.execute(
+            "UPDATE alerts SET claimed_until = NOW() - INTERVAL '1 second' WHERE id = $1", first_id
+        )
+        await alert_repo.mark_many_as_sent([(second_id, datetime.utcnow())])
+        reclaimed = await alert_repo.claim_pending(10, 60, 3600, 5)
+        assert [alert.alert_id for alert in reclaimed] == [first_id]
+        assert await db.pool.fetchval("SELECT attempts FROM alerts WHERE id = $1", first_id) == 2
+
+        # Продление закрепления (дайджест) не даёт забрать алерт после старого срока
+        await db.pool.execute(
+            "UPDATE alerts SET claimed_until = NOW() + INTERVAL '1 second' WHERE id = $1", first_id
+        )
+        assert await alert_repo.extend_claims([first_id, second_id], 60) == 1, "отправленный не продлевается"
+        assert await db.pool.fetchval(
+            "SELECT claimed_until > NOW() + INTERVAL '30 seconds' FROM alerts WHERE id = $1", first_id
+        )
+
+        # Исчерпанные попытки и устаревшие алерты больше не забираются
+        await db.pool.execute("UPDATE alerts SET claimed_until = NULL WHERE id = $1", first_id)
+        assert await alert_repo.claim_pending(10, 60, 3600, 2) == []
+        assert await alert_repo.count_pending(3600, 2) == 0
+        assert await alert_repo.count_pending(3600, 5) == 1
+
+        # Параллельные claim делят очередь без пересечений
+        for number in range(20):
+            await alert_repo.create(make_alert(f"lot_batch_{number}"))
+        batches = await asyncio.gather(*(alert_repo.claim_pending(15, 60, 3600, 5) for _ in range(2)))
+        ids = [alert.alert_id for batch in batches for alert in batch]
+        logger.info(f"\n📦 Параллельные claim: {[len(batch) for batch in batches]}")
+        assert len(ids) == len(set(ids)) == 21
+
+        logger.info(f"\n✅ Тест пройден! Закрепление и повторная доставка работают")
+    finally:
+        await db.disconnect()
+
+
+async def test_shard_handoff():
+    """Тестирование передачи шардов между двумя экземплярами трекера."""
+    logger.info("\n" + "="*60)
+    logger.info("🧪 ТЕСТ 6: Передача шардов между экземплярами")
+    logger.info("="*60)
+
+    db = await connect_test_db()
+    if db is None:
+        return
+
+    from src.services.shard_coordinator import ShardCoordinator
+
+    try:
+        first = ShardCoordinator(instance_id="test-a", shard_count=4)
+        second = ShardCoordinator(instance_id="test-b", shard_count=4)
+
+        assert await first.rebalance() == [0, 1, 2, 3], "единственный экземпляр берёт все шарды"
+        assert await second.rebalance() == [], "занятые шарды не перехватываются"
+
+        # Первый видит второго и отдаёт лишнее, второй забирает освободившееся
+        kept = await first.rebalance()
+        assert len(kept) == 2
+        assert not first.owns(next(shard for shard in range(4) if shard not in kept)), "отданный шард"
+        taken = await second.rebalance()
+        logger.info(f"\n🔀 Шарды: test-a={kept}, test-b={taken}")
+        assert sorted(kept + taken) == [0, 1, 2, 3], "каждый шард ровно у одного экземпляра"
+
+        # Повторный rebalance ничего не меняет
+        assert await first.rebalance() == kept
+        assert await second.rebalance() == taken
+
+        # Штатная остановка отдаёт шарды сразу
+        await second.stop()
+        assert await first.rebalance() == [0, 1, 2, 3]
+
+        # Истёкшая аренда и отметка живым: шарды упавшего забирают оставшиеся
+        second = ShardCoordinator(instance_id="test-b", shard_count=4)
+        await second.rebalance()
+        await first.rebalance()
+        assert len(await second.rebalance()) == 2
+        await db.pool.execute(
+            "UPDATE tracker_instances SET heartbeat_at = NOW() - INTERVAL '1 hour' WHERE instance_id = 'test-b'"
+        )
+        await db.pool.execute(
+            "UPDATE tracker_shards SET lease_until = NOW() - INTERVAL '1 second' WHERE owner = 'test-b'"
+        )
+        assert await first.rebalance() == [0, 1, 2, 3]
+
+        logger.info(f"\n✅ Тест пройден! Шарды передаются без пересечений")
+    finally:
+        await db.disconnect()
+
+
+async def test_rules_page_boundaries():
+    """Тестирование keyset страниц правил группы (вперёд и назад)."""
+    logger.info("\n" + "="*60)
+    logger.info("🧪 ТЕСТ 7: Страницы правил группы")
+    logger.info("="*60)
+
+    db = await connect_test_db()
+    if db is None:
+        return
+
+    from src.models import TrackingRule, ConditionType
+    from src.repositories import TrackingRuleRepository
+
+    try:
+        rule_repo = TrackingRuleRepository()
+        group = [211, 212]
+
+        # 7 правил двух пользователей; у двух одинаковый created_at (порядок по id)
+        rule_ids = []
+        for number in range(7):
+            rule_ids.append(await rule_repo.create(
+                TrackingRule(
+                    user_id=group[number % 2], collection_name="Test Collection",
+                    condition_type=ConditionType.ANY_PRICE,
+                )
+            ))
+        for number, rule_id in enumerate(rule_ids):
+            await db.pool.execute(
+                "UPDATE tracking_rules SET created_at = TIMESTAMP '2026-01-01' + make_interval(mins => $1) WHERE id = $2",
+                min(number, 5), rule_id,
+            )
+        newest_first = list(reversed(rule_ids))
+
+        def ids(rules):
+            return [rule.rule_id for rule in rules]
+
+        def cursor(rule):
+            return rule.created_at, rule.rule_id
+
+        page1, has_more = await rule_repo.get_page_by_user_ids(group, 3)
+        assert ids(page1) == newest_first[:3] and has_more
+
+        page2, has_more = await rule_repo.get_page_by_user_ids(group, 3, cursor(page1[-1]))
+        assert ids(page2) == newest_first[3:6] and has_more
+
+        page3, has_more = await rule_repo.get_page_by_user_ids(group, 3, cursor(page2[-1]))
+        assert ids(page3) == newest_first[6:] and not has_more
+
+        # Назад: те же страницы, от новых к старым; у первой страницы нет более новых
+        back2, has_more = await rule_repo.get_page_by_user_ids(group, 3, cursor(page3[0]), newer=True)
+        assert ids(back2) == ids(page2) and has_more
+
+        back1, has_more = await rule_repo.get_page_by_user_ids(group, 3, cursor(back2[0]), newer=True)
+        assert ids(back1) == ids(page1) and not has_more
+
+        # Курсор удалённого правила на краю: страница всё равно строится от его позиции
+        await rule_repo.delete(page2[-1].rule_id)
+        page3, has_more = await rule_repo.get_page_by_user_ids(group, 3, cursor(page2[-1]))
+        assert ids(page3) == newest_first[6:] and not has_more
+
+        logger.info(f"\n✅ Тест пройден! Страницы не теряют и не повторяют правила")
+    finally:
+        await db.disconnect()
+
+
 async def main():
     """Запуск всех тестов."""
     logger.info("\n" + "🚀 "* 20)
@@ -344,6 +566,9 @@ async def main():
         await test_gift_model()
         await test_add_gift_flow()
         await test_price_tracker()
+        await test_outbox_lease_reclaim()
+        await test_shard_handoff()
+        await test_rules_page_boundaries()
 
         logger.info("\n" + "="*60)
         logger.info("🎉 ВСЕ ТЕСТЫ ПРОЙДЕНЫ УСПЕШНО!")